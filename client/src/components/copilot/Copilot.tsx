@@ -4,6 +4,26 @@ import { useCopilot } from "../../state/copilotStore";
 type Props = { collapsed?: boolean };
 type Msg = { role: "user" | "assistant"; content: string };
 
+// `data:` payloads of an SSE body; multi-line events are joined with "\n"
+async function* sseEvents(body: ReadableStream<Uint8Array>) {
+  const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+  let buf = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buf += value.replace(/\r\n?/g, "\n");
+    let end;
+    while ((end = buf.indexOf("\n\n")) >= 0) {
+      const lines = buf.slice(0, end).split("\n");
+      buf = buf.slice(end + 2);
+      const data = lines
+        .filter((l) => l.startsWith("data:"))
+        .map((l) => l.slice(l.startsWith("data: ") ? 6 : 5));
+      if (data.length) yield data.join("\n");
+    }
+  }
+}
+
 export default function Copilot({ collapsed }: Props) {
   const messages = useCopilot((s) => s.messages);
   const append = useCopilot((s) => s.append);
@@ -38,29 +58,31 @@ export default function Copilot({ collapsed }: Props) {
       messages: [systemPrompt, ...cleanHistory, { role: "user", content: text }],
     };
 
-    // Open streaming connection
-    const es = new EventSource(
-      `/api/chat/stream?body=${encodeURIComponent(JSON.stringify(payload))}`
-    );
-
     // Prepare a streaming assistant message
     let current = { role: "assistant", content: "" };
     append(current);
 
-    es.onmessage = (ev) => {
-      if (ev.data === "[DONE]") {
-        es.close();
-        return;
-      }
-      current.content += ev.data;
-      useCopilot.setState((s) => {
-        const msgs = [...s.messages];
-        msgs[msgs.length - 1] = { ...current };
-        return { messages: msgs };
+    // POST keeps long histories out of the URL; the reply is the same SSE
+    // stream as GET /stream (possibly replayed from the server's reply cache)
+    try {
+      const res = await fetch("/api/chat/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload),
       });
-    };
-
-    es.onerror = () => es.close();
+      if (!res.ok || !res.body) throw new Error(await res.text());
+      for await (const data of sseEvents(res.body)) {
+        if (data === "[DONE]") break;
+        current.content += data;
+        useCopilot.setState((s) => {
+          const msgs = [...s.messages];
+          msgs[msgs.length - 1] = { ...current };
+          return { messages: msgs };
+        });
+      }
+    } catch (e) {
+      console.error("[copilot] stream failed", e);
+    }
   }
 
 
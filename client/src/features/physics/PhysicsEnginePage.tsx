@@ -1,15 +1,30 @@
+import { useState } from "react";
 import { useQuery } from "@tanstack/react-query";
 import { j } from "../../api/base";
 import ResizableVerticalPanels from "../../components/ResizablePanels";
 import { usePhysics } from "../../state/physicsStore";
 import MoleculeViewer3D from "./MoleculeViewer3D";
+import { decodePfxb, frameToXyz } from "./xyzBinary";
 
 export default function PhysicsEnginePage() {
   const { lastRun } = usePhysics();
 
+  const [frame, setFrame] = useState(0);
+  // frame index of the trajectory; only the displayed frame is downloaded
+  const indexQ = useQuery({
+    queryKey:["xyz-index"],
+    queryFn: ()=> j<{frames:number}>(fetch("/api/physics/xyz/sample.xyz/index"))
+  });
+  const frames = indexQ.data?.frames ?? 0;
   const xyzQ = useQuery({
-    queryKey:["xyz"],
-    queryFn: async()=> (await fetch("/api/physics/complex.xyz")).text()
+    queryKey:["xyz", frame],
+    queryFn: async()=> {
+      const r = await fetch(`/api/physics/xyz/sample.xyz/binary/frames/${frame}`);
+      if (!r.ok) throw new Error(await r.text());
+      return frameToXyz(decodePfxb(await r.arrayBuffer()));
+    },
+    enabled: frames > 0,
+    placeholderData: (prev)=> prev
   });
   const propsQ = useQuery({
     queryKey:["props"],
@@ -37,9 +52,21 @@ export default function PhysicsEnginePage() {
             }}
           >
             <strong>Structure / Complex Viewer</strong>
+            {frames > 1 && (
+              <label style={{ marginLeft: "auto", display: "flex", alignItems: "center", gap: 8 }}>
+                <span style={{ color: "var(--muted)" }}>Frame {frame + 1}/{frames}</span>
+                <input
+                  type="range"
+                  min={0}
+                  max={frames - 1}
+                  value={frame}
+                  onChange={(e) => setFrame(Number(e.target.value))}
+                />
+              </label>
+            )}
           </div>
           <div style={{ minHeight: 0 }}>
-            {xyzQ.isLoading ? (
+            {indexQ.isLoading || xyzQ.isLoading ? (
               <div style={{ padding: "12px" }}>Loading structure…</div>
             ) : (
               <div style={{ height: "100%", width: "100%" }}>
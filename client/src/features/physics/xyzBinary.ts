@@ -0,0 +1,45 @@
+// Decoder for the physics API's PFXB coordinate payloads
+// (/api/physics/xyz/{name}/binary…, /runs/{id}/steps/{id}/geometry.bin).
+// Layout (little-endian): 32-byte header ("PFXB", u16 version, u16 header bytes,
+// u32 frames, u32 atoms, u64 source size, u64 source mtime), u8 atomic numbers
+// padded to 4 bytes, then f32 xyz per atom per frame.
+
+const SYMBOLS = (
+  "H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn " +
+  "Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce " +
+  "Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn"
+).split(" ");
+
+export type CoordFrames = {
+  frames: number;
+  atoms: number;
+  elements: Uint8Array;    // atomic numbers (0 = unknown)
+  coords: Float32Array;    // frames * atoms * 3, no copy of the response buffer
+};
+
+export function decodePfxb(buf: ArrayBuffer): CoordFrames {
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== "PFXB") throw new Error(`Not a PFXB payload (${magic})`);
+  const headerBytes = view.getUint16(6, true);
+  const frames = view.getUint32(8, true);
+  const atoms = view.getUint32(12, true);
+  const elements = new Uint8Array(buf, headerBytes, atoms);
+  const coordsAt = headerBytes + ((atoms + 3) & ~3);
+  return { frames, atoms, elements, coords: new Float32Array(buf, coordsAt, frames * atoms * 3) };
+}
+
+export function symbol(z: number): string {
+  return SYMBOLS[z - 1] ?? "X";
+}
+
+// XYZ text for one decoded frame (3Dmol's addModel only takes text formats)
+export function frameToXyz(d: CoordFrames, frame = 0, comment = ""): string {
+  const rows = [String(d.atoms), comment];
+  const base = frame * d.atoms * 3;
+  for (let i = 0; i < d.atoms; i++) {
+    const o = base + i * 3;
+    rows.push(`${symbol(d.elements[i])} ${d.coords[o].toFixed(4)} ${d.coords[o + 1].toFixed(4)} ${d.coords[o + 2].toFixed(4)}`);
+  }
+  return rows.join("\n") + "\n";
+}
@@ -0,0 +1,251 @@
+# server/app/cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+def make_cache_key(method_id: str, *parts: str) -> str:
+    """
+    Content-addressed key: sha256 over a method/version id and its inputs
+    (e.g. canonical SMILES). This is what `Property.cache_key` carries.
+    """
+    h = hashlib.sha256(method_id.encode("utf-8"))
+    for p in parts:
+        h.update(b"\0")
+        h.update(p.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serializable results:
+      - a bounded in-memory LRU (max_items entries and, optionally, max_bytes
+        of serialized payload),
+      - an optional SQLite file that survives restarts (db_path), optionally
+        capped at max_disk_bytes by evicting least-recently-used entries.
+    Values are returned as fresh copies so callers may mutate them.
+    """
+
+    def __init__(self, max_items: int = 4096, db_path: Optional[str] = None,
+                 max_bytes: Optional[int] = None, max_disk_bytes: Optional[int] = None):
+        self.max_items = max(1, max_items)
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.db_path = db_path
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._mem_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._counters: Dict[str, int] = {
+            "hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0,
+            "disk_evictions": 0,
+        }
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+            if "size" not in columns:  # files created before size-based eviction
+                self._db.execute("ALTER TABLE results ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                self._db.execute("UPDATE results SET size = length(value)")
+            if "accessed_at" not in columns:
+                self._db.execute("ALTER TABLE results ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+                self._db.execute("UPDATE results SET accessed_at = created_at")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            raw = self._mem.get(key)
+            if raw is not None:
+                self._mem.move_to_end(key)
+                self._counters["hits"] += 1
+                self._counters["memory_hits"] += 1
+                return json.loads(raw)
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if self.max_disk_bytes is not None:  # LRU bookkeeping for eviction
+                        self._db.execute(
+                            "UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                        )
+                        self._db.commit()
+                    self._remember(key, row[0])
+                    self._counters["hits"] += 1
+                    self._counters["disk_hits"] += 1
+                    return json.loads(row[0])
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        raw = json.dumps(value)
+        with self._lock:
+            self._remember(key, raw)
+            if self._db is not None:
+                now = time.time()
+                old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created_at, size, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, now, len(raw), now),
+                )
+                self._disk_bytes += len(raw) - (old[0] if old else 0)
+                self._evict_disk()
+                self._db.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value or compute, store (unless None) and return it."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = compute()
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def _remember(self, key: str, raw: str) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = raw
+        self._mem_bytes += len(raw)
+        while len(self._mem) > 1 and (
+            len(self._mem) > self.max_items
+            or (self.max_bytes is not None and self._mem_bytes > self.max_bytes)
+        ):
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self) -> None:
+        if self.max_disk_bytes is None or self._disk_bytes <= self.max_disk_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, size FROM results ORDER BY accessed_at ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows[:-1]:  # always keep the newest entry
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self._counters["disk_evictions"] += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._mem)
+            mem_bytes = self._mem_bytes
+            disk_bytes = self._disk_bytes if self._db is not None else None
+            disk = (
+                self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                if self._db is not None else None
+            )
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "memory_items": size,
+            "max_items": self.max_items,
+            "memory_bytes": mem_bytes,
+            "max_bytes": self.max_bytes,
+            "disk_items": disk,
+            "disk_bytes": disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes,
+            "db_path": self.db_path,
+        }
+
+
+# -----------------------------------------------------------------------------
+# Shared property store (designer + physics)
+# -----------------------------------------------------------------------------
+_property_cache: Optional[ResultCache] = None
+_property_cache_lock = threading.Lock()
+
+
+def get_property_cache() -> ResultCache:
+    """
+    Process-wide property cache. Size via POLYFOLD_PROPERTY_CACHE_SIZE;
+    set POLYFOLD_PROPERTY_CACHE_DB to a file path to persist across restarts.
+    """
+    global _property_cache
+    with _property_cache_lock:
+        if _property_cache is None:
+            _property_cache = ResultCache(
+                max_items=int(os.getenv("POLYFOLD_PROPERTY_CACHE_SIZE", "4096")),
+                db_path=os.getenv("POLYFOLD_PROPERTY_CACHE_DB") or None,
+            )
+    return _property_cache
+
+
+# -----------------------------------------------------------------------------
+# Physics step results (method_id + input hash)
+# -----------------------------------------------------------------------------
+_step_cache: Optional[ResultCache] = None
+_step_cache_lock = threading.Lock()
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def get_step_cache() -> ResultCache:
+    """
+    Process-wide store of finished physics step results (conformers, poses,
+    energies). Bounded by POLYFOLD_STEP_CACHE_ITEMS / POLYFOLD_STEP_CACHE_BYTES
+    in memory; POLYFOLD_STEP_CACHE_DB (+ POLYFOLD_STEP_CACHE_DB_BYTES) persists it.
+    """
+    global _step_cache
+    with _step_cache_lock:
+        if _step_cache is None:
+            _step_cache = ResultCache(
+                max_items=int(os.getenv("POLYFOLD_STEP_CACHE_ITEMS", "2048")),
+                max_bytes=_env_int("POLYFOLD_STEP_CACHE_BYTES") or 256 * 1024 * 1024,
+                db_path=os.getenv("POLYFOLD_STEP_CACHE_DB") or None,
+                max_disk_bytes=_env_int("POLYFOLD_STEP_CACHE_DB_BYTES"),
+            )
+    return _step_cache
+
+
+# -----------------------------------------------------------------------------
+# Copilot replies
+# -----------------------------------------------------------------------------
+_chat_cache: Optional[ResultCache] = None
+_chat_cache_lock = threading.Lock()
+
+
+def get_chat_cache() -> ResultCache:
+    """
+    Finished copilot replies keyed by normalized messages + model parameters.
+    Bounded by POLYFOLD_CHAT_CACHE_ITEMS / POLYFOLD_CHAT_CACHE_BYTES in memory;
+    POLYFOLD_CHAT_CACHE_DB (+ POLYFOLD_CHAT_CACHE_DB_BYTES) persists it.
+    """
+    global _chat_cache
+    with _chat_cache_lock:
+        if _chat_cache is None:
+            _chat_cache = ResultCache(
+                max_items=int(os.getenv("POLYFOLD_CHAT_CACHE_ITEMS", "1024")),
+                max_bytes=_env_int("POLYFOLD_CHAT_CACHE_BYTES") or 32 * 1024 * 1024,
+                db_path=os.getenv("POLYFOLD_CHAT_CACHE_DB") or None,
+                max_disk_bytes=_env_int("POLYFOLD_CHAT_CACHE_DB_BYTES"),
+            )
+    return _chat_cache
@@ -0,0 +1,370 @@
+# server/app/instrument.py
+from __future__ import annotations
+
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# -----------------------------------------------------------------------------
+# Histograms
+# -----------------------------------------------------------------------------
+# Cumulative-bucket latency histograms in the Prometheus text format. Buckets
+# span 1 ms .. 2 min, which covers both JSON handlers and full SSE streams.
+BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                              1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """Request/stage histograms + in-flight gauge, rendered for Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self._first_byte: Dict[Tuple[str, str], Histogram] = {}
+        self._stages: Dict[str, Histogram] = {}
+        self.in_flight = 0
+        self.profiles_written = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        first_byte: Optional[float]) -> None:
+        with self._lock:
+            self._requests.setdefault((method, route, str(status)), Histogram()).observe(seconds)
+            if first_byte is not None:
+                self._first_byte.setdefault((method, route), Histogram()).observe(first_byte)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def add_in_flight(self, delta: int) -> None:
+        with self._lock:
+            self.in_flight += delta
+
+    @staticmethod
+    def _histogram(lines: List[str], name: str, labels: str, h: Histogram) -> None:
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines += ["# HELP polyfold_http_request_duration_seconds Time from request to last body byte.",
+                      "# TYPE polyfold_http_request_duration_seconds histogram"]
+            for (method, route, status), h in sorted(self._requests.items()):
+                self._histogram(lines, "polyfold_http_request_duration_seconds",
+                                f'method="{method}",route="{_label(route)}",status="{status}"', h)
+            lines += ["# HELP polyfold_http_response_start_seconds Time from request to response headers.",
+                      "# TYPE polyfold_http_response_start_seconds histogram"]
+            for (method, route), h in sorted(self._first_byte.items()):
+                self._histogram(lines, "polyfold_http_response_start_seconds",
+                                f'method="{method}",route="{_label(route)}"', h)
+            lines += ["# HELP polyfold_stage_duration_seconds Time spent in named handler stages (spans).",
+                      "# TYPE polyfold_stage_duration_seconds histogram"]
+            for stage, h in sorted(self._stages.items()):
+                self._histogram(lines, "polyfold_stage_duration_seconds", f'stage="{_label(stage)}"', h)
+            lines += ["# HELP polyfold_http_requests_in_flight Requests currently being served.",
+                      "# TYPE polyfold_http_requests_in_flight gauge",
+                      f"polyfold_http_requests_in_flight {self.in_flight}",
+                      "# HELP polyfold_profiles_written_total Slow-request profiles dumped.",
+                      "# TYPE polyfold_profiles_written_total counter",
+                      f"polyfold_profiles_written_total {self.profiles_written}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# -----------------------------------------------------------------------------
+# Spans
+# -----------------------------------------------------------------------------
+# `with span("generate"):` times a stage into the stage histogram and, when a
+# Trace is active in the current context (every HTTP request gets one from the
+# middleware; background jobs open their own with `trace()`), into that trace.
+# Context variables follow run_in_threadpool, so sync handlers are covered.
+# Work done for a request on another thread (the generation batcher) or in a
+# process pool is recorded into the caller's Trace explicitly: the batcher
+# merges its per-call Trace into every request it served, pool workers return
+# their spans and the parent `record`s them.
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("polyfold_trace", default=None)
+
+
+class Trace:
+    """Spans recorded during one request or job (thread-safe: threadpool handlers append too)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans: List[Tuple[str, float, float]] = []  # (name, start offset s, duration s)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float) -> None:
+        with self._lock:
+            self._spans.append((name, start - self.started, seconds))
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """{stage: {ms, count}} summed over repeated spans, in first-seen order."""
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for name, _, seconds in self._spans:
+                t = out.setdefault(name, {"ms": 0.0, "count": 0})
+                t["ms"] += seconds * 1000
+                t["count"] += 1
+        for t in out.values():
+            t["ms"] = round(t["ms"], 3)
+        return out
+
+    def merge(self, other: "Trace") -> None:
+        """Copy `other`'s spans in, on this trace's clock (work shared by several requests)."""
+        shift = other.started - self.started
+        with other._lock:
+            spans = list(other._spans)
+        with self._lock:
+            self._spans.extend((n, s + shift, d) for n, s, d in spans)
+
+    def spans(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"name": n, "start_ms": round(s * 1000, 3), "ms": round(d * 1000, 3)}
+                    for n, s, d in self._spans]
+
+
+def record(name: str, start: float, seconds: float, into: Optional[Trace] = None) -> None:
+    """A finished stage timed elsewhere (e.g. a process-pool future) -> histogram + trace."""
+    REGISTRY.observe_stage(name, seconds)
+    target = into if into is not None else _current.get()
+    if target is not None:
+        target.add(name, start, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, t0, time.perf_counter() - t0)
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """A fresh Trace for the enclosed block (background jobs, worker threads)."""
+    t = Trace()
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    """The active Trace, to hand to work that runs outside this context."""
+    return _current.get()
+
+
+def current_timings() -> Dict[str, Dict[str, float]]:
+    """Stage totals of the active Trace ({} outside one); what runs put in provenance."""
+    current = _current.get()
+    return current.totals() if current is not None else {}
+
+
+# -----------------------------------------------------------------------------
+# Sampling profiler (opt-in)
+# -----------------------------------------------------------------------------
+# POLYFOLD_PROFILE_SLOW_MS=500 starts a sampler thread that, while requests are
+# in flight, records every thread's Python stack each POLYFOLD_PROFILE_INTERVAL_MS.
+# A request slower than the threshold gets the samples taken during it written
+# as collapsed stacks ("frame;frame;frame count", flamegraph.pl / speedscope
+# input) to POLYFOLD_PROFILE_DIR. Samples cover all busy threads, so concurrent
+# requests show up in each other's profiles. Folding and writing happen on one
+# writer thread, never on the event loop.
+PROFILE_SLOW_MS: float = float(os.getenv("POLYFOLD_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS: float = float(os.getenv("POLYFOLD_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("POLYFOLD_PROFILE_DIR") or
+                   Path(__file__).resolve().parents[1] / "data" / "profiles")
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+
+
+class Sampler:
+    def __init__(self, interval_s: float, keep_s: float = 120.0):
+        self.interval_s = max(0.001, interval_s)
+        self._samples: Deque[Tuple[float, str]] = deque(maxlen=int(keep_s / self.interval_s))
+        self._lock = threading.Lock()
+        self._active = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stack(self, frame) -> Optional[str]:
+        if frame.f_code.co_filename.endswith(_IDLE_FILES):
+            return None  # parked worker / event loop waiting on I/O
+        names: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            if not self._active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            now = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = self._stack(frame)
+                if stack:
+                    with self._lock:
+                        self._samples.append((now, stack))
+            time.sleep(self.interval_s)
+
+    def start_request(self) -> None:
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="polyfold-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end_request(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def collapsed(self, since: float, until: float) -> Dict[str, int]:
+        folded: Dict[str, int] = {}
+        with self._lock:
+            for t, stack in self._samples:
+                if since <= t <= until:
+                    folded[stack] = folded.get(stack, 0) + 1
+        return folded
+
+
+_sampler: Optional[Sampler] = Sampler(PROFILE_INTERVAL_MS / 1000) if PROFILE_SLOW_MS > 0 else None
+_profile_writer: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="polyfold-profile") if PROFILE_SLOW_MS > 0 else None
+)
+
+
+def _dump_profile(method: str, route: str, seconds: float, since: float, until: float) -> Optional[Path]:
+    """Runs on _profile_writer; a profile that cannot be written is dropped."""
+    folded = _sampler.collapsed(since, until)
+    if not folded:
+        return None
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    path = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{method}_{slug}_{int(seconds * 1000)}ms.folded"
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(f"{stack} {n}\n" for stack, n in sorted(folded.items())))
+    except OSError:
+        return None
+    with REGISTRY._lock:
+        REGISTRY.profiles_written += 1
+    return path
+
+
+# -----------------------------------------------------------------------------
+# ASGI middleware
+# -----------------------------------------------------------------------------
+def _route_label(scope: Dict[str, Any]) -> str:
+    """Route template (bounded cardinality): "/api/physics/runs/{run_id}", not the raw path."""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path_format", None):
+        return route.path_format
+    path = scope.get("path", "")
+    if path.startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+
+def _server_timing(timings: Dict[str, Dict[str, float]]) -> bytes:
+    return ", ".join(f'{re.sub(r"[^A-Za-z0-9_.-]", "_", k)};dur={v["ms"]}'
+                     for k, v in timings.items()).encode("latin-1")
+
+
+class InstrumentationMiddleware:
+    """
+    Pure ASGI (not BaseHTTPMiddleware, so SSE bodies still stream): opens a
+    Trace per HTTP request, records duration to the last body byte and to the
+    response headers per route template + status, adds a Server-Timing header
+    with the spans finished by then, and hands slow requests to the sampler.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t = Trace()
+        token = _current.set(t)
+        start = time.perf_counter()
+        state: Dict[str, Any] = {"status": 500, "first_byte": None}
+        REGISTRY.add_in_flight(1)
+        if _sampler is not None:
+            _sampler.start_request()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                state["first_byte"] = time.perf_counter() - start
+                timings = t.totals()
+                if timings:
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"server-timing", _server_timing(timings))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            route = _route_label(scope)
+            REGISTRY.add_in_flight(-1)
+            REGISTRY.observe_request(scope.get("method", ""), route, state["status"], seconds,
+                                     state["first_byte"])
+            if _sampler is not None:
+                _sampler.end_request()
+                if seconds * 1000 >= PROFILE_SLOW_MS and route != "/metrics":
+                    _profile_writer.submit(_dump_profile, scope.get("method", ""), route, seconds,
+                                           start, start + seconds)
+            _current.reset(token)
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
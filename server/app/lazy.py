@@ -0,0 +1,52 @@
+# server/app/lazy.py
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Optional
+
+# Seconds spent importing each lazily loaded module (first access only).
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module (torch, transformers, RDKit, ...) that is only
+    imported on first attribute access. Resolved attributes are cached on the
+    proxy, so hot paths pay the import once and plain attribute lookups after.
+    """
+
+    def __init__(self, name: str, on_import: Optional[Callable[[ModuleType], None]] = None):
+        self.__dict__["_name"] = name
+        self.__dict__["_on_import"] = on_import
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load_module(self) -> ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    t0 = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    IMPORT_TIMINGS[self._name] = round(time.perf_counter() - t0, 3)
+                    if self._on_import is not None:
+                        self._on_import(module)
+                    self.__dict__["_module"] = module
+        return module
+
+    @property
+    def _loaded(self) -> bool:
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._load_module(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
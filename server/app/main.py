@@ -1,13 +1,83 @@
+import importlib
+import os
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from .routers import literature, aidesigner, physics, chat
 from pathlib import Path
-app = FastAPI(title="PolyFold_RX Mock API v2.1")
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+from .instrument import PROMETHEUS_CONTENT_TYPE, InstrumentationMiddleware, render_metrics
+
+# Subsystems this replica serves: POLYFOLD_ROUTERS="literature,physics" mounts
+# only those (default: all). Disabled routers are never imported.
+ROUTERS = {
+    "literature": ("literature", "/api/literature"),
+    "ai-designer": ("aidesigner", "/api/ai-designer"),
+    "physics": ("physics", "/api/physics"),
+    "chat": ("chat", "/api/chat"),
+}
+ENABLED_ROUTERS = [
+    r.strip() for r in os.getenv("POLYFOLD_ROUTERS", ",".join(ROUTERS)).split(",") if r.strip()
+]
+DESIGNER_ENABLED = "ai-designer" in ENABLED_ROUTERS
+
+# Opt-in: load + warm PolyTAO in the background at startup; /api/ready answers
+# 503 until that finishes so load balancers only route to warm replicas.
+PRELOAD_MODEL = DESIGNER_ENABLED and os.getenv("POLYTAO_PRELOAD", "0") == "1"
+
+
+def _model_status():
+    if not DESIGNER_ENABLED:
+        return None
+    from .routers.aidesigner_helpers import model_status
+    return model_status()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD_MODEL:
+        from .routers.aidesigner_helpers import warm_up
+        threading.Thread(target=warm_up, name="polytao-warmup", daemon=True).start()
+    yield
+    if "chat" in ENABLED_ROUTERS:
+        from .routers.chat_client import close_upstream
+        await close_upstream()
+
+
+app = FastAPI(title="PolyFold_RX Mock API v2.1", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+                   expose_headers=["Server-Timing"])
+# Outermost: per-route latency histograms, Server-Timing stage header and
+# sampled profiles of slow requests (app/instrument.py).
+app.add_middleware(InstrumentationMiddleware)
 static_dir = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
-app.include_router(literature.router, prefix="/api/literature", tags=["literature"])
-app.include_router(aidesigner.router, prefix="/api/ai-designer", tags=["ai-designer"])
-app.include_router(physics.router, prefix="/api/physics", tags=["physics"])
-app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+for name in ENABLED_ROUTERS:
+    if name not in ROUTERS:
+        raise RuntimeError(f"Unknown router {name!r} in POLYFOLD_ROUTERS; expected {list(ROUTERS)}")
+    module, prefix = ROUTERS[name]
+    router = importlib.import_module(f".routers.{module}", __package__).router
+    app.include_router(router, prefix=prefix, tags=[name])
+
+
+@app.get("/api/health")
+def health():
+    """Liveness: the process is up (model may still be loading)."""
+    return {"status": "ok", "routers": ENABLED_ROUTERS, "model": _model_status()}
+
+
+@app.get("/api/ready")
+def ready():
+    """Readiness: 200 once the model is warm (or immediately when preloading is off)."""
+    status = _model_status()
+    if PRELOAD_MODEL and not status["warm"]:
+        return JSONResponse({"ready": False, "model": status}, status_code=503)
+    return {"ready": True, "model": status}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition: request latency, per-stage durations, in-flight gauge."""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,23 +1,39 @@
 # server/app/routers/aidesigner.py
 from __future__ import annotations
 
+import json
+import sqlite3
 import time
 import uuid
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ..models import Run
+from ..cache import get_property_cache
+from ..cache import make_cache_key
+from ..instrument import current_timings, span, trace
+from ..models import Property, Run
+from ..store import get_repository, structure_identity
+from .aidesigner_jobs import Job, QueueFull, get_job_registry, job_key
 from .aidesigner_helpers import (
+    CONSTRAINED_DECODING,
     MODEL_NAME,
+    PROPERTIES_METHOD_ID,
+    PROPERTY_KEYS,
     TARGET_PROPERTIES,
+    PropertyColumns,
+    batch_metrics,
     build_prompt,
-    sample_texts,
-    clean_text_to_smiles,
-    canonize_smiles,
-    compute_properties,
+    sample_texts_batched,
+    SmilesParser,
+    postprocess_texts,
+    process_candidate,
+    property_cache_key,
+    rank_candidates,
     summarize_candidate_properties,
+    target_values,
 )
 
 router = APIRouter()
@@ -40,100 +56,183 @@ class ProposeRequest(BaseModel):
     top_p: float = 0.95
     top_k: int = 0
     repetition_penalty: float = 1.05
+    constrained: bool = CONSTRAINED_DECODING  # SMILES-grammar logits processor + early stop
 
 
-@router.post("/propose")
-def propose(payload: ProposeRequest):
-    """
-    Generates polymer candidates with PolyTao and returns:
-      - the exact text prompt used,
-      - raw generations,
-      - extracted+canonical SMILES (when possible),
-      - RDKit properties for valid SMILES,
-      - property_summary derived from the ACTUAL computed properties,
-      - a Run object compatible with the UI.
-    """
-    started = time.time()
-    req = payload
-
+def _validate(req: ProposeRequest) -> None:
     if req.n <= 0 or req.n > 50:
         raise HTTPException(
             status_code=400, detail="Parameter 'n' must be between 1 and 50."
         )
 
-    # 1) Build EXACT prompt from inputs (this is the real context sent to the model)
-    prompt = build_prompt(req.template, req.targets, req.options or {})
 
-    # 2) Sample from the model
+def _sample(req: ProposeRequest, prompt: str, n: int) -> List[str]:
+    return sample_texts_batched(
+        prompt=prompt,
+        n=n,
+        max_new_tokens=req.max_new_tokens,
+        temperature=req.temperature,
+        top_p=req.top_p,
+        top_k=req.top_k,
+        repetition_penalty=req.repetition_penalty,
+        constrained=req.constrained,
+    )
+
+
+def _structure_payload(
+    structure_smiles: Optional[str],
+    props: Optional[Dict[str, object]],
+) -> Dict[str, Optional[str]]:
+    inchikey = props.get("InchiKey") if (props and structure_smiles) else None
+    if not inchikey and structure_smiles:
+        inchikey = structure_identity(structure_smiles)[1]
+    return {"inchikey": inchikey, "smiles": structure_smiles}
+
+
+def _candidate(
+    t: str,
+    smi: Optional[str],
+    props: Optional[Dict[str, object]],
+) -> Dict[str, object]:
+    """raw text + extracted canonical SMILES + RDKit properties => UI payload."""
+    return {
+        "raw_text": t,
+        "smiles": smi,
+        "properties": props,  # may be None if invalid
+        "cache_key": property_cache_key(smi) if props else None,
+        "monomer": _structure_payload(smi, props),
+        "linker": _structure_payload(None, None),
+        "estimated_deltaE_kJmol": None,  # not predicted here
+    }
+
+
+def _is_valid(candidate: Dict[str, object]) -> bool:
+    return bool(candidate["smiles"] and candidate["properties"])
+
+
+# Units of the numeric descriptors stored per candidate (others are unitless)
+DESCRIPTOR_UNITS = {"MW": "g/mol", "TPSA": "Å²"}
+
+
+def _record_candidates(run_id: str, candidates: List[Dict[str, object]]) -> Optional[str]:
+    """
+    Valid candidates -> repository structures (tag "candidate") + one Property
+    per numeric descriptor. Stamps the stored chemical_structure_id onto each
+    candidate's monomer payload. Returns an error string instead of raising.
+    """
+    valid = [c for c in candidates if _is_valid(c)]
+    if not valid:
+        return None
     try:
-        raw_texts = sample_texts(
-            prompt=prompt,
-            n=req.n,
-            max_new_tokens=req.max_new_tokens,
-            temperature=req.temperature,
-            top_p=req.top_p,
-            top_k=req.top_k,
-            repetition_penalty=req.repetition_penalty,
+        repo = get_repository()
+        stored = repo.upsert_structures(
+            {"smiles": c["smiles"], "tags": ["candidate"], "source": "ai-designer",
+             "inchikey": c["properties"].get("InchiKey")} for c in valid
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Model generation failed: {e!r}")
+        props = []
+        for c, structure in zip(valid, stored):
+            c["monomer"]["chemical_structure_id"] = structure["chemical_structure_id"]
+            for key, value in c["properties"].items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                props.append(Property(  # per run: a molecule proposed again is filed under both runs
+                    property_id="PR_" + make_cache_key(c["cache_key"], key, run_id)[:12],
+                    name=key, cache_key=c["cache_key"], value=value,
+                    units=DESCRIPTOR_UNITS.get(key), category="descriptor", context="monomer",
+                    qualifiers={"chemical_structure_id": structure["chemical_structure_id"],
+                                "smiles": c["smiles"]},
+                    provenance={"run_id": run_id, "method_id": PROPERTIES_METHOD_ID},
+                ).model_dump())
+        repo.add_properties(props, source="ai-designer")
+    except sqlite3.Error as e:
+        return repr(e)
+    return None
+
+
+def _save_run(run: Run) -> None:
+    try:
+        get_repository().save_run(run.model_dump())
+    except sqlite3.Error as e:
+        run.provenance["store_error"] = repr(e)
 
-    # 3) Extract SMILES + canon + properties
-    candidates: List[Dict[str, object]] = []
-    created = 0
-    errors = 0
-
-    for t in raw_texts:
-        smi = clean_text_to_smiles(t)
-        smi = canonize_smiles(smi) if smi else None
-        props = compute_properties(smi) if smi else None
-
-        if smi and props:
-            created += 1
-        else:
-            errors += 1
-
-        def _structure_payload(
-            structure_smiles: Optional[str],
-        ) -> Dict[str, Optional[str]]:
-            inchikey = props.get("InchiKey") if (props and structure_smiles) else None
-            if not inchikey and structure_smiles:
-                inchikey = f"IK_{uuid.uuid4().hex[:16]}"
-            return {"inchikey": inchikey, "smiles": structure_smiles}
-
-        candidates.append(
-            {
-                "raw_text": t,
-                "smiles": smi,
-                "properties": props,  # may be None if invalid
-                "monomer": _structure_payload(smi),
-                "linker": _structure_payload(None),
-                "estimated_deltaE_kJmol": None,  # not predicted here
-            }
-        )
 
-    # 4) Build Run metadata
-    run = Run(
-        run_id=str(uuid.uuid4()),
+METHOD_GRAPH = ["polytao.sample@v1", "smiles.extract@v2", "rdkit.properties@v1"]
+
+
+def _selector(req: ProposeRequest) -> Dict[str, object]:
+    return {
+        "template": req.template,
+        "targets": [
+            t.model_dump() if hasattr(t, "model_dump") else t
+            for t in (req.targets or [])
+        ],
+        "options": req.options or {},
+        "n": req.n,
+        "constrained": req.constrained,
+        "model": MODEL_NAME,
+    }
+
+
+def _build_run(
+    req: ProposeRequest,
+    created: int,
+    errors: int,
+    started: float,
+    run_id: Optional[str] = None,
+) -> Run:
+    return Run(
+        run_id=run_id or str(uuid.uuid4()),
         name="ai-designer/propose",
         status="done",
-        method_graph=["polytao.sample@v1", "smiles.extract@v2", "rdkit.properties@v1"],
-        selector={
-            "template": req.template,
-            "targets": [
-                t.model_dump() if hasattr(t, "model_dump") else t
-                for t in (req.targets or [])
-            ],
-            "options": req.options or {},
-            "n": req.n,
-            "model": MODEL_NAME,
-        },
+        method_graph=list(METHOD_GRAPH),
+        selector=_selector(req),
         counters={"created": created, "skipped": 0, "errors": errors},
         provenance={"duration_s": round(time.time() - started, 3)},
     )
 
-    # 5) Summary derived from ACTUAL computed candidate properties
-    property_summary = summarize_candidate_properties(candidates)
+
+def _propose(
+    req: ProposeRequest,
+    started: float,
+    run_id: Optional[str] = None,
+    report: Callable[..., None] = lambda **progress: None,
+) -> Dict[str, object]:
+    # 1) Build EXACT prompt from inputs (this is the real context sent to the model)
+    with span("prompt_build"):
+        prompt = build_prompt(req.template, req.targets, req.options or {})
+
+    # 2) Sample from the model (shared micro-batcher across concurrent requests)
+    report(stage="sampling")
+    try:
+        with span("sample"):
+            raw_texts = _sample(req, prompt, req.n)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model generation failed: {e!r}")
+
+    # 3) Extract SMILES + canon + properties (process pool for large batches)
+    report(stage="postprocessing", generated=len(raw_texts))
+    with span("postprocess"):
+        candidates = [
+            _candidate(t, smi, props)
+            for t, (smi, props) in zip(raw_texts, postprocess_texts(raw_texts))
+        ]
+    created = sum(1 for c in candidates if _is_valid(c))
+
+    # 4) Persist candidates + build Run metadata
+    run_id = run_id or str(uuid.uuid4())
+    with span("store"):
+        store_error = _record_candidates(run_id, candidates)
+    run = _build_run(req, created, len(candidates) - created, started, run_id=run_id)
+    if store_error:
+        run.provenance["store_error"] = store_error
+    run.provenance["timings"] = current_timings()
+    _save_run(run)
+    report(stage="done")
+
+    # 5) Summary derived from ACTUAL computed candidate properties; candidates
+    #    keep their sampling order and are annotated with rank/target_distance
+    property_summary = summarize_candidate_properties(candidates, req.targets)
+    ranking = rank_candidates(candidates, req.targets)
 
     return {
         "run": run.model_dump(),
@@ -145,4 +244,220 @@ def propose(payload: ProposeRequest):
             {"key": k, "label": v} for k, v in TARGET_PROPERTIES.items()
         ],
         "property_summary": property_summary,
+        "ranking": ranking,  # [{index, target_distance}] closest to the targets first
     }
+
+
+@router.post("/propose")
+def propose(payload: ProposeRequest):
+    """
+    Generates polymer candidates with PolyTao and returns:
+      - the exact text prompt used,
+      - raw generations,
+      - extracted+canonical SMILES (when possible),
+      - RDKit properties for valid SMILES,
+      - property_summary derived from the ACTUAL computed properties,
+      - ranking of candidates by distance to the numeric targets,
+      - a Run object compatible with the UI.
+    """
+    started = time.time()
+    _validate(payload)
+    return _propose(payload, started)
+
+
+@router.post("/propose/jobs", status_code=202)
+def propose_job(payload: ProposeRequest):
+    """
+    Job mode of /propose: returns a `running` Run immediately and generates in
+    the background. Poll GET /runs/{run_id} for progress and the final result.
+    Identical in-flight submissions (same prompt + decoding knobs) share one job.
+    """
+    req = payload
+    _validate(req)
+    prompt = build_prompt(req.template, req.targets, req.options or {})
+    key = job_key({
+        "prompt": prompt,
+        "n": req.n,
+        "max_new_tokens": req.max_new_tokens,
+        "temperature": req.temperature,
+        "top_p": req.top_p,
+        "top_k": req.top_k,
+        "repetition_penalty": req.repetition_penalty,
+        "constrained": req.constrained,
+    })
+
+    def work(job: Job) -> Dict[str, object]:
+        with trace():  # job threads don't inherit the request's trace
+            return _propose(req, time.time(), run_id=job.run.run_id, report=job.update)
+
+    try:
+        job, created = get_job_registry().submit(
+            key, "ai-designer/propose", _selector(req), work, method_graph=METHOD_GRAPH
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"run": job.snapshot()["run"], "deduplicated": not created}
+
+
+@router.get("/runs/{run_id}")
+def get_run(run_id: str):
+    """Status/progress of a designer job; `result` holds the /propose response once done."""
+    job = get_job_registry().get(run_id)
+    if job is not None:
+        return job.snapshot()
+    run = get_repository().get_run(run_id)  # any persisted designer run, incl. older processes
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run '{run_id}'")
+    return {"run": run, "result": None, "error": None}
+
+
+# Candidates are sampled in chunks of this size so the first ones can be
+# validated and sent while the rest are still being decoded.
+STREAM_CHUNK_SIZE = 4
+
+
+def _sse(event: Dict[str, object]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+@router.post("/propose/stream")
+def propose_stream(payload: ProposeRequest):
+    """
+    SSE variant of /propose. Emits, in order:
+      - {"type": "prompt", ...} once,
+      - {"type": "candidate", "index", ...candidate} as each one is validated,
+      - {"type": "done", "run", "property_summary", "ranking"} at the end,
+    followed by the usual `data: [DONE]` terminator.
+    """
+    started = time.time()
+    req = payload
+    _validate(req)
+    prompt = build_prompt(req.template, req.targets, req.options or {})
+
+    def gen():
+        yield _sse({"type": "prompt", "prompt": prompt, "template": req.template,
+                    "options": req.options or {}})
+
+        # only the properties are retained (column-wise) for the final summary
+        run_id = str(uuid.uuid4())
+        store_error = None
+        columns = PropertyColumns()
+        parse = SmilesParser()
+        created = 0
+        errors = 0
+        index = 0
+        remaining = req.n
+        while remaining > 0:
+            chunk = min(STREAM_CHUNK_SIZE, remaining)
+            remaining -= chunk
+            try:
+                with span("sample"):
+                    raw_texts = _sample(req, prompt, chunk)
+            except Exception as e:
+                errors += chunk + remaining
+                yield _sse({"type": "error", "detail": f"Model generation failed: {e!r}"})
+                break
+
+            with span("postprocess"):
+                chunk_candidates = [_candidate(t, *process_candidate(t, parse=parse)) for t in raw_texts]
+            with span("store"):
+                store_error = _record_candidates(run_id, chunk_candidates) or store_error
+            columns.extend(chunk_candidates)
+            for c in chunk_candidates:
+                if _is_valid(c):
+                    created += 1
+                else:
+                    errors += 1
+                yield _sse({"type": "candidate", "index": index, **c})
+                index += 1
+
+        run = _build_run(req, created, errors, started, run_id=run_id)
+        if index < req.n:  # generation aborted part-way
+            run.status = "partial" if created else "failed"
+        if store_error:
+            run.provenance["store_error"] = store_error
+        run.provenance["timings"] = current_timings()
+        _save_run(run)
+        yield _sse({
+            "type": "done",
+            "run": run.model_dump(),
+            "property_summary": summarize_candidate_properties(columns, req.targets),
+            "ranking": [{"index": i, "target_distance": d}
+                        for i, d in columns.ranking(target_values(req.targets))],
+        })
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+class SummaryRequest(BaseModel):
+    run_ids: Optional[List[str]] = None  # None = every stored designer candidate
+    targets: Optional[List[Union[TargetItem, Dict[str, object]]]] = []
+    top: int = 20
+
+
+# Upper bound on descriptor rows pulled from the repository per summary request
+SUMMARY_MAX_PROPERTIES = 500_000
+
+
+@router.post("/summary")
+def summary(payload: SummaryRequest):
+    """
+    Property summary + target ranking over stored candidates across runs.
+    Descriptor properties from the repository are pivoted into one column per
+    property (one row per structure), then summarized and ranked vectorized.
+    """
+    t0 = time.perf_counter()
+    repo = get_repository()
+    rows: Dict[str, Dict[str, object]] = {}
+    read = 0
+    for run_id in (payload.run_ids or [None]):
+        cursor = None
+        while read < SUMMARY_MAX_PROPERTIES:
+            page = repo.list_properties(source="ai-designer", run_id=run_id,
+                                        limit=1000, cursor=cursor)
+            for p in page["items"]:
+                if p["name"] not in PROPERTY_KEYS:
+                    continue
+                sid = (p.get("qualifiers") or {}).get("chemical_structure_id")
+                row = rows.setdefault(sid, {"chemical_structure_id": sid,
+                                            "smiles": (p.get("qualifiers") or {}).get("smiles"),
+                                            "properties": {}})
+                row["properties"][p["name"]] = p["value"]
+            read += len(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+    structures = list(rows.values())
+    columns = PropertyColumns(structures)
+    wanted = target_values(payload.targets)
+    ranking = columns.ranking(wanted, top=max(0, payload.top)) if payload.top > 0 else []
+    return {
+        "structures": len(structures),
+        "properties_read": read,
+        "truncated": read >= SUMMARY_MAX_PROPERTIES,
+        "targets": wanted,
+        "property_summary": columns.summary(wanted),
+        "ranking": [{**structures[i], "target_distance": d} for i, d in ranking],
+        "ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+
+@router.get("/batching/metrics")
+def batching_metrics():
+    """Queue depth and batch-size counters of the generation micro-batcher."""
+    return batch_metrics()
+
+
+@router.get("/cache/metrics")
+def cache_metrics():
+    """Hit/miss counters of the shared property cache."""
+    return get_property_cache().stats()
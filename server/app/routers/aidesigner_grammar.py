@@ -0,0 +1,372 @@
+# server/app/routers/aidesigner_grammar.py
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..lazy import LazyModule
+
+torch = LazyModule("torch")
+
+# -----------------------------------------------------------------------------
+# Incremental SMILES prefix grammar
+# -----------------------------------------------------------------------------
+# A single molecule in SMILES, one character at a time: organic-subset and
+# bracket atoms, bonds, branches, ring closures (incl. %nn), and a valence
+# budget per atom. `advance` returns None as soon as a prefix can no longer
+# become a valid molecule; `is_complete` says the prefix already is one.
+# Aromaticity / kekulization are left to RDKit: this is a necessary condition
+# only, like `_prefix_feasible` in aidesigner_helpers, but also covers valence.
+# BigSMILES (`{`, `}`, `[$]`, `[<]`, `[>]`, `,`, `;`) is deliberately not part of
+# the language: extract_mol cannot turn stochastic objects into a molecule, so
+# the constraint trades them for plain SMILES (see CONSTRAINED_DECODING).
+ORGANIC_VALENCE: Dict[str, int] = {
+    "B": 3, "C": 4, "N": 3, "O": 2, "P": 5, "S": 6, "F": 1, "I": 1,
+    "b": 3, "c": 4, "n": 3, "o": 2, "p": 5, "s": 6,  # aromatic bonds are budgeted as single
+    "*": 4,  # polymer attachment point / wildcard
+}
+HALOGEN_VALENCE = 1  # Cl / Br, read as C / B plus one more character
+BRACKET_VALENCE = 8  # explicit H / charge: not budgeted
+BOND_ORDER: Dict[str, int] = {"-": 1, "=": 2, "#": 3, ":": 1, "/": 1, "\\": 1}
+
+# [isotope symbol chirality hcount charge :class]; PREFIX accepts any unfinished one
+_BRACKET_PARTS = r"(?:([A-Z][a-z]?|[bcnops]|se|as|\*)(?:@{1,2})?(?:H\d?)?(?:[+-]\d?|\+\+|--)?(?::\d{0,3})?)"
+_BRACKET_ATOM = re.compile(r"^\d{0,3}" + _BRACKET_PARTS + "$")
+_BRACKET_PREFIX = re.compile(r"^\d{0,3}" + _BRACKET_PARTS + "?$")
+_ELEMENTS = frozenset((
+    "H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn Ga Ge As Se "
+    "Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce Pr Nd Sm Eu Gd Tb Dy "
+    "Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi b c n o p s se as *"
+).split())
+_ELEMENT_PREFIXES = _ELEMENTS | {e[0] for e in _ELEMENTS}
+_BRACKET_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789@+-:")
+_BRACKET_MAX = 12
+_SMILES_CHARS = frozenset(ORGANIC_VALENCE) | frozenset("lr[]()=#-+:/\\%@0123456789") | _BRACKET_CHARS
+
+
+Atom = Tuple[int, int, int]  # (max valence, used, atom it was bonded to on arrival or -1)
+
+
+class SmilesState(NamedTuple):
+    atoms: Tuple[Atom, ...] = ()             # per atom, in order of appearance
+    prev: int = -1                            # atom the next bond starts from
+    branches: Tuple[int, ...] = ()            # branch-point atoms of open '('
+    rings: Tuple[Tuple[str, int, int], ...] = ()  # open ring labels: (label, bond order, atom)
+    bond: int = 0                             # pending explicit bond order
+    mode: str = ""                            # "" | "[" (bracket atom) | "%" (ring label)
+    buf: str = ""                             # bracket / %nn text read so far
+    branch_start: bool = False                # just after '(' (an atom or bond must follow)
+    last: str = ""                            # previous atom char, to read Cl / Br
+    heavy: int = 0                            # atoms other than '*' and H
+    size: int = 0                             # characters read
+
+
+START = SmilesState()
+
+
+def _bond(atoms: Tuple[Atom, ...], a: int, order: int) -> Optional[Tuple[Atom, ...]]:
+    max_v, used, parent = atoms[a]
+    if used + order > max_v:
+        return None
+    return atoms[:a] + ((max_v, used + order, parent),) + atoms[a + 1:]
+
+
+def _has_room(s: SmilesState, order: int) -> bool:
+    """The current atom can still take a bond of `order` (True before the first atom)."""
+    if s.prev < 0:
+        return True
+    max_v, used, _ = s.atoms[s.prev]
+    return used + order <= max_v
+
+
+def _add_atom(s: SmilesState, valence: int, heavy: bool, last: str) -> Optional[SmilesState]:
+    atoms, used = s.atoms, 0
+    if s.prev >= 0:
+        used = s.bond or 1
+        atoms = _bond(atoms, s.prev, used) if used <= valence else None
+        if atoms is None:
+            return None
+    return s._replace(atoms=atoms + ((valence, used, s.prev),), prev=len(atoms), bond=0, mode="", buf="",
+                      branch_start=False, last=last, heavy=s.heavy + heavy)
+
+
+def _ring(s: SmilesState, label: str) -> Optional[SmilesState]:
+    if s.prev < 0 or s.branch_start:
+        return None
+    open_rings = {r[0]: r[1:] for r in s.rings}
+    if label in open_rings:
+        opened, start = open_rings.pop(label)
+        if s.bond and opened and s.bond != opened:
+            return None
+        if start == s.prev or s.atoms[s.prev][2] == start:
+            return None  # closes onto itself / duplicates an existing bond
+        order = s.bond or opened or 1
+        atoms = _bond(s.atoms, start, order - (opened or 1))  # opener paid for the bond already
+    else:
+        order = s.bond or 1
+        open_rings[label] = (s.bond, s.prev)
+        atoms = s.atoms
+    atoms = _bond(atoms, s.prev, order) if atoms is not None else None
+    if atoms is None:
+        return None
+    return s._replace(atoms=atoms, rings=tuple(sorted((k, *v) for k, v in open_rings.items())),
+                      bond=0, mode="", buf="", last="")
+
+
+def advance_char(s: SmilesState, ch: str) -> Optional[SmilesState]:
+    if s.mode == "[":
+        if ch == "]":
+            m = _BRACKET_ATOM.match(s.buf)
+            if not m or m.group(1) not in _ELEMENTS:
+                return None
+            return _add_atom(s, BRACKET_VALENCE, m.group(1) not in ("*", "H"), "")
+        buf = s.buf + ch
+        m = _BRACKET_PREFIX.match(buf) if ch in _BRACKET_CHARS and len(buf) <= _BRACKET_MAX else None
+        if m is None or m.group(1) and m.group(1) not in (_ELEMENT_PREFIXES if m.end(1) == len(buf)
+                                                           else _ELEMENTS):
+            return None
+        return s._replace(buf=buf)
+    if s.mode == "%":
+        if not ch.isdigit():
+            return None
+        if not s.buf:
+            return s._replace(buf=ch)
+        return _ring(s, "%" + s.buf + ch)
+
+    if ch == "l" and s.last == "C" or ch == "r" and s.last == "B":
+        _, used, parent = s.atoms[s.prev]
+        if used > HALOGEN_VALENCE:
+            return None
+        atoms = s.atoms[:s.prev] + ((HALOGEN_VALENCE, used, parent),) + s.atoms[s.prev + 1:]
+        return s._replace(atoms=atoms, last="")
+    if ch in ORGANIC_VALENCE:
+        return _add_atom(s, ORGANIC_VALENCE[ch], ch != "*", ch)
+    if ch == "[":
+        if not _has_room(s, s.bond or 1):
+            return None
+        return s._replace(mode="[", buf="", last="")
+    if ch in BOND_ORDER:
+        if s.prev < 0 or s.bond or not _has_room(s, BOND_ORDER[ch]):
+            return None
+        return s._replace(bond=BOND_ORDER[ch], branch_start=False, last="")
+    if ch.isdigit():
+        return _ring(s, ch)
+    if ch == "%":
+        if s.prev < 0 or s.branch_start:
+            return None
+        return s._replace(mode="%", buf="", last="")
+    if ch == "(":
+        if s.prev < 0 or s.bond or s.branch_start or not _has_room(s, 1):
+            return None
+        return s._replace(branches=s.branches + (s.prev,), branch_start=True, last="")
+    if ch == ")":
+        if not s.branches or s.bond or s.branch_start:
+            return None
+        return s._replace(prev=s.branches[-1], branches=s.branches[:-1], last="")
+    return None  # '.', whitespace, BigSMILES/markup characters: not one SMILES molecule
+
+
+def advance(s: SmilesState, text: str) -> Optional[SmilesState]:
+    for ch in text:
+        s = advance_char(s, ch)
+        if s is None:
+            return None
+    return s._replace(size=s.size + len(text))
+
+
+def is_complete(s: SmilesState, min_heavy_atoms: int = 4, min_length: int = 5) -> bool:
+    """A whole molecule that extract_mol would keep (its heavy-atom / length floors)."""
+    return (s.mode == "" and s.prev >= 0 and not s.bond and not s.branches and not s.rings
+            and s.heavy >= min_heavy_atoms and s.size >= min_length)
+
+
+def can_grow(s: SmilesState) -> bool:
+    """Something can still follow: the current atom has a free bond, or a branch is open."""
+    return bool(s.mode or s.prev < 0 or s.bond or s.branches) or _has_room(s, 1)
+
+
+# -----------------------------------------------------------------------------
+# Token-level grammar
+# -----------------------------------------------------------------------------
+# POLYTAO_GRAMMAR_CANDIDATES: most likely tokens considered per row and step.
+# POLYTAO_GRAMMAR_TAIL: checking stops once the unchecked candidates together
+# are less likely than this fraction of the valid ones found so far; they are
+# masked unchecked (they could hardly be sampled, least of all after top-p).
+MIN_HEAVY_ATOMS = 4  # same floor as extract_mol
+CANDIDATES_PER_STEP: int = int(os.getenv("POLYTAO_GRAMMAR_CANDIDATES", "64"))
+TAIL_FRACTION: float = float(os.getenv("POLYTAO_GRAMMAR_TAIL", "0.01"))
+_MEMO_LIMIT = 1 << 18
+
+
+class TokenGrammar:
+    """
+    SMILES grammar over a tokenizer's vocabulary. `texts[i]` is (text, starts
+    a word) for token i, or None for tokens that can never be part of a SMILES;
+    word-initial tokens decode with a space, so only the first one may be one.
+    `(state, token) -> state` is memoized.
+    """
+
+    def __init__(self, texts: Sequence[Optional[Tuple[str, bool]]], eos_token_id: int,
+                 min_heavy_atoms: int = MIN_HEAVY_ATOMS):
+        self.texts = list(texts)
+        self.eos_token_id = eos_token_id
+        self.min_heavy_atoms = min_heavy_atoms
+        self._memo: Dict[Tuple[SmilesState, int], Optional[SmilesState]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, min_heavy_atoms: int = MIN_HEAVY_ATOMS) -> "TokenGrammar":
+        special = set(tokenizer.all_special_ids)
+        texts: List[Optional[Tuple[str, bool]]] = []
+        for tid, tok in enumerate(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))):
+            if tid in special or tok is None:
+                texts.append(None)
+                continue
+            spaced = tok.startswith(("▁", "Ġ"))  # sentencepiece / byte-level BPE word start
+            text = tokenizer.convert_tokens_to_string([tok]).strip()
+            texts.append((text, spaced) if text and set(text) <= _SMILES_CHARS else None)
+        return cls(texts, tokenizer.eos_token_id, min_heavy_atoms)
+
+    def step(self, state: SmilesState, token_id: int) -> Optional[SmilesState]:
+        key = (state, token_id)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        entry = self.texts[token_id] if 0 <= token_id < len(self.texts) else None
+        nxt = None
+        if entry is not None:
+            text, spaced = entry
+            if not spaced or state == START:
+                nxt = advance(state, text)
+            if nxt is not None and not can_grow(nxt) and not is_complete(nxt, self.min_heavy_atoms):
+                nxt = None  # dead end: saturated before it became a whole molecule
+        with self._lock:
+            if len(self._memo) >= _MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[key] = nxt
+        return nxt
+
+    def allowed(self, state: SmilesState, ranked: Sequence[int],
+                probs: Optional[Sequence[float]] = None) -> List[int]:
+        """
+        Token ids among `ranked` (most likely first, with probabilities `probs`)
+        that keep the prefix valid. EOS is allowed once the prefix is a complete
+        molecule, and is forced (early stop) when the model's first choice would
+        leave SMILES at that point: the junk tails the rescue used to cut off
+        are never decoded.
+        """
+        complete = is_complete(state, self.min_heavy_atoms)
+        eos = self.eos_token_id
+        if complete and ranked and (ranked[0] == eos or self.step(state, ranked[0]) is None):
+            return [eos]
+        out: List[int] = []
+        valid = 0.0
+        unchecked = sum(probs) if probs is not None else 0.0
+        for i, t in enumerate(ranked):
+            if probs is not None:
+                if out and unchecked < TAIL_FRACTION * valid:
+                    break
+                unchecked -= probs[i]
+            if t != eos and self.step(state, t) is not None:
+                out.append(t)
+                valid += probs[i] if probs is not None else 0.0
+        if complete:
+            out.append(eos)
+        return out or [eos]
+
+
+_grammars: Dict[int, TokenGrammar] = {}
+_grammars_lock = threading.Lock()
+
+
+def get_token_grammar(tokenizer) -> TokenGrammar:
+    """One TokenGrammar per tokenizer (building it walks the whole vocabulary)."""
+    with _grammars_lock:
+        grammar = _grammars.get(id(tokenizer))
+        if grammar is None:
+            grammar = _grammars[id(tokenizer)] = TokenGrammar.from_tokenizer(tokenizer)
+    return grammar
+
+
+# -----------------------------------------------------------------------------
+# Logits processor
+# -----------------------------------------------------------------------------
+class SmilesLogitsProcessor:
+    """
+    `model.generate(logits_processor=[...])` hook: per row, keeps the grammar
+    state of the decoded prefix and masks every token that would make it an
+    invalid SMILES. At most the `candidates` most likely tokens are checked each
+    step, fewer once the unchecked ones carry a negligible share of the mass
+    (TAIL_FRACTION); the rest are masked. Rows are tracked incrementally, so
+    sampling without beams only.
+    """
+
+    def __init__(self, grammar: TokenGrammar, candidates: int = CANDIDATES_PER_STEP):
+        self.grammar = grammar
+        self.candidates = candidates
+        self._states: List[Optional[SmilesState]] = []
+        self._length = 0
+
+    def _sync(self, input_ids) -> None:
+        rows, length = input_ids.shape
+        if len(self._states) != rows or length != self._length + 1:
+            # first step (decoder start token) or an unexpected jump: replay the prefix
+            self._states = [START] * rows
+            history = input_ids[:, 1:].tolist()
+        else:
+            history = input_ids[:, -1:].tolist()
+        self._length = length
+        eos = self.grammar.eos_token_id
+        for row, tokens in enumerate(history):
+            for t in tokens:
+                state = self._states[row]
+                if state is None:
+                    break
+                self._states[row] = None if t == eos else self.grammar.step(state, t)
+
+    def __call__(self, input_ids, scores):
+        self._sync(input_ids)
+        masked = early_stops = 0
+        k = min(self.candidates, scores.shape[-1])
+        top = torch.topk(torch.softmax(scores.float(), dim=-1), k, dim=-1)
+        top_ids, top_probs = top.indices.tolist(), top.values.tolist()
+        keep = torch.zeros_like(scores, dtype=torch.bool)
+        forced: List[int] = []
+        eos = self.grammar.eos_token_id
+        for row, state in enumerate(self._states):
+            if state is None:  # finished (or left the grammar): leave it to generate
+                keep[row] = True
+                continue
+            n = sum(1 for p in top_probs[row] if p > 0.0)  # banned tokens have probability 0
+            ranked = top_ids[row][:n]
+            allowed = self.grammar.allowed(state, ranked, top_probs[row][:n])
+            if allowed == [eos] and (not ranked or ranked[0] != eos):
+                forced.append(row)
+                early_stops += is_complete(state, self.grammar.min_heavy_atoms)
+            keep[row, allowed] = True
+            masked += len(allowed) < len(ranked)
+        out = scores.masked_fill(~keep, -math.inf)
+        for row in forced:  # EOS may rank below the candidates: make it the only choice
+            out[row, eos] = 0.0
+        _count(steps=1, rows=len(self._states), masked_rows=masked, early_stops=early_stops)
+        return out
+
+
+_stats: Dict[str, int] = {"steps": 0, "rows": 0, "masked_rows": 0, "early_stops": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**deltas: int) -> None:
+    with _stats_lock:
+        for k, v in deltas.items():
+            _stats[k] += v
+
+
+def grammar_stats() -> Dict[str, int]:
+    """Constrained decoding counters: row-steps, rows with masked tokens, early stops."""
+    with _stats_lock:
+        return dict(_stats)
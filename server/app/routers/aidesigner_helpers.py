@@ -1,18 +1,42 @@
 # server/app/utils/aidesigner_helpers.py
 from __future__ import annotations
 
+import importlib
+import multiprocessing
 import os
+import queue
 import re
-from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..cache import get_property_cache, make_cache_key
+from ..instrument import Trace, current_trace, record, span, trace
+from ..lazy import IMPORT_TIMINGS, LazyModule
+from .aidesigner_grammar import grammar_stats
+
+if TYPE_CHECKING:
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 
 # === PolyTao + RDKit deps ===
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from rdkit import Chem
-from rdkit.Chem import Descriptors, Crippen, rdMolDescriptors, rdBase
+# Imported on first use (seconds of import time / hundreds of MB RSS), so the
+# API boots fast and replicas that never serve the designer never pay for them.
+def _quiet_rdkit(_module) -> None:
+    # Quiet RDKit parse spam
+    from rdkit import rdBase
+    rdBase.DisableLog("rdApp.error")
 
-# Quiet RDKit parse spam
-rdBase.DisableLog("rdApp.error")
+np = LazyModule("numpy")
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+Chem = LazyModule("rdkit.Chem", on_import=_quiet_rdkit)
+Descriptors = LazyModule("rdkit.Chem.Descriptors", on_import=_quiet_rdkit)
+Crippen = LazyModule("rdkit.Chem.Crippen", on_import=_quiet_rdkit)
+rdMolDescriptors = LazyModule("rdkit.Chem.rdMolDescriptors", on_import=_quiet_rdkit)
 
 # -----------------------------------------------------------------------------
 # Model cache
@@ -24,28 +48,131 @@ _model: Optional[AutoModelForSeq2SeqLM] = None
 _device: Optional[str] = None
 _bad_words_ids: Optional[List[List[int]]] = None  # ban literal special tokens
 
+# CPU inference knobs (we mostly run without GPUs):
+#   POLYTAO_BACKEND         fp32 (default) | int8 | compile | int8+compile
+#                           int8 = dynamic int8 quantization of nn.Linear (CPU only),
+#                           compile = torch.compile of the model forward
+#   POLYTAO_NUM_THREADS     intra-op threads (torch.set_num_threads), 0 = torch default
+#   POLYTAO_INTEROP_THREADS inter-op threads (torch.set_num_interop_threads), 0 = default
+INFERENCE_BACKEND: str = os.getenv("POLYTAO_BACKEND", "fp32").strip().lower()
+NUM_THREADS: int = int(os.getenv("POLYTAO_NUM_THREADS", "0"))
+INTEROP_THREADS: int = int(os.getenv("POLYTAO_INTEROP_THREADS", "0"))
+_BACKENDS = ("fp32", "int8", "compile", "int8+compile")
+
+_model_lock = threading.Lock()
+_load_timings: Dict[str, float] = {}
+_warm = False
+_load_error: Optional[str] = None
+_backend_notes: List[str] = []
+
+
+def _configure_threads() -> None:
+    if NUM_THREADS > 0:
+        torch.set_num_threads(NUM_THREADS)
+    if INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(INTEROP_THREADS)
+        except RuntimeError as e:  # only allowed before any inter-op work started
+            _backend_notes.append(f"interop threads not applied: {e}")
+
+
+def _apply_backend(model: AutoModelForSeq2SeqLM, device: str) -> AutoModelForSeq2SeqLM:
+    if INFERENCE_BACKEND not in _BACKENDS:
+        raise ValueError(f"POLYTAO_BACKEND must be one of {_BACKENDS}, got {INFERENCE_BACKEND!r}")
+    if "int8" in INFERENCE_BACKEND:
+        if device == "cpu":
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        else:
+            _backend_notes.append("int8 dynamic quantization is CPU-only; skipped on " + device)
+    if "compile" in INFERENCE_BACKEND:
+        # generate() drives forward() step by step; compile that, shapes vary per step
+        model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+
 def get_model() -> Tuple[AutoTokenizer, AutoModelForSeq2SeqLM, str, Optional[List[List[int]]]]:
     """
     Lazy-load and cache the tokenizer/model/device and a bad_words_ids list
-    to discourage literal special tokens in generation.
+    to discourage literal special tokens in generation. Thread-safe: concurrent
+    first callers wait for a single load instead of racing the globals.
     """
     global _tokenizer, _model, _device, _bad_words_ids
     if _tokenizer is None or _model is None:
-        _device = "cuda" if torch.cuda.is_available() else "cpu"
-        _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        _model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME).to(_device).eval()
-
-        # Build bad_words_ids to reduce junk like <pad>, <s>, </s> appearing literally
-        _bad_words_ids = []
-        for tok in ["<pad>", "<s>", "</s>"]:
-            if tok in _tokenizer.get_vocab():
-                _bad_words_ids.append([_tokenizer.convert_tokens_to_ids(tok)])
-        if _tokenizer.pad_token_id is not None:
-            _bad_words_ids.append([_tokenizer.pad_token_id])
-        # NOTE: keep eos allowed so generation can stop naturally.
+        with _model_lock:
+            if _tokenizer is None or _model is None:
+                t_import = time.perf_counter()
+                torch._load_module()
+                transformers._load_module()
+                _load_timings["import_s"] = round(time.perf_counter() - t_import, 3)
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                _configure_threads()
+                t0 = time.perf_counter()
+                tokenizer = transformers.AutoTokenizer.from_pretrained(MODEL_NAME)
+                t1 = time.perf_counter()
+                model = transformers.AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME).to(device).eval()
+                t2 = time.perf_counter()
+                model = _apply_backend(model, device)
+                t3 = time.perf_counter()
+
+                # Build bad_words_ids to reduce junk like <pad>, <s>, </s> appearing literally
+                bad_words_ids = []
+                for tok in ["<pad>", "<s>", "</s>"]:
+                    if tok in tokenizer.get_vocab():
+                        bad_words_ids.append([tokenizer.convert_tokens_to_ids(tok)])
+                if tokenizer.pad_token_id is not None:
+                    bad_words_ids.append([tokenizer.pad_token_id])
+                # NOTE: keep eos allowed so generation can stop naturally.
+
+                _load_timings.update(tokenizer_s=round(t1 - t0, 3), weights_s=round(t2 - t1, 3),
+                                     backend_s=round(t3 - t2, 3))
+                _device, _bad_words_ids, _tokenizer = device, bad_words_ids, tokenizer
+                _model = model  # published last: readers check `_model is None`
     return _tokenizer, _model, _device or "cpu", (_bad_words_ids or None)
 
 
+def warm_up(prompt: str = "Generate a polymer with reasonable properties.") -> Dict[str, object]:
+    """
+    Load the model and run one short generate so the first real request does
+    not pay for lazy init / first-decode overheads. Never raises; see model_status().
+    """
+    global _warm, _load_error
+    try:
+        if get_generator() is None:
+            get_model()
+        t0 = time.perf_counter()
+        sample_texts(prompt, n=1, max_new_tokens=8)
+        _load_timings["first_decode_s"] = round(time.perf_counter() - t0, 3)
+        _warm = True
+        _load_error = None
+    except Exception as e:
+        _load_error = repr(e)
+    return model_status()
+
+
+def model_status() -> Dict[str, object]:
+    """Readiness + startup timing breakdown (import, tokenizer, weights, first decode)."""
+    return {
+        "model": MODEL_NAME,
+        "generator": GENERATOR or ("custom" if _generator is not None else None),
+        "loaded": _model is not None or _generator is not None,
+        "warm": _warm,
+        "device": _device,
+        "backend": INFERENCE_BACKEND,
+        "threads": (
+            {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+            if _model is not None else None
+        ),
+        "backend_notes": list(_backend_notes),
+        "constrained_default": CONSTRAINED_DECODING,
+        "grammar": grammar_stats(),
+        "timings": dict(_load_timings),
+        "lazy_imports_s": dict(IMPORT_TIMINGS),
+        "error": _load_error,
+    }
+
+
 # -----------------------------------------------------------------------------
 # Prompt building
 # -----------------------------------------------------------------------------
@@ -94,36 +221,390 @@ def build_prompt(template: Optional[str],
 # -----------------------------------------------------------------------------
 # Generation
 # -----------------------------------------------------------------------------
-@torch.inference_mode()
+# POLYTAO_CONSTRAINED=1 makes grammar-constrained decoding the default for
+# requests that do not set `constrained` (app/routers/aidesigner_grammar.py).
+# Off by default: the grammar admits plain SMILES only and masks the BigSMILES
+# stochastic-object syntax ({[$]...[$]}) PolyTAO-BigSMILES was trained to emit,
+# so constrained runs decode off the model's distribution. Unmeasured on the
+# real model; opt in per request after checking yield with bench_constrained.
+#
+# POLYTAO_GENERATOR="package.module:function" replaces the transformers model with
+# any callable of `generate_batch`'s signature (prompts, counts, **decoding knobs)
+# -> texts grouped per prompt; torch/transformers are then never loaded. The
+# benchmarks use the offline stand-in `benchmarks.standin_model:generate_batch`.
+GENERATOR: str = os.getenv("POLYTAO_GENERATOR", "").strip()
+CONSTRAINED_DECODING: bool = os.getenv("POLYTAO_CONSTRAINED", "0") == "1"
+
+Generator = Callable[..., List[List[str]]]
+_generator: Optional[Generator] = None
+
+
+def set_generator(fn: Optional[Generator]) -> None:
+    """Install (or with None, remove) a generation backend for this process."""
+    global _generator
+    with _model_lock:
+        _generator = fn
+
+
+def get_generator() -> Optional[Generator]:
+    """The configured generation backend, or None for the PolyTAO model."""
+    global _generator
+    if _generator is None and GENERATOR:
+        with _model_lock:
+            if _generator is None:
+                module, _, attr = GENERATOR.partition(":")
+                _generator = getattr(importlib.import_module(module), attr or "generate_batch")
+    return _generator
+
+
+def generate_batch(prompts: List[str],
+                   counts: List[int],
+                   max_new_tokens: int = 128,
+                   temperature: float = 0.9,
+                   top_p: float = 0.95,
+                   top_k: int = 0,
+                   repetition_penalty: float = 1.05,
+                   constrained: bool = False) -> List[List[str]]:
+    """
+    Run ONE padded `generate` call over several prompts. Prompt i is sampled
+    counts[i] times; returns the decoded texts grouped per prompt, in order.
+    `constrained` masks tokens that would break the SMILES grammar and ends a
+    row once it holds a complete molecule the model does not continue.
+    """
+    generator = get_generator()
+    if generator is not None:
+        with span("generate"):
+            return generator(prompts, counts, max_new_tokens=max_new_tokens, temperature=temperature,
+                             top_p=top_p, top_k=top_k, repetition_penalty=repetition_penalty,
+                             constrained=constrained)
+    tokenizer, model, device, bad_words_ids = get_model()
+    logits_processor = None
+    if constrained:
+        from .aidesigner_grammar import SmilesLogitsProcessor, get_token_grammar
+        logits_processor = transformers.LogitsProcessorList(
+            [SmilesLogitsProcessor(get_token_grammar(tokenizer))]
+        )
+    with torch.inference_mode():
+        with span("tokenize"):
+            enc = tokenizer(prompts, return_tensors="pt", padding=len(prompts) > 1)
+        repeats = torch.tensor(counts)
+        input_ids = enc["input_ids"].repeat_interleave(repeats, dim=0).to(device)
+        attention_mask = enc.get("attention_mask", None)
+        if attention_mask is not None:
+            attention_mask = attention_mask.repeat_interleave(repeats, dim=0).to(device)
+
+        with span("generate"):
+            out = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                do_sample=True,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                max_new_tokens=max_new_tokens,
+                num_return_sequences=1,
+                repetition_penalty=repetition_penalty,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id,
+                bad_words_ids=bad_words_ids,  # reduce literal special tokens in output
+                logits_processor=logits_processor,
+            )
+    with span("decode"):
+        texts = [tokenizer.decode(o, skip_special_tokens=True).strip() for o in out]
+
+    grouped: List[List[str]] = []
+    offset = 0
+    for c in counts:
+        grouped.append(texts[offset:offset + c])
+        offset += c
+    return grouped
+
+
 def sample_texts(prompt: str,
                  n: int = 8,
                  max_new_tokens: int = 128,
                  temperature: float = 0.9,
                  top_p: float = 0.95,
                  top_k: int = 0,
-                 repetition_penalty: float = 1.05) -> List[str]:
-    tokenizer, model, device, bad_words_ids = get_model()
-    enc = tokenizer(prompt, return_tensors="pt")
-    input_ids = enc["input_ids"].to(device)
-    attention_mask = enc.get("attention_mask", None)
-    if attention_mask is not None:
-        attention_mask = attention_mask.to(device)
-
-    out = model.generate(
-        input_ids=input_ids,
-        attention_mask=attention_mask,
-        do_sample=True,
+                 repetition_penalty: float = 1.05,
+                 constrained: bool = False) -> List[str]:
+    return generate_batch(
+        [prompt],
+        [n],
+        max_new_tokens=max_new_tokens,
         temperature=temperature,
         top_p=top_p,
         top_k=top_k,
+        repetition_penalty=repetition_penalty,
+        constrained=constrained,
+    )[0]
+
+
+# -----------------------------------------------------------------------------
+# Micro-batching scheduler
+# -----------------------------------------------------------------------------
+# Concurrent `propose` calls park their prompt in a queue; a single background
+# worker drains it every BATCH_WINDOW_S, groups requests with identical decoding
+# knobs and runs one padded `generate` per group (capped at BATCH_MAX_ROWS
+# sampled rows). A window of 0 disables batching and calls `sample_texts` inline.
+# Callers give up after POLYTAO_GENERATE_TIMEOUT_S; if the worker itself dies,
+# every prompt it holds or that is still queued fails instead of waiting.
+BATCH_WINDOW_S: float = float(os.getenv("POLYTAO_BATCH_WINDOW_MS", "25")) / 1000.0
+BATCH_MAX_ROWS: int = int(os.getenv("POLYTAO_BATCH_MAX_ROWS", "64"))
+GENERATE_TIMEOUT_S: float = float(os.getenv("POLYTAO_GENERATE_TIMEOUT_S", "600"))
+
+_DecodingKnobs = Tuple[int, float, float, int, float, bool]
+
+
+@dataclass
+class _PendingGeneration:
+    prompt: str
+    n: int
+    knobs: _DecodingKnobs
+    future: Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    trace: Optional[Trace] = field(default_factory=current_trace)  # the caller's, for stage timings
+
+
+class GenerationBatcher:
+    """
+    Collects pending prompts over a short window and serves them with as few
+    `generate` calls as possible. Results are split back to each caller's Future.
+    """
+
+    def __init__(self, window_s: float = BATCH_WINDOW_S, max_rows: int = BATCH_MAX_ROWS):
+        self.window_s = window_s
+        self.max_rows = max(1, max_rows)
+        self._queue: "queue.Queue[_PendingGeneration]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stats: Dict[str, float] = {
+            "requests": 0,
+            "batches": 0,
+            "generate_calls": 0,
+            "rows": 0,
+            "max_batch_requests": 0,
+            "max_batch_rows": 0,
+            "queue_wait_s": 0.0,
+            "generate_s": 0.0,
+            "failures": 0,
+        }
+        self._batch_size_hist: Dict[int, int] = {}
+
+    def submit(self,
+               prompt: str,
+               n: int,
+               max_new_tokens: int = 128,
+               temperature: float = 0.9,
+               top_p: float = 0.95,
+               top_k: int = 0,
+               repetition_penalty: float = 1.05,
+               constrained: bool = False) -> Future:
+        knobs: _DecodingKnobs = (int(max_new_tokens), float(temperature), float(top_p),
+                                 int(top_k), float(repetition_penalty), bool(constrained))
+        item = _PendingGeneration(prompt=prompt, n=n, knobs=knobs, future=Future())
+        self._queue.put(item)
+        self._ensure_worker()
+        return item.future
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="polytao-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[_PendingGeneration]:
+        first = self._queue.get()
+        pending = [first]
+        rows = first.n
+        deadline = time.monotonic() + self.window_s
+        while rows < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            rows += item.n
+        return pending
+
+    def _run(self) -> None:
+        pending: List[_PendingGeneration] = []
+        try:
+            while True:
+                pending = self._collect()
+                self._serve(pending)
+                pending = []
+        except BaseException as e:
+            # the next submit() starts a new worker; nothing this one took may hang
+            with self._lock:
+                if self._worker is threading.current_thread():
+                    self._worker = None
+            error = e if isinstance(e, Exception) else RuntimeError(f"generation worker exited: {e!r}")
+            self._fail(pending + self._drain(), error)
+            raise
+
+    def _drain(self) -> List[_PendingGeneration]:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    @staticmethod
+    def _fail(items: List[_PendingGeneration], error: BaseException) -> None:
+        for i in items:
+            try:
+                i.future.set_exception(error)
+            except InvalidStateError:  # already answered, or the caller gave up
+                pass
+
+    def _serve(self, pending: List[_PendingGeneration]) -> None:
+        groups: Dict[_DecodingKnobs, List[_PendingGeneration]] = {}
+        for item in pending:
+            groups.setdefault(item.knobs, []).append(item)
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(pending)
+            self._stats["max_batch_requests"] = max(self._stats["max_batch_requests"], len(pending))
+            self._batch_size_hist[len(pending)] = self._batch_size_hist.get(len(pending), 0) + 1
+
+        for knobs, items in groups.items():
+            chunk: List[_PendingGeneration] = []
+            rows = 0
+            for item in items:
+                if chunk and rows + item.n > self.max_rows:
+                    self._dispatch(knobs, chunk)
+                    chunk, rows = [], 0
+                chunk.append(item)
+                rows += item.n
+            if chunk:
+                self._dispatch(knobs, chunk)
+
+    def _dispatch(self, knobs: _DecodingKnobs, items: List[_PendingGeneration]) -> None:
+        items = [i for i in items if not i.future.cancelled()]  # callers that timed out
+        if not items:
+            return
+        max_new_tokens, temperature, top_p, top_k, repetition_penalty, constrained = knobs
+        started = time.monotonic()
+        rows = sum(i.n for i in items)
+        try:
+            with trace() as shared:  # tokenize / generate / decode of this call
+                grouped = generate_batch(
+                    [i.prompt for i in items],
+                    [i.n for i in items],
+                    max_new_tokens=max_new_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    top_k=top_k,
+                    repetition_penalty=repetition_penalty,
+                    constrained=constrained,
+                )
+        except Exception as e:
+            with self._lock:
+                self._stats["failures"] += 1
+            self._fail(items, e)
+            return
+
+        finished = time.monotonic()
+        with self._lock:
+            self._stats["generate_calls"] += 1
+            self._stats["rows"] += rows
+            self._stats["max_batch_rows"] = max(self._stats["max_batch_rows"], rows)
+            self._stats["generate_s"] += finished - started
+            self._stats["queue_wait_s"] += sum(started - i.enqueued_at for i in items)
+        for i in items:
+            if i.trace is not None:
+                wait = started - i.enqueued_at
+                record("generation_queue", shared.started - wait, wait, into=i.trace)
+                i.trace.merge(shared)
+        for i, texts in zip(items, grouped):
+            try:
+                i.future.set_result(texts)
+            except InvalidStateError:
+                pass
+        self._fail(items[len(grouped):], RuntimeError("generate_batch returned fewer groups than prompts"))
+
+    def metrics(self) -> Dict[str, object]:
+        with self._lock:
+            s = dict(self._stats)
+            hist = dict(sorted(self._batch_size_hist.items()))
+        calls = s["generate_calls"] or 1
+        requests = s["requests"] or 1
+        return {
+            "window_ms": round(self.window_s * 1000.0, 3),
+            "max_rows": self.max_rows,
+            "queue_depth": self._queue.qsize(),
+            "requests": int(s["requests"]),
+            "batches": int(s["batches"]),
+            "generate_calls": int(s["generate_calls"]),
+            "failures": int(s["failures"]),
+            "mean_requests_per_batch": round(s["requests"] / (s["batches"] or 1), 3),
+            "mean_rows_per_generate": round(s["rows"] / calls, 3),
+            "max_batch_requests": int(s["max_batch_requests"]),
+            "max_batch_rows": int(s["max_batch_rows"]),
+            "mean_queue_wait_s": round(s["queue_wait_s"] / requests, 4),
+            "mean_generate_s": round(s["generate_s"] / calls, 4),
+            "batch_size_histogram": hist,
+        }
+
+
+_batcher: Optional[GenerationBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> GenerationBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = GenerationBatcher()
+    return _batcher
+
+
+def sample_texts_batched(prompt: str,
+                         n: int = 8,
+                         max_new_tokens: int = 128,
+                         temperature: float = 0.9,
+                         top_p: float = 0.95,
+                         top_k: int = 0,
+                         repetition_penalty: float = 1.05,
+                         constrained: bool = False) -> List[str]:
+    """
+    Same contract as `sample_texts`, but routed through the shared micro-batcher
+    so concurrent callers share `generate` calls. Blocks until the texts are
+    ready, at most POLYTAO_GENERATE_TIMEOUT_S.
+    """
+    knobs = dict(
         max_new_tokens=max_new_tokens,
-        num_return_sequences=n,
+        temperature=temperature,
+        top_p=top_p,
+        top_k=top_k,
         repetition_penalty=repetition_penalty,
-        pad_token_id=tokenizer.pad_token_id,
-        eos_token_id=tokenizer.eos_token_id,
-        bad_words_ids=bad_words_ids,  # reduce literal special tokens in output
+        constrained=constrained,
     )
-    return [tokenizer.decode(o, skip_special_tokens=True).strip() for o in out]
+    if BATCH_WINDOW_S <= 0:
+        return sample_texts(prompt, n=n, **knobs)
+    future = get_batcher().submit(prompt, n, **knobs)
+    try:
+        return future.result(timeout=GENERATE_TIMEOUT_S)
+    except FutureTimeout:
+        future.cancel()  # still queued: the worker skips it
+        raise TimeoutError(f"generation did not finish within {GENERATE_TIMEOUT_S:g}s "
+                           f"(POLYTAO_GENERATE_TIMEOUT_S)") from None
+
+
+def batch_metrics() -> Dict[str, object]:
+    """Queue depth + batch-size counters for tuning POLYTAO_BATCH_WINDOW_MS."""
+    if _batcher is None:
+        return {"window_ms": round(BATCH_WINDOW_S * 1000.0, 3), "max_rows": BATCH_MAX_ROWS,
+                "queue_depth": 0, "requests": 0, "batches": 0}
+    return _batcher.metrics()
 
 
 # -----------------------------------------------------------------------------
@@ -148,8 +629,31 @@ def _split_candidates(text: str) -> list[str]:
     toks = [tok.strip(" <>“”\"'`()[]{}") for tok in raw if tok.strip()]
     return [t for t in toks if t not in _ELEMENT_TOKENS]
 
-def _score_smiles(smi: str) -> float:
-    m = Chem.MolFromSmiles(smi)
+class SmilesParser:
+    """
+    Memoizing `Chem.MolFromSmiles` scoped to one request: repeated tokens,
+    rescue probes and the final winner are parsed at most once. `parses`
+    counts the RDKit parses actually paid for.
+    """
+
+    def __init__(self):
+        self._memo: Dict[str, Optional[Chem.Mol]] = {}
+        self.parses = 0
+        self.lookups = 0
+
+    def __call__(self, smiles: str) -> Optional[Chem.Mol]:
+        self.lookups += 1
+        if smiles in self._memo:
+            return self._memo[smiles]
+        self.parses += 1
+        m = Chem.MolFromSmiles(smiles)
+        self._memo[smiles] = m
+        return m
+
+
+def _score_smiles(smi: str, m: Optional[Chem.Mol] = None) -> float:
+    if m is None:
+        m = Chem.MolFromSmiles(smi)
     if not m:
         return -1e9
     heavy = m.GetNumHeavyAtoms()
@@ -157,71 +661,138 @@ def _score_smiles(smi: str) -> float:
     feature_bonus = sum(1.0 for rgx in _FEATURE_REGEXES if rgx.search(smi))
     return heavy * 10.0 + length_bonus + feature_bonus
 
-def _greedy_rescue(token: str, min_len: int = 5):
+# Grammar pre-checks. These are NECESSARY conditions for RDKit to accept a
+# SMILES (closed bracket atoms, balanced branches, paired ring-closure labels),
+# so skipping substrings that fail them never changes which substring the
+# rescue returns -- it only avoids paying for parses that must fail.
+def _prefix_feasible(s: str) -> List[bool]:
+    """feasible[i] is False when s[:i] certainly cannot parse as SMILES."""
+    feasible = [True] * (len(s) + 1)
+    depth = 0
+    in_bracket = False
+    open_rings: set = set()
+    broken = False   # sticky: no longer prefix can recover
+    unknown = False  # sticky: syntax we do not model, defer to RDKit
+    i = 0
+    while i < len(s):
+        ch = s[i]
+        step = 1
+        if not (broken or unknown):
+            if in_bracket:
+                if ch == "]":
+                    in_bracket = False
+                elif ch == "[":
+                    broken = True
+            elif ch == "[":
+                in_bracket = True
+            elif ch == "]":
+                broken = True
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                broken = depth < 0
+            elif ch.isdigit():
+                open_rings ^= {ch}
+            elif ch == "%":
+                label = s[i + 1:i + 3]
+                if len(label) == 2 and label.isdigit():
+                    open_rings ^= {"%" + label}
+                    step = 3  # prefixes ending inside '%nn' are left to RDKit
+                else:
+                    unknown = True
+        for j in range(i + 1, min(i + step, len(s)) + 1):
+            feasible[j] = unknown or (j < i + step) or not (
+                broken or in_bracket or depth != 0 or open_rings
+            )
+        i += step
+    return feasible
+
+
+def _grammar_ok(s: str) -> bool:
+    return _prefix_feasible(s)[-1]
+
+
+def _greedy_rescue(token: str, min_len: int = 5, parse=None):
+    """
+    Longest parseable prefix, else longest parseable suffix, of a cleaned token.
+    Substrings failing the grammar pre-check are skipped without an RDKit parse.
+    """
     tok = token
     if sum(ch not in _ALLOWED_CHARS for ch in tok) > 2:
         tok = "".join(ch for ch in tok if ch in _ALLOWED_CHARS)
     tok = tok.strip()
     if len(tok) < min_len:
         return None
+    parse = parse or Chem.MolFromSmiles
 
-    if Chem.MolFromSmiles(tok):
-        return tok
-
-    r = tok
-    while len(r) >= min_len:
-        if Chem.MolFromSmiles(r):
-            return r
-        r = r[:-1]
+    feasible = _prefix_feasible(tok)
+    for end in range(len(tok), min_len - 1, -1):
+        if feasible[end] and parse(tok[:end]):
+            return tok[:end]
 
-    l = tok
-    while len(l) >= min_len:
-        if Chem.MolFromSmiles(l):
+    # suffixes: cheap bracket/branch count screen before the full pre-check
+    n_open = tok.count("(") - tok.count(")")
+    n_sq = tok.count("[") - tok.count("]")
+    for start in range(0, len(tok) - min_len + 1):
+        if start:
+            ch = tok[start - 1]
+            n_open -= (ch == "(") - (ch == ")")
+            n_sq -= (ch == "[") - (ch == "]")
+        if n_open or n_sq:
+            continue
+        l = tok[start:]
+        if _grammar_ok(l) and parse(l):
             return l
-        l = l[1:]
 
     return None
 
-def clean_text_to_smiles(text: str,
-                         min_heavy_atoms: int = 4,
-                         min_len: int = 5) -> Optional[str]:
+def extract_mol(text: str,
+                min_heavy_atoms: int = 4,
+                min_len: int = 5,
+                parse: Optional[SmilesParser] = None) -> Optional[Chem.Mol]:
     """
     Robust extractor: collect direct parses and rescued substrings, score them,
-    and return the best candidate (canonicalized).
+    and return the parsed Mol of the best candidate (None if nothing is valid).
     """
+    parse = parse or SmilesParser()
     t = _basic_clean(text)
 
-    m_whole = Chem.MolFromSmiles(t)
+    m_whole = parse(t)
     if m_whole and m_whole.GetNumHeavyAtoms() >= min_heavy_atoms and len(t) >= min_len:
-        return Chem.MolToSmiles(m_whole, canonical=True)
+        return m_whole
 
-    valid: list[str] = []
+    valid: list[Tuple[str, Chem.Mol]] = []
     for tok in _split_candidates(t):
         if len(tok) < min_len:
             continue
 
-        m = Chem.MolFromSmiles(tok)
+        m = parse(tok)
         if m and m.GetNumHeavyAtoms() >= min_heavy_atoms:
-            valid.append(tok)
+            valid.append((tok, m))
             continue
 
-        rescued = _greedy_rescue(tok, min_len=min_len)
+        rescued = _greedy_rescue(tok, min_len=min_len, parse=parse)
         if rescued:
-            m2 = Chem.MolFromSmiles(rescued)
+            m2 = parse(rescued)
             if m2 and m2.GetNumHeavyAtoms() >= min_heavy_atoms:
-                valid.append(rescued)
+                valid.append((rescued, m2))
 
     if not valid:
         return None
 
-    best = max(valid, key=_score_smiles)
-    return Chem.MolToSmiles(Chem.MolFromSmiles(best), canonical=True)
+    _, best = max(valid, key=lambda sm: _score_smiles(*sm))
+    return best
 
+def clean_text_to_smiles(text: str,
+                         min_heavy_atoms: int = 4,
+                         min_len: int = 5) -> Optional[str]:
+    """Canonical SMILES of the best candidate found by `extract_mol`."""
+    m = extract_mol(text, min_heavy_atoms=min_heavy_atoms, min_len=min_len)
+    return Chem.MolToSmiles(m, canonical=True) if m is not None else None
 
-def canonize_smiles(smiles: str) -> Optional[str]:
-    m = Chem.MolFromSmiles(smiles)
-    if m is None:
-        return None
+
+def _canonize_mol(m: Chem.Mol) -> str:
     try:
         Chem.SanitizeMol(m)
     except Exception:
@@ -232,10 +803,22 @@ def canonize_smiles(smiles: str) -> Optional[str]:
     return Chem.MolToSmiles(m, canonical=True)
 
 
-def compute_properties(smiles: str) -> Optional[Dict[str, float | int | str]]:
-    mol = Chem.MolFromSmiles(smiles)
-    if mol is None:
+def canonize_smiles(smiles: str) -> Optional[str]:
+    m = Chem.MolFromSmiles(smiles)
+    if m is None:
         return None
+    return _canonize_mol(m)
+
+
+PROPERTIES_METHOD_ID = "rdkit.properties@v1"
+
+
+def property_cache_key(smiles: str) -> str:
+    """`Property.cache_key` for RDKit descriptors of a canonical SMILES."""
+    return make_cache_key(PROPERTIES_METHOD_ID, smiles)
+
+
+def _properties_from_mol(mol: Chem.Mol) -> Dict[str, float | int | str]:
     props: Dict[str, float | int | str] = {
         "MW": Descriptors.MolWt(mol),
         "LogP": Crippen.MolLogP(mol),
@@ -251,32 +834,326 @@ def compute_properties(smiles: str) -> Optional[Dict[str, float | int | str]]:
     return props
 
 
+def compute_properties(smiles: str) -> Optional[Dict[str, float | int | str]]:
+    """
+    RDKit descriptors + InChIKey for a canonical SMILES, served from the shared
+    content-addressed property cache when the molecule has been seen before.
+    """
+    def compute() -> Optional[Dict[str, float | int | str]]:
+        mol = Chem.MolFromSmiles(smiles)
+        return _properties_from_mol(mol) if mol is not None else None
+
+    return get_property_cache().get_or_compute(property_cache_key(smiles), compute)
+
+
+# -----------------------------------------------------------------------------
+# Single-parse candidate pipeline
+# -----------------------------------------------------------------------------
+def process_candidate(text: str,
+                      parse: Optional[SmilesParser] = None,
+                      ) -> Tuple[Optional[str], Optional[Dict[str, float | int | str]]]:
+    """
+    raw text => (canonical SMILES, properties). The winning Mol from extraction
+    is reused for canonicalization, descriptors and InChIKey instead of being
+    re-parsed from its SMILES at every stage. Share one `parse` across a request
+    so tokens repeated between generations are parsed once.
+    """
+    with span("smiles_extraction"):
+        mol = extract_mol(text, parse=parse)
+        if mol is None:
+            return None, None
+        smi = _canonize_mol(mol)
+    with span("rdkit_properties"):
+        props = get_property_cache().get_or_compute(
+            property_cache_key(smi), lambda: _properties_from_mol(mol)
+        )
+    return smi, props
+
+
+# -----------------------------------------------------------------------------
+# Process-pool post-processing
+# -----------------------------------------------------------------------------
+# Extraction/RDKit work for large batches is fanned out to worker processes in
+# chunks (results keep input order). Batches smaller than POSTPROCESS_MIN_N, or
+# a pool size of 1, run inline in the calling thread.
+POSTPROCESS_WORKERS: int = int(os.getenv("POLYTAO_POSTPROCESS_WORKERS", "0")) or (os.cpu_count() or 1)
+POSTPROCESS_MIN_N: int = int(os.getenv("POLYTAO_POSTPROCESS_MIN_N", "16"))
+POSTPROCESS_CHUNK: int = int(os.getenv("POLYTAO_POSTPROCESS_CHUNK", "4"))
+
+_CandidateResult = Tuple[Optional[str], Optional[Dict[str, float | int | str]]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    # Memory-only property cache in workers: N processes writing one
+    # POLYFOLD_PROPERTY_CACHE_DB file would fail with "database is locked".
+    # The parent back-fills its own (possibly persistent) cache from the results.
+    from .. import cache
+
+    os.environ.pop("POLYFOLD_PROPERTY_CACHE_DB", None)
+    cache._property_cache = None
+
+
+def _postprocess_chunk(texts: List[str]) -> Tuple[List[_CandidateResult], List[Dict[str, Any]]]:
+    """Runs in a worker: the results plus the worker's spans, for the caller's Trace."""
+    parse = SmilesParser()
+    with trace() as chunk_trace:
+        results = [process_candidate(t, parse=parse) for t in texts]
+    return results, chunk_trace.spans()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: never fork a process holding model weights and batcher threads
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+    return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    """Discard a broken pool so the next large batch spawns a fresh one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_workers = None, 0
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def postprocess_texts(texts: List[str],
+                      workers: Optional[int] = None,
+                      min_n: Optional[int] = None,
+                      chunk_size: Optional[int] = None,
+                      parse: Optional[SmilesParser] = None) -> List[_CandidateResult]:
+    """
+    `process_candidate` over a batch of raw generations, in order. Uses the
+    process pool for large batches and falls back to inline processing for
+    small ones or if the pool breaks.
+    """
+    workers = workers or POSTPROCESS_WORKERS
+    min_n = POSTPROCESS_MIN_N if min_n is None else min_n
+    chunk_size = max(1, chunk_size or POSTPROCESS_CHUNK)
+    if workers <= 1 or len(texts) < max(min_n, 2):
+        parse = parse or SmilesParser()
+        return [process_candidate(t, parse=parse) for t in texts]
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    pool = _get_pool(workers)
+    submitted = time.perf_counter()
+    results: List[_CandidateResult] = []
+    try:
+        for chunk, spans in pool.map(_postprocess_chunk, chunks):
+            results.extend(chunk)
+            for s in spans:  # offsets are relative to the worker's chunk start
+                record(s["name"], submitted + s["start_ms"] / 1000, s["ms"] / 1000)
+    except BrokenProcessPool:
+        _drop_pool(pool)
+        return postprocess_texts(texts, workers=1, parse=parse)
+
+    # workers have their own caches; keep the parent's warm for later requests
+    cache = get_property_cache()
+    for smi, props in results:
+        if smi and props:
+            cache.put(property_cache_key(smi), props)
+    return results
+
+
 # -----------------------------------------------------------------------------
 # Summaries for UI from COMPUTED candidate properties
 # -----------------------------------------------------------------------------
 PROPERTY_KEYS = ["MW", "LogP", "TPSA", "NumRings", "NumRotatableBonds"]
 
-def summarize_candidate_properties(candidates: Iterable[Dict[str, object]]) -> List[Dict[str, float]]:
+# TARGET_PROPERTIES key -> computed property column. ΔE is not predicted by the
+# designer, so a deltaE_kJmol target is echoed in the prompt but never scored.
+TARGET_TO_PROPERTY: Dict[str, str] = {
+    "Mw": "MW",
+    "LogP": "LogP",
+    "TPSA": "TPSA",
+    "NumRings": "NumRings",
+    "NumRotatableBonds": "NumRotatableBonds",
+}
+
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+_EMPTY_ROW = [None] * len(PROPERTY_KEYS)
+
+
+def _number(value: object) -> float:
+    return float(value) if isinstance(value, (int, float)) else float("nan")
+
+
+def target_values(targets: Iterable[object] | None) -> Dict[str, float]:
+    """
+    Numeric targets keyed by property column (PROPERTY_KEYS). Accepts the same
+    Pydantic-or-dict items as `build_prompt`; unknown kinds are ignored.
+    """
+    out: Dict[str, float] = {}
+    for t in (targets or []):
+        if hasattr(t, "kind") and hasattr(t, "value"):
+            k, v = t.kind, t.value
+        elif isinstance(t, dict):
+            k, v = t.get("kind"), t.get("value")
+        else:
+            continue
+        key = TARGET_TO_PROPERTY.get(str(k))
+        v = _number(v)
+        if key is not None and v == v:
+            out[key] = v
+    return out
+
+
+class PropertyColumns:
+    """
+    Computed candidate properties stored column-wise: a (rows, PROPERTY_KEYS)
+    float64 matrix with NaN where a candidate has no value (invalid candidates
+    keep their row, so row i is the i-th candidate added). Rows grow by
+    doubling; summaries and target distances are single vectorized passes.
+    """
+
+    def __init__(self, candidates: Iterable[Dict[str, object]] = ()):
+        self._data = np.full((0, len(PROPERTY_KEYS)), np.nan)
+        self._n = 0
+        self.extend(candidates)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def values(self) -> "np.ndarray":
+        return self._data[:self._n]
+
+    def column(self, key: str) -> "np.ndarray":
+        return self.values[:, PROPERTY_KEYS.index(key)]
+
+    def extend(self, candidates: Iterable[Dict[str, object]]) -> None:
+        rows = []
+        for c in candidates or []:
+            props = c.get("properties") if isinstance(c, dict) else None
+            rows.append([props.get(k) for k in PROPERTY_KEYS] if isinstance(props, dict) else _EMPTY_ROW)
+        if not rows:
+            return
+        try:
+            block = np.array(rows, dtype=np.float64)  # None -> NaN
+        except (TypeError, ValueError):  # a non-numeric value somewhere: convert one by one
+            block = np.array([[_number(v) for v in row] for row in rows], dtype=np.float64)
+        need = self._n + len(rows)
+        if need > len(self._data):
+            data = np.full((max(need, 2 * len(self._data), 64), len(PROPERTY_KEYS)), np.nan)
+            data[:self._n] = self._data[:self._n]
+            self._data = data
+        self._data[self._n:need] = block
+        self._n = need
+
+    def summary(self, targets: Dict[str, float] | None = None) -> List[Dict[str, object]]:
+        """
+        Per-property {kind, count, sum, doubled, mean, std, min, max, pNN} plus,
+        for targeted properties, {target, mean_abs_deviation, best_abs_deviation}.
+        One column-wise sort yields min/max/quantiles; properties with no values
+        are omitted.
+        """
+        if not self._n:
+            return []
+        values = self.values
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+        filled = np.where(present, values, 0.0)
+        sums = filled.sum(axis=0)
+        means = sums / np.maximum(counts, 1)
+        std = np.sqrt(np.where(present, (values - means) ** 2, 0.0).sum(axis=0) / np.maximum(counts, 1))
+
+        # NaN sorts last, so each column's values occupy rows [0, count)
+        ordered = np.sort(values, axis=0)
+        last = np.maximum(counts - 1, 0)
+        cols = np.arange(values.shape[1])
+        pos = np.asarray(SUMMARY_QUANTILES)[:, None] * last
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.ceil(pos).astype(np.intp)
+        quantiles = ordered[lo, cols] + (ordered[hi, cols] - ordered[lo, cols]) * (pos - lo)
+        mins, maxs = ordered[0], ordered[last, cols]
+
+        dev_mean = dev_best = None
+        target_vec = np.array([(targets or {}).get(k, np.nan) for k in PROPERTY_KEYS])
+        if targets:
+            dev = np.abs(values - target_vec)
+            dev_mean = np.where(present, dev, 0.0).sum(axis=0) / np.maximum(counts, 1)
+            dev_best = np.where(present, dev, np.inf).min(axis=0)
+
+        summaries: List[Dict[str, object]] = []
+        for j, k in enumerate(PROPERTY_KEYS):
+            if counts[j] == 0:
+                continue
+            total = float(sums[j])
+            row: Dict[str, object] = {
+                "kind": k, "sum": total, "doubled": 2.0 * total,
+                "count": int(counts[j]), "mean": float(means[j]), "std": float(std[j]),
+                "min": float(mins[j]), "max": float(maxs[j]),
+            }
+            for q, v in zip(SUMMARY_QUANTILES, quantiles[:, j]):
+                row[f"p{int(round(q * 100)):02d}"] = float(v)
+            if dev_mean is not None and not np.isnan(target_vec[j]):
+                row["target"] = float(target_vec[j])
+                row["mean_abs_deviation"] = float(dev_mean[j])
+                row["best_abs_deviation"] = float(dev_best[j])
+            summaries.append(row)
+        return summaries
+
+    def target_distance(self, targets: Dict[str, float]) -> "np.ndarray":
+        """
+        Per-row RMS of relative deviations |v - t| / max(|t|, 1) over the
+        targeted properties; inf when a targeted value is missing, NaN when
+        there are no targets. Relative (not batch-standardized) so distances
+        from different runs stay comparable.
+        """
+        keys = [k for k in PROPERTY_KEYS if k in (targets or {})]
+        if not keys:
+            return np.full(self._n, np.nan)
+        idx = [PROPERTY_KEYS.index(k) for k in keys]
+        t = np.array([targets[k] for k in keys])
+        rel = (self.values[:, idx] - t) / np.maximum(np.abs(t), 1.0)
+        dist = np.sqrt(np.mean(rel ** 2, axis=1))
+        return np.where(np.isnan(dist), np.inf, dist)
+
+    def ranking(self, targets: Dict[str, float], top: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(row, distance) pairs closest-first; rows missing a targeted value are left out."""
+        dist = self.target_distance(targets)
+        rows = np.flatnonzero(np.isfinite(dist))
+        if top is not None and 0 < top < len(rows):
+            rows = rows[np.argpartition(dist[rows], top - 1)[:top]]
+        rows = rows[np.argsort(dist[rows], kind="stable")]
+        return [(int(i), float(dist[i])) for i in rows]
+
+
+def summarize_candidate_properties(candidates: Iterable[Dict[str, object]] | PropertyColumns,
+                                   targets: Iterable[object] | None = None) -> List[Dict[str, object]]:
     """
     Aggregate REAL computed properties from candidates into UI-friendly summary:
-    returns a list of {kind, sum, doubled}. Ignores missing values.
+    returns a list of {kind, sum, doubled, count, mean, std, min, max, p05..p95}
+    (+ target deviations for targeted properties). Ignores missing values.
     """
-    sums: Dict[str, float] = {k: 0.0 for k in PROPERTY_KEYS}
-    counts: Dict[str, int] = {k: 0 for k in PROPERTY_KEYS}
+    columns = candidates if isinstance(candidates, PropertyColumns) else PropertyColumns(candidates)
+    return columns.summary(target_values(targets))
 
-    for c in candidates or []:
-        props = c.get("properties") if isinstance(c, dict) else None
-        if not isinstance(props, dict):
-            continue
-        for k in PROPERTY_KEYS:
-            v = props.get(k)
-            if isinstance(v, (int, float)):
-                sums[k] += float(v)
-                counts[k] += 1
-
-    summaries: List[Dict[str, float]] = []
-    for k in PROPERTY_KEYS:
-        if counts[k] > 0:
-            total = sums[k]
-            summaries.append({"kind": k, "sum": total, "doubled": 2.0 * total})
-    return summaries
+
+def rank_candidates(candidates: List[Dict[str, object]],
+                    targets: Iterable[object] | None) -> List[Dict[str, object]]:
+    """
+    Annotates each candidate with `target_distance` and 1-based `rank` (None
+    when unscored) in place; returns [{index, target_distance}] closest-first.
+    """
+    wanted = target_values(targets)
+    for c in candidates:
+        c["target_distance"] = None
+        c["rank"] = None
+    if not wanted:
+        return []
+    ranking = PropertyColumns(candidates).ranking(wanted)
+    for rank, (i, dist) in enumerate(ranking, start=1):
+        candidates[i]["target_distance"] = dist
+        candidates[i]["rank"] = rank
+    return [{"index": i, "target_distance": dist} for i, dist in ranking]
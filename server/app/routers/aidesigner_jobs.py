@@ -0,0 +1,131 @@
+# server/app/routers/aidesigner_jobs.py
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..models import Run
+
+# -----------------------------------------------------------------------------
+# Background AI Designer jobs
+# -----------------------------------------------------------------------------
+JOB_WORKERS: int = int(os.getenv("POLYTAO_JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT: int = int(os.getenv("POLYTAO_JOB_QUEUE", "32"))
+JOB_RETAIN: int = int(os.getenv("POLYTAO_JOB_RETAIN", "256"))
+
+
+def job_key(payload: Dict[str, Any]) -> str:
+    """Dedup key: hash of the prompt + decoding knobs a job was submitted with."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """A Run plus its eventual result; `update` is how the worker reports progress."""
+
+    def __init__(self, run: Run, key: str):
+        self.run = run
+        self.key = key
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def update(self, **provenance: Any) -> None:
+        with self._lock:
+            self.run.provenance.update(provenance)
+
+    def finish(self, result: Optional[Dict[str, Any]], error: Optional[str] = None) -> None:
+        with self._lock:
+            self.result = result
+            self.error = error
+            if result is not None:
+                final = result.get("run") or {}
+                self.run.counters = dict(final.get("counters", self.run.counters))
+                self.run.provenance.update(final.get("provenance", {}))
+            self.run.status = "failed" if error else "done"
+            self.run.finished_at = dt.datetime.utcnow().isoformat() + "Z"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"run": self.run.model_dump(), "result": self.result, "error": self.error}
+
+
+class JobRegistry:
+    """
+    Runs jobs on a bounded thread pool, shares one job between identical
+    in-flight submissions and keeps the last JOB_RETAIN finished jobs for polling.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT,
+                 retain: int = JOB_RETAIN):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix="designer-job")
+        self.queue_limit = queue_limit
+        self.retain = retain
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, name: str, selector: Dict[str, Any],
+               fn: Callable[[Job], Dict[str, Any]],
+               method_graph: Optional[List[str]] = None) -> Tuple[Job, bool]:
+        """Returns (job, created). created=False means an in-flight twin was reused."""
+        with self._lock:
+            twin = self._inflight.get(key)
+            if twin is not None:
+                return twin, False
+            if len(self._inflight) >= self.queue_limit:
+                raise QueueFull(f"{len(self._inflight)} designer jobs already pending")
+            run = Run(run_id=str(uuid.uuid4()), name=name, status="running",
+                      method_graph=list(method_graph or []), selector=selector,
+                      provenance={"stage": "queued"})
+            job = Job(run, key)
+            self._inflight[key] = job
+            self._jobs[run.run_id] = job
+            self._trim()
+        self._executor.submit(self._execute, job, fn)
+        return job, True
+
+    def _execute(self, job: Job, fn: Callable[[Job], Dict[str, Any]]) -> None:
+        try:
+            job.finish(fn(job))
+        except Exception as e:
+            job.finish(None, error=getattr(e, "detail", None) or repr(e))
+        finally:
+            with self._lock:
+                self._inflight.pop(job.key, None)
+
+    def _trim(self) -> None:
+        finished = [rid for rid, j in self._jobs.items() if j.key not in self._inflight]
+        for rid in finished[:max(0, len(self._jobs) - self.retain)]:
+            del self._jobs[rid]
+
+    def get(self, run_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(run_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"inflight": len(self._inflight), "retained": len(self._jobs)}
+
+
+_registry: Optional[JobRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_job_registry() -> JobRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = JobRegistry()
+    return _registry
@@ -1,59 +1,136 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from openai import OpenAI
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 import json
 
+from .chat_client import (
+    CHAT_MODEL,
+    CHAT_MODELS,
+    CHAT_TEMPERATURE,
+    SSE_DONE,
+    cached_reply,
+    metrics,
+    normalize_messages,
+    replay,
+    reply_cache_key,
+    sse_data,
+    stream_and_store,
+)
+
 router = APIRouter()
-client = OpenAI(api_key=open("./OPEN_AI_KEY.txt").read().strip())
+
+GREETING = [
+    "Hello! I'm the PolyFold-RX copilot.",
+    "Ask me about MIPs or modeling workflows.",
+]
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _messages(body: str | None, text: str | None):
+    """Message list from the `body` JSON ({messages: [...]}) or a single `text` turn."""
+    if body:
+        payload = json.loads(body)
+        return payload.get("messages", [])
+    if text:
+        return [
+            {"role": "system", "content": "You are a helpful AI copilot."},
+            {"role": "user", "content": text},
+        ]
+    return None
+
+
+def _events(*lines: str):
+    async def gen():
+        for line in lines:
+            yield sse_data(line)
+        yield SSE_DONE
+    return gen()
+
+
+def _reply(messages: List[Any], model: Optional[str] = None,
+           temperature: float = CHAT_TEMPERATURE) -> StreamingResponse:
+    """
+    Token-level SSE for `messages`: replayed from the reply cache when the same
+    normalized conversation was answered before (`X-Chat-Cache: hit`), otherwise
+    streamed upstream and stored once complete.
+    """
+    messages = normalize_messages(messages)
+    if not messages:
+        return StreamingResponse(_events("[error] No input provided"),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+    key = reply_cache_key(messages, model or CHAT_MODEL, temperature)
+    entry = cached_reply(key)
+    source = replay(entry) if entry is not None else \
+        stream_and_store(messages, key, model=model, temperature=temperature)
+
+    async def gen():
+        try:
+            async for delta in source:
+                yield sse_data(delta)
+        except Exception as e:  # upstream/network failure after the response started
+            yield sse_data(f"[error] {e}")
+        yield SSE_DONE
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Chat-Cache": "hit" if entry is not None else "miss"},
+    )
 
 
 @router.get("/stream")
-def chat_stream(
+async def chat_stream(
     body: str | None = Query(default=None),
     text: str | None = Query(default=None),
     role: str | None = Query(default=None),
 ):
-    def gen():
-        # ---- GREETER ----
-        if role == "greeter":
-            yield "data: Hello! I'm the PolyFold-RX copilot.\n\n"
-            yield "data: Ask me about MIPs or modeling workflows.\n\n"
-            yield "data: [DONE]\n\n"
-            return
-
-        # ---- MESSAGE PREP ----
-        if body:
-            payload = json.loads(body)
-            messages = payload.get("messages", [])
-        elif text:
-            messages = [
-                {"role": "system", "content": "You are a helpful AI copilot."},
-                {"role": "user", "content": text},
-            ]
-        else:
-            yield "data: [error] No input provided\n\n"
-            yield "data: [DONE]\n\n"
-            return
-
-        # ---- OPENAI CALL ----
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.3,
-        )
-        full = resp.choices[0].message.content
-        # send full reply once
-        yield f"data: {full}\n\n"
-        yield "data: [DONE]\n\n"
-        # Explicitly end generator
-        return
+    """
+    Token-level SSE: one `data:` event per upstream delta (multi-line deltas
+    use one `data:` line per line), then `data: [DONE]`. A browser disconnect
+    cancels the response, which closes the upstream stream.
+    """
+    # ---- GREETER ----
+    if role == "greeter":
+        return StreamingResponse(_events(*GREETING), media_type="text/event-stream",
+                                 headers=SSE_HEADERS)
 
-    return StreamingResponse(
-        gen(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    # ---- MESSAGE PREP ----
+    try:
+        messages = _messages(body, text)
+    except (ValueError, AttributeError) as e:
+        return StreamingResponse(_events(f"[error] Invalid body: {e}"),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+    return _reply(messages or [])
+
+
+class ChatRequest(BaseModel):
+    messages: List[Dict[str, Any]]
+    model: Optional[str] = None
+    temperature: float = Field(default=CHAT_TEMPERATURE, ge=0.0, le=2.0)
+
+
+@router.post("/stream")
+async def chat_stream_post(payload: ChatRequest):
+    """
+    Same stream as GET /stream, with the history in the JSON body instead of the URL.
+    `model` must be one of the configured POLYFOLD_CHAT_MODELS (400 otherwise).
+    """
+    if payload.model is not None and payload.model not in CHAT_MODELS:
+        raise HTTPException(status_code=400, detail=(
+            f"Unknown model '{payload.model}'; allowed: {sorted(CHAT_MODELS)}"))
+    return _reply(payload.messages, model=payload.model, temperature=payload.temperature)
+
+
+@router.get("/metrics")
+def chat_metrics():
+    """
+    Upstream stream counters (in flight / waiting / cancelled), TTFT percentiles,
+    reply-cache hit rate and the upstream seconds the hits saved.
+    """
+    return metrics.snapshot()
@@ -0,0 +1,286 @@
+# server/app/routers/chat_client.py
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, FrozenSet, List, Optional
+
+from ..cache import get_chat_cache, make_cache_key
+from ..lazy import LazyModule
+
+openai = LazyModule("openai")
+httpx = LazyModule("httpx")
+
+# -----------------------------------------------------------------------------
+# Upstream configuration
+# -----------------------------------------------------------------------------
+#   OPENAI_BASE_URL              OpenAI-compatible endpoint (e.g. the offline stub
+#                                `python -m benchmarks.openai_stub` at http://127.0.0.1:8001/v1)
+#   OPENAI_API_KEY               key; falls back to the contents of POLYFOLD_OPENAI_KEY_FILE
+#   POLYFOLD_OPENAI_KEY_FILE     default ./OPEN_AI_KEY.txt, read on the first chat request
+#   POLYFOLD_CHAT_MODEL          default gpt-4o-mini
+#   POLYFOLD_CHAT_MODELS         comma-separated models a POST /stream body may pick
+#                                (always includes POLYFOLD_CHAT_MODEL); others get 400
+#   POLYFOLD_CHAT_MAX_CONCURRENCY  upstream requests in flight; the rest wait for a slot
+#   POLYFOLD_CHAT_CONNECTIONS    keep-alive connections in the shared pool
+#   POLYFOLD_CHAT_TIMEOUT_S      per-request upstream timeout
+#   POLYFOLD_CHAT_CACHE          1 (default) replays finished replies for repeated
+#                                conversations; 0 always goes upstream (sizes: app/cache.py)
+CHAT_MODEL: str = os.getenv("POLYFOLD_CHAT_MODEL", "gpt-4o-mini")
+CHAT_MODELS: FrozenSet[str] = frozenset(
+    [CHAT_MODEL] + [m.strip() for m in os.getenv("POLYFOLD_CHAT_MODELS", "").split(",") if m.strip()]
+)
+CHAT_TEMPERATURE = 0.3
+MAX_CONCURRENCY: int = int(os.getenv("POLYFOLD_CHAT_MAX_CONCURRENCY", "8"))
+CONNECTIONS: int = int(os.getenv("POLYFOLD_CHAT_CONNECTIONS", "20"))
+TIMEOUT_S: float = float(os.getenv("POLYFOLD_CHAT_TIMEOUT_S", "60"))
+KEY_FILE: str = os.getenv("POLYFOLD_OPENAI_KEY_FILE", "./OPEN_AI_KEY.txt")
+CACHE_ENABLED: bool = os.getenv("POLYFOLD_CHAT_CACHE", "1") != "0"
+CHAT_METHOD_ID = "openai.chat@v1"
+
+
+def _api_key() -> str:
+    key = os.getenv("OPENAI_API_KEY")
+    if key:
+        return key
+    path = Path(KEY_FILE)
+    if path.exists():
+        return path.read_text().strip()
+    if os.getenv("OPENAI_BASE_URL"):
+        return "local"  # OpenAI-compatible stubs ignore the key
+    raise RuntimeError(f"No OpenAI key: set OPENAI_API_KEY or create {KEY_FILE}")
+
+
+class _Upstream:
+    """AsyncOpenAI client (one pooled httpx client) + concurrency gate for one event loop."""
+
+    def __init__(self):
+        self.client = openai.AsyncOpenAI(
+            api_key=_api_key(),
+            timeout=TIMEOUT_S,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=CONNECTIONS,
+                                    max_keepalive_connections=CONNECTIONS),
+            ),
+        )
+        self.gate = asyncio.Semaphore(max(1, MAX_CONCURRENCY))
+
+
+# Clients and semaphores belong to the loop they were created on: uvicorn runs a
+# single loop, but test clients and benchmarks may bring their own. Entries are
+# keyed weakly on the loop object, so a finished loop drops its client (an id()
+# key could be reused by a later loop and hand it a dead loop's semaphore); the
+# app lifespan closes the serving loop's client on shutdown.
+_upstreams: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Upstream]" = weakref.WeakKeyDictionary()
+_upstreams_lock = threading.Lock()
+
+
+def _upstream() -> _Upstream:
+    loop = asyncio.get_running_loop()
+    with _upstreams_lock:
+        up = _upstreams.get(loop)
+        if up is None:
+            up = _upstreams[loop] = _Upstream()
+    return up
+
+
+async def close_upstream() -> None:
+    """Close the running loop's upstream client and its connection pool, if any."""
+    with _upstreams_lock:
+        up = _upstreams.pop(asyncio.get_running_loop(), None)
+    if up is not None:
+        await up.client.close()
+
+
+# -----------------------------------------------------------------------------
+# SSE framing
+# -----------------------------------------------------------------------------
+_NEWLINES = re.compile(r"\r\n|\r|\n")
+
+
+def sse_data(text: str) -> str:
+    """
+    One SSE event carrying `text`: every line gets its own `data:` field, so
+    newlines inside a token survive (the browser re-joins them with "\\n").
+    """
+    return "".join(f"data: {line}\n" for line in _NEWLINES.split(text)) + "\n"
+
+
+SSE_DONE = "data: [DONE]\n\n"
+
+
+# -----------------------------------------------------------------------------
+# Streaming completions
+# -----------------------------------------------------------------------------
+class ChatMetrics:
+    """Counters + recent time-to-first-token / total durations of upstream streams."""
+
+    def __init__(self, window: int = 512):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"requests": 0, "completed": 0, "cancelled": 0,
+                                         "errors": 0, "in_flight": 0, "waiting": 0,
+                                         "cache_hits": 0, "cache_misses": 0}
+        self.saved_upstream_s = 0.0  # upstream time the cache hits would have cost
+        self._ttft: Deque[float] = deque(maxlen=window)
+        self._total: Deque[float] = deque(maxlen=window)
+
+    def add(self, **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.counters[k] += v
+
+    def saved(self, seconds: float) -> None:
+        with self._lock:
+            self.saved_upstream_s += seconds
+
+    def observe(self, ttft: Optional[float], total: float) -> None:
+        with self._lock:
+            if ttft is not None:
+                self._ttft.append(ttft)
+            self._total.append(total)
+
+    @staticmethod
+    def _quantiles(values: List[float]) -> Dict[str, Optional[float]]:
+        if not values:
+            return {"p50": None, "p95": None}
+        values = sorted(values)
+        pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+        return {"p50": pick(0.5), "p95": pick(0.95)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+            counters = dict(self.counters)
+            saved = self.saved_upstream_s
+        lookups = counters["cache_hits"] + counters["cache_misses"]
+        return {**counters, "max_concurrency": MAX_CONCURRENCY, "model": CHAT_MODEL,
+                "base_url": os.getenv("OPENAI_BASE_URL"),
+                "ttft_ms": self._quantiles(ttft), "total_ms": self._quantiles(total),
+                "cache": {"enabled": CACHE_ENABLED,
+                          "hit_rate": round(counters["cache_hits"] / lookups, 4) if lookups else 0.0,
+                          "saved_upstream_s": round(saved, 3),
+                          "store": get_chat_cache().stats() if CACHE_ENABLED else None}}
+
+
+metrics = ChatMetrics()
+
+
+async def stream_completion(messages: List[Dict[str, Any]], model: Optional[str] = None,
+                            temperature: float = CHAT_TEMPERATURE) -> AsyncIterator[str]:
+    """
+    Yields content deltas of a streamed chat completion. Waits for a slot
+    under MAX_CONCURRENCY first. If the consumer goes away (client disconnect
+    cancels the response task), the upstream stream is closed in `finally`.
+    """
+    up = _upstream()
+    metrics.add(requests=1, waiting=1)
+    t0 = time.perf_counter()
+    ttft: Optional[float] = None
+    entered = False
+    outcome = "cancelled"
+    try:
+        async with up.gate:
+            entered = True
+            metrics.add(waiting=-1, in_flight=1)
+            stream = None
+            try:
+                stream = await up.client.chat.completions.create(
+                    model=model or CHAT_MODEL, messages=messages,
+                    temperature=temperature, stream=True,
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if ttft is None:
+                            ttft = time.perf_counter() - t0
+                        yield delta
+                outcome = "completed"
+            except Exception:
+                outcome = "errors"
+                raise
+            finally:
+                metrics.add(in_flight=-1)
+                if stream is not None:
+                    await stream.close()
+    finally:
+        if not entered:  # cancelled while queued for a slot
+            metrics.add(waiting=-1)
+        metrics.add(**{outcome: 1})
+        metrics.observe(ttft, time.perf_counter() - t0)
+
+
+# -----------------------------------------------------------------------------
+# Reply cache
+# -----------------------------------------------------------------------------
+# Repeated questions (same normalized history, model and temperature) are served
+# from `get_chat_cache()` and replayed as the same token events. Normalizing also
+# keeps the message prefix byte-identical across turns (no empty assistant stubs,
+# no stray whitespace), which is what upstream prompt caching keys on.
+def normalize_messages(messages: List[Any]) -> List[Dict[str, str]]:
+    """role/content pairs with stripped content; empty assistant turns dropped."""
+    out: List[Dict[str, str]] = []
+    for m in messages or []:
+        if not isinstance(m, dict):
+            continue
+        role = str(m.get("role") or "user").strip().lower()
+        content = m.get("content")
+        if not isinstance(content, str):
+            content = "" if content is None else json.dumps(content, ensure_ascii=False)
+        content = content.strip()
+        if role == "assistant" and not content:
+            continue
+        out.append({"role": role, "content": content})
+    return out
+
+
+def reply_cache_key(messages: List[Dict[str, str]], model: str, temperature: float) -> str:
+    """Whitespace runs are collapsed, so reflowed but identical questions share a key."""
+    canon = [[m["role"], " ".join(m["content"].split())] for m in messages]
+    return make_cache_key(CHAT_METHOD_ID, model, repr(float(temperature)),
+                          json.dumps(canon, ensure_ascii=False, separators=(",", ":")))
+
+
+def cached_reply(key: str) -> Optional[Dict[str, Any]]:
+    """The stored reply for `key` (counted as a hit / miss), or None."""
+    if not CACHE_ENABLED:
+        return None
+    entry = get_chat_cache().get(key)
+    if entry is None:
+        metrics.add(cache_misses=1)
+        return None
+    metrics.add(cache_hits=1)
+    metrics.saved(entry.get("upstream_s", 0.0))
+    return entry
+
+
+async def replay(entry: Dict[str, Any]) -> AsyncIterator[str]:
+    for delta in entry["deltas"]:
+        yield delta
+
+
+async def stream_and_store(messages: List[Dict[str, str]], key: str, model: Optional[str] = None,
+                           temperature: float = CHAT_TEMPERATURE) -> AsyncIterator[str]:
+    """`stream_completion`, storing the reply under `key` once it completed."""
+    deltas: List[str] = []
+    t0 = time.perf_counter()
+    ttft: Optional[float] = None
+    async for delta in stream_completion(messages, model=model, temperature=temperature):
+        if ttft is None:
+            ttft = time.perf_counter() - t0
+        deltas.append(delta)
+        yield delta
+    if CACHE_ENABLED and deltas:
+        get_chat_cache().put(key, {
+            "deltas": deltas, "model": model or CHAT_MODEL, "temperature": temperature,
+            "upstream_s": round(time.perf_counter() - t0, 4),
+            "ttft_s": round(ttft or 0.0, 4), "created_at": time.time(),
+        })
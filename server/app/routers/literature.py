@@ -1,12 +1,37 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse
 from pathlib import Path
-import uuid
+from starlette.concurrency import run_in_threadpool
+import hashlib
+import os
+import re
+import tempfile
+from typing import Any, Dict, List
+
+try:  # python-multipart >= 0.0.13 installs as `python_multipart`
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from ..instrument import span
+from ..store import get_repository
+from .literature_extract import extraction_status, submit_extraction
 
 router = APIRouter()
 STATIC = Path(__file__).resolve().parents[1] / "static"
 PDFS = STATIC
 
+# Uploads are parsed straight off the request body (no spooled UploadFile):
+# the multipart `file` part is streamed to disk as it arrives (file I/O off the
+# event loop) and the request is rejected with 413 as soon as it passes
+# POLYFOLD_UPLOAD_MAX_BYTES, or up front when Content-Length already does. The
+# SHA-256 of the content is the source_id, so the same paper is stored once.
+UPLOAD_MAX_BYTES = int(os.getenv("POLYFOLD_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # boundaries, part headers, small extra fields
+_SHA256_ID = re.compile(r"sha256_[0-9a-f]{64}")
+
 
 @router.get("/pdfs")
 def list_pdfs():
@@ -24,35 +49,174 @@ def list_pdfs():
     ]
 
 
+def _pdf_path(source_id: str) -> Path | None:
+    """The stored file behind an uploaded source_id (None for the mock catalogue)."""
+    if _SHA256_ID.fullmatch(source_id):
+        fpath = PDFS / f"{source_id}.pdf"
+    elif source_id.startswith("uploaded_"):  # pre-hashing uploads
+        fpath = STATIC / f"{source_id.replace('uploaded_', '')}.pdf"  # 'upload_<hash>'
+    else:
+        return None
+    return fpath if fpath.exists() else None
+
+
 @router.get("/pdfs/{source_id}/content")
 def pdf_content(source_id: str):
-    if source_id.startswith("uploaded_"):
-        stem = source_id.replace("uploaded_", "")  # 'upload_<hash>'
-        fpath = STATIC / f"{stem}.pdf"
-        if fpath.exists():
-            return FileResponse(
-                fpath, media_type="application/pdf", filename=fpath.name
-            )
+    fpath = _pdf_path(source_id)
+    if fpath is not None:
+        return FileResponse(fpath, media_type="application/pdf", filename=fpath.name)
+    if _SHA256_ID.fullmatch(source_id):
+        raise HTTPException(status_code=404, detail=f"Unknown source '{source_id}'")
     return FileResponse(
         STATIC / "sample.pdf", media_type="application/pdf", filename="sample.pdf"
     )
 
 
-@router.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    target = PDFS / f"upload_{uuid.uuid4().hex[:8]}.pdf"
-    data = await file.read()
-    if not data:
-        data = (STATIC / "sample.pdf").read_bytes()
-    target.write_bytes(data)
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"PDF exceeds the {UPLOAD_MAX_BYTES}-byte limit (POLYFOLD_UPLOAD_MAX_BYTES)",
+    )
+
+
+class _FilePart:
+    """
+    python-multipart callbacks: collects the bytes of the `file` form field
+    between feeds (other fields are ignored) so the handler can hash and write
+    them per received chunk. `complete` is set once that part's closing
+    boundary arrived and `closed` once the whole body's did.
+    """
+
+    def __init__(self):
+        self.found = self.complete = self.closed = False
+        self.pending: List[bytes] = []
+        self._header = self._value_buf = self._disposition = b""
+        self._in_file = False
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self._begin,
+            "on_header_field": self._field,
+            "on_header_value": self._value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_done,
+            "on_part_data": self._data,
+            "on_part_end": self._end,
+            "on_end": self._close,
+        }
+
+    def _begin(self) -> None:
+        self._header = self._value_buf = self._disposition = b""
+        self._in_file = False
+
+    def _field(self, data: bytes, start: int, end: int) -> None:
+        self._header += data[start:end]
+        self._value_buf = b""
+
+    def _value(self, data: bytes, start: int, end: int) -> None:
+        self._value_buf += data[start:end]
+
+    def _header_end(self) -> None:
+        if self._header.lower() == b"content-disposition":
+            self._disposition = self._value_buf
+        self._header = b""
+
+    def _headers_done(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._in_file = options.get(b"name") == b"file" and not self.found
+        self.found = self.found or self._in_file
+
+    def _data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.pending.append(data[start:end])
+
+    def _end(self) -> None:
+        self.complete = self.complete or self._in_file
+        self._in_file = False
+
+    def _close(self) -> None:
+        self.closed = True
+
+    def take(self) -> List[bytes]:
+        chunks, self.pending = self.pending, []
+        return chunks
+
+
+@router.post("/upload", openapi_extra={"requestBody": {"required": True, "content": {
+    "multipart/form-data": {"schema": {"type": "object", "required": ["file"],
+                                       "properties": {"file": {"type": "string", "format": "binary"}}}},
+}}})
+async def upload_pdf(request: Request):
+    """
+    Streams the `file` part of a multipart body into a temp file next to the
+    PDFs while hashing it, then renames it to `sha256_<hex>.pdf` (or drops it
+    when that file already exists). Nothing is spooled before this runs.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+        raise _too_large()
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body with a 'file' field")
+
+    part = _FilePart()
+    parser = MultipartParser(boundary, part.callbacks())
+    digest = hashlib.sha256()
+    size = received = 0
+    fd, tmp_name = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=PDFS)
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for body in request.stream():
+                received += len(body)
+                if received > UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+                    raise _too_large()
+                try:
+                    parser.write(body)
+                except MultipartParseError as e:
+                    raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+                chunks = part.take()
+                if not chunks:
+                    continue
+                size += sum(len(c) for c in chunks)
+                if size > UPLOAD_MAX_BYTES:
+                    raise _too_large()
+                for c in chunks:
+                    digest.update(c)
+                with span("file_io"):
+                    await run_in_threadpool(out.writelines, chunks)
+        parser.finalize()
+        if not part.found:
+            raise HTTPException(status_code=400, detail="Missing 'file' field")
+        if not (part.complete and part.closed):
+            raise HTTPException(status_code=400, detail="Truncated multipart body")
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+
+        source_id = f"sha256_{digest.hexdigest()}"
+        target = PDFS / f"{source_id}.pdf"
+        deduplicated = target.exists()
+        with span("file_io"):
+            if deduplicated:
+                await run_in_threadpool(tmp.unlink)
+            else:
+                await run_in_threadpool(os.replace, tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    extraction = await run_in_threadpool(submit_extraction, source_id, target)
     return {
-        "source_id": f"uploaded_{target.stem}",
+        "source_id": source_id,
         "file_url": f"/static/{target.name}",
+        "bytes": size,
+        "deduplicated": deduplicated,
+        "extraction": {"run_id": extraction["run_id"], "status": extraction["status"]},
     }
 
 
-@router.get("/pdfs/{source_id}/canonical-properties")
-def canonical_props(source_id: str):
+def _mock_properties(source_id: str):
     props = [
         {
             "property_id": "prop_001",
@@ -81,4 +245,45 @@ def canonical_props(source_id: str):
             "confidence": 0.8,
         },
     ]
+    for p in props:  # ids scoped to the source so they stay unique in the repository
+        p["property_id"] = f"{source_id}/{p['property_id']}"
     return props
+
+
+@router.get("/pdfs/{source_id}/canonical-properties")
+def canonical_props(source_id: str, limit: int = 100, cursor: int | None = None):
+    """
+    Extracted properties of an uploaded PDF, read from the repository. While
+    its extraction runs this answers 202 `{status: "pending", run}`; a PDF
+    whose extraction was never started (e.g. uploaded before a restart) is
+    submitted on first request. Any other id gets the fixed mock rows, which
+    are never stored (one page, no cursor).
+    """
+    path = _pdf_path(source_id)
+    if path is None and _SHA256_ID.fullmatch(source_id):
+        raise HTTPException(status_code=404, detail=f"Unknown source '{source_id}'")
+    if path is None:
+        return _mock_properties(source_id)[:max(1, limit)] if cursor is None else []
+
+    run = submit_extraction(source_id, path)
+    if run["status"] == "running":
+        return JSONResponse(status_code=202,
+                            content={"status": "pending", "source_id": source_id, "run": run})
+    if run["status"] == "failed":
+        raise HTTPException(status_code=422, detail={"status": "failed", "run": run})
+    return get_repository().list_properties(source_id=source_id, limit=limit, cursor=cursor)["items"]
+
+
+@router.get("/pdfs/{source_id}/extraction")
+def extraction(source_id: str):
+    """
+    The extraction Run of an uploaded PDF (status, pages, counters, timings).
+    A failed Run past its retry interval is re-submitted and returned running.
+    """
+    run = extraction_status(source_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"No extraction for '{source_id}'")
+    path = _pdf_path(source_id)
+    if run["status"] == "failed" and path is not None:
+        run = submit_extraction(source_id, path)
+    return run
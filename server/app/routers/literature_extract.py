@@ -0,0 +1,354 @@
+# server/app/routers/literature_extract.py
+from __future__ import annotations
+
+import datetime as dt
+import importlib.util
+import mmap
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..cache import make_cache_key
+from ..instrument import span, trace
+from ..lazy import LazyModule
+from ..models import Property, Run
+from ..store import get_repository
+
+pypdf = LazyModule("pypdf")
+
+# -----------------------------------------------------------------------------
+# Page text
+# -----------------------------------------------------------------------------
+# pypdf (optional) yields real page text one page at a time. Without it, the
+# fallback walks the file's Flate/uncompressed content streams through an mmap
+# and reads the literal strings of their text operators, one content stream at
+# a time (nothing beyond the current stream is held in memory). Streams are not
+# mapped back to page objects, so fallback results are numbered by "stream"
+# (TEXT_UNIT), never labelled as pages.
+TEXT_METHOD_ID = "pdf.text@v1"
+EXTRACT_METHOD_ID = "literature.quantities@v1"
+HAVE_PYPDF = importlib.util.find_spec("pypdf") is not None
+TEXT_UNIT = "page" if HAVE_PYPDF else "stream"
+
+_STREAM = re.compile(rb"stream\r?\n")
+_SKIP_STREAMS = (b"/Image", b"/FontFile", b"/Length1", b"/XRef", b"/ObjStm", b"/Metadata")
+_TEXT_TOKEN = re.compile(rb"\((?:\\.|[^\\)])*\)|\bT[dD]\b|\bT\*|\bET\b|'")
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _unescape(literal: bytes) -> str:
+    out = re.sub(
+        rb"\\([0-7]{1,3}|.)",
+        lambda m: (bytes([int(m.group(1), 8) & 0xFF]) if m.group(1)[:1].isdigit()
+                   else _ESCAPES.get(m.group(1), m.group(1))),
+        literal, flags=re.S,
+    )
+    return out.decode("latin-1")
+
+
+def _content_text(content: bytes) -> str:
+    parts: List[str] = []
+    for m in _TEXT_TOKEN.finditer(content):
+        token = m.group(0)
+        if token.startswith(b"("):
+            parts.append(_unescape(token[1:-1]))
+        elif parts and not parts[-1].endswith(("\n", " ")):
+            parts.append("\n" if token in (b"T*", b"'", b"ET") else " ")
+    return "".join(parts)
+
+
+def _iter_stream_texts(path: Path) -> Iterator[str]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while (m := _STREAM.search(mm, pos)) is not None:
+            end = mm.find(b"endstream", m.end())
+            if end < 0:
+                break
+            pos = end + len(b"endstream")
+            head = mm[max(0, m.start() - 512):m.start()]
+            head = head[head.rfind(b"<<"):]
+            if any(tag in head for tag in _SKIP_STREAMS):
+                continue
+            data = mm[m.end():end]
+            if b"/FlateDecode" in head:
+                try:
+                    data = zlib.decompressobj().decompress(data)
+                except zlib.error:
+                    continue
+            elif b"/Filter" in head:
+                continue
+            if b"BT" in data:
+                text = _content_text(data)
+                if text.strip():
+                    yield text
+
+
+def iter_page_texts(path: Path) -> Iterator[str]:
+    """Text of each page in order (of each text content stream without pypdf)."""
+    if HAVE_PYPDF:
+        for page in pypdf.PdfReader(str(path)).pages:
+            yield page.extract_text() or ""
+    else:
+        yield from _iter_stream_texts(path)
+
+
+# -----------------------------------------------------------------------------
+# Quantity extraction
+# -----------------------------------------------------------------------------
+# "470 ± 1.45 µL", "60 °C", "24 h", "1:4 molar ratio" -> Property rows. The
+# unit decides the property name and category; the nearest role keyword before
+# the value in the same sentence (EGDMA -> cross-linker, AIBN -> initiator, ...)
+# becomes qualifiers.role for recipe quantities. A unit only counts as a whole
+# token from _UNITS (so "4 L-proline", "100 s⁻¹" or "3 K+" are not quantities),
+# and numbers that label figures, tables, schemes, equations or compounds are
+# skipped.
+_UNITS: Dict[str, Tuple[str, str]] = {
+    "µL": ("volume", "recipe"), "mL": ("volume", "recipe"), "L": ("volume", "recipe"),
+    "mg": ("mass", "recipe"), "g": ("mass", "recipe"), "kg": ("mass", "recipe"),
+    "µmol": ("amount", "recipe"), "mmol": ("amount", "recipe"), "mol": ("amount", "recipe"),
+    "µM": ("concentration", "recipe"), "mM": ("concentration", "recipe"), "M": ("concentration", "recipe"),
+    "mg/mL": ("concentration", "recipe"),
+    "°C": ("temperature", "conditions"), "K": ("temperature", "conditions"),
+    "h": ("time", "conditions"), "min": ("time", "conditions"), "s": ("time", "conditions"),
+    "rpm": ("stirring_rate", "conditions"),
+    "nm": ("particle_size", "characterization"), "µm": ("particle_size", "characterization"),
+    "m²/g": ("surface_area", "characterization"), "g/mol": ("molar_mass", "characterization"),
+    "wt%": ("fraction", "recipe"), "%": ("percentage", "characterization"),
+}
+_UNIT_ALIASES = {"uL": "µL", "umol": "µmol", "uM": "µM", "um": "µm", "m2/g": "m²/g",
+                 "m2 g-1": "m²/g", "m² g⁻¹": "m²/g", "° C": "°C", "wt %": "wt%"}
+_UNIT_PATTERN = "|".join(re.escape(u) for u in sorted([*_UNITS, *_UNIT_ALIASES], key=len, reverse=True))
+_NUMBER = r"\d+(?:\.\d+)?"
+_UNIT_END = r"(?=$|[\s,;:)\]]|\.(?!\d))"  # whitespace, punctuation, or a full stop
+QUANTITY = re.compile(
+    rf"(?<![\w.,])(?P<value>-?{_NUMBER})"
+    rf"(?:\s*(?:±|\+/-|\+-)\s*(?P<error>{_NUMBER}))?"
+    rf"\s*(?P<unit>{_UNIT_PATTERN}){_UNIT_END}"
+)
+_LABEL_BEFORE = re.compile(r"\b(?:fig(?:ure)?s?|tables?|schemes?|eqs?|equations?|entry|entries|"
+                           r"compounds?|refs?|sections?)\.?\s*$", re.I)
+RATIO = re.compile(rf"(?<![\w.,:])(?P<a>{_NUMBER})\s*:\s*(?P<b>{_NUMBER})(?:\s*:\s*(?P<c>{_NUMBER}))?(?![\w:]|\.\d)")
+_RATIO_WORDS = re.compile(r"ratio", re.I)
+_ROLES: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("cross-linker", re.compile(r"cross-?link\w*|EGDMA|TRIM|DVB|divinylbenzene", re.I)),
+    ("initiator", re.compile(r"initiator|AIBN|ABDV|persulfate", re.I)),
+    ("template", re.compile(r"template", re.I)),
+    ("porogen", re.compile(r"porogen|solvent|toluene|acetonitrile|chloroform|DMSO", re.I)),
+    ("monomer", re.compile(r"monomer|MAA|methacrylic|vinylpyridine|4-VP|acrylamide", re.I)),
+]
+ROLE_WINDOW = 80
+CONTEXT_CHARS = 160
+_SENTENCE_END = re.compile(r"\.(?=\s|[A-Z])")  # not decimal points
+
+
+def _role(before: str) -> Optional[str]:
+    best, best_pos = None, -1
+    for role, pattern in _ROLES:
+        for m in pattern.finditer(before):
+            if m.start() > best_pos:
+                best, best_pos = role, m.start()
+    return best
+
+
+def _sentence_start(text: str, start: int) -> int:
+    lo = max(0, start - CONTEXT_CHARS)
+    ends = [m.end() for m in _SENTENCE_END.finditer(text, lo, start)]
+    return ends[-1] if ends else lo
+
+
+def _context(text: str, start: int, end: int) -> str:
+    left = max(_sentence_start(text, start), start - CONTEXT_CHARS // 2)
+    m = _SENTENCE_END.search(text, end, end + CONTEXT_CHARS // 2)
+    right = m.start() + 1 if m else end + CONTEXT_CHARS // 2
+    return " ".join(text[left:right].split())
+
+
+def extract_quantities(text: str, source_id: str, page: int, page_key: str = "page") -> List[Dict[str, Any]]:
+    """
+    Properties found on one page of text (value ± error + unit, and molar
+    ratios). `page_key` names what `page` counts: "page", or "stream" for the
+    content-stream fallback; it is the key used in qualifiers / provenance.
+    """
+    text = text.replace("μ", "µ")  # Greek mu -> micro sign
+    found: List[Tuple[int, int, Dict[str, Any]]] = []
+    for m in QUANTITY.finditer(text):
+        if _LABEL_BEFORE.search(text, max(0, m.start() - 16), m.start()):
+            continue
+        unit = _UNIT_ALIASES.get(m.group("unit"), m.group("unit"))
+        name, category = _UNITS[unit]
+        error = m.group("error")
+        found.append((m.start(), m.end(), {
+            "name": name, "category": category, "units": unit,
+            "value": float(m.group("value")), "error": float(error) if error else None,
+        }))
+    for m in RATIO.finditer(text):
+        window = text[max(0, m.start() - 40):m.end() + 40]
+        if not _RATIO_WORDS.search(window) or float(m.group("b")) == 0:
+            continue
+        found.append((m.start(), m.end(), {
+            "name": "molar_ratio", "category": "recipe", "units": "mol/mol",
+            "value": float(m.group("a")) / float(m.group("b")), "error": None,
+        }))
+
+    props: List[Dict[str, Any]] = []
+    for start, end, q in sorted(found, key=lambda f: f[0]):
+        role = None
+        if q["category"] == "recipe":
+            role = _role(text[max(_sentence_start(text, start), start - ROLE_WINDOW):start])
+        confidence = 0.6 + (0.2 if q["error"] is not None else 0.0) + (0.1 if role else 0.0)
+        raw = text[start:end]
+        prop = Property(
+            property_id=f"{source_id}/{page_key[0]}{page:03d}_{start:06d}",
+            name=q["name"],
+            cache_key=make_cache_key(EXTRACT_METHOD_ID, source_id, page_key, str(page), str(start)),
+            value=q["value"], units=q["units"], category=q["category"],
+            context=_context(text, start, end),
+            qualifiers={"role": role, page_key: page} if role else {page_key: page},
+            provenance={"source_id": source_id, "method_id": EXTRACT_METHOD_ID, page_key: page},
+            confidence=round(confidence, 2),
+        ).model_dump()
+        props.append({**prop, "error": q["error"], "raw_value": " ".join(raw.split()),
+                      "source_id": source_id})
+    return props
+
+
+def extract_pdf(path: str, source_id: str) -> Dict[str, Any]:
+    """Worker entry point: stream pages of `path`, extract quantities page by page."""
+    t0 = time.perf_counter()
+    props: List[Dict[str, Any]] = []
+    pages = 0
+    with trace() as t:
+        texts = iter_page_texts(Path(path))
+        while True:
+            with span("pdf_text"):
+                text = next(texts, None)
+            if text is None:
+                break
+            pages += 1
+            with span("quantity_extraction"):
+                props.extend(extract_quantities(text, source_id, pages, TEXT_UNIT))
+    return {f"{TEXT_UNIT}s": pages, "properties": props, "text_unit": TEXT_UNIT,
+            "text_method": "pypdf" if HAVE_PYPDF else "content-streams",
+            "duration_s": round(time.perf_counter() - t0, 3), "timings": t.totals()}
+
+
+# -----------------------------------------------------------------------------
+# Background extraction, one Run per (extractor version, content hash)
+# -----------------------------------------------------------------------------
+# Results live in the repository: the Run records status ("running" while the
+# pool works => `pending` to callers) and the properties are stored under the
+# source_id, which for uploads is the SHA-256 of the file. A finished Run means
+# later requests are plain repository reads; a new extractor version re-runs.
+# A failed Run is not final: the next submit after POLYFOLD_EXTRACT_RETRY_S
+# (default 60; 0 = immediately) extracts again, so one transient failure does
+# not poison the source.
+EXTRACT_WORKERS: int = int(os.getenv("POLYFOLD_EXTRACT_WORKERS", "2"))
+EXTRACT_RETRY_S: float = float(os.getenv("POLYFOLD_EXTRACT_RETRY_S", "60"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}  # run_id -> pool future
+_inflight_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, EXTRACT_WORKERS),
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extraction_run_id(source_id: str) -> str:
+    return "RUN_extract_" + make_cache_key(TEXT_METHOD_ID, EXTRACT_METHOD_ID, source_id)[:16]
+
+
+def extraction_status(source_id: str) -> Optional[Dict[str, Any]]:
+    """The extraction Run for `source_id` (None if never submitted)."""
+    return get_repository().get_run(extraction_run_id(source_id))
+
+
+def _finish(run: Run, future: Future, pool: ProcessPoolExecutor) -> None:
+    repo = get_repository()
+    try:
+        result = future.result()
+        props = result.pop("properties")
+        repo.add_properties(props, source="literature")
+        run.status = "done"
+        run.counters = {"created": len(props), "skipped": 0, "errors": 0}
+        run.provenance.update(result)
+    except sqlite3.Error as e:
+        run.status, run.counters["errors"] = "failed", 1
+        run.provenance["store_error"] = repr(e)
+    except BrokenProcessPool as e:  # respawn it for the retry
+        run.status, run.counters["errors"] = "failed", 1
+        run.provenance["error"] = repr(e)
+        _drop_pool(pool)  # the pool that ran this job; a newer one is left alone
+    except Exception as e:  # worker raised
+        run.status, run.counters["errors"] = "failed", 1
+        run.provenance["error"] = repr(e)
+    run.finished_at = dt.datetime.utcnow().isoformat() + "Z"
+    try:
+        repo.save_run(run.model_dump())
+    finally:
+        with _inflight_lock:
+            _inflight.pop(run.run_id, None)
+
+
+def _retry_due(run: Dict[str, Any]) -> bool:
+    """A failed Run whose retry interval has passed."""
+    if run["status"] != "failed":
+        return False
+    try:
+        finished = dt.datetime.fromisoformat(str(run.get("finished_at") or "").rstrip("Z"))
+    except ValueError:
+        return True
+    return (dt.datetime.utcnow() - finished).total_seconds() >= EXTRACT_RETRY_S
+
+
+def submit_extraction(source_id: str, path: Path) -> Dict[str, Any]:
+    """
+    Starts extracting `path` unless a Run for this content already exists
+    (done, running in this process, or failed less than EXTRACT_RETRY_S ago).
+    Returns that Run.
+    """
+    run_id = extraction_run_id(source_id)
+    repo = get_repository()
+    with _inflight_lock:
+        existing = repo.get_run(run_id)
+        if existing is not None and run_id in _inflight:
+            return existing
+        if existing is not None and existing["status"] != "running" and not _retry_due(existing):
+            return existing
+        attempt = existing.get("provenance", {}).get("attempt", 1) + 1 if existing else 1
+        run = Run(run_id=run_id, name="literature/extract", status="running",
+                  method_graph=[TEXT_METHOD_ID, EXTRACT_METHOD_ID],
+                  selector={"source_id": source_id}, provenance={"attempt": attempt})
+        repo.save_run(run.model_dump())
+        pool = _get_pool()
+        try:
+            future = pool.submit(extract_pdf, str(path), source_id)
+        except BrokenProcessPool:  # broke since its last job finished
+            _drop_pool(pool)
+            pool = _get_pool()
+            future = pool.submit(extract_pdf, str(path), source_id)
+        _inflight[run_id] = future
+    future.add_done_callback(lambda f: _finish(run, f, pool))
+    return run.model_dump()
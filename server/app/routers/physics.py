@@ -1,53 +1,269 @@
-from fastapi import APIRouter
-from fastapi.responses import Response
-from ..models import ChemicalStructure, Property, Run
-from pathlib import Path
-import uuid
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from ..cache import get_step_cache, make_cache_key
+from ..models import Property
+from ..store import MAX_PAGE, get_repository
+from .physics_engine import get_run, submit_run
+from .physics_methods import WORKERS, canonical_smiles
+from .physics_search import get_fingerprint_index
+from .physics_screening import SCREEN_MAX_COMBINATIONS, Screen, expand_combinations
+from .physics_xyz import (
+    BIN_MEDIA_TYPE,
+    binary_file,
+    encode_xyz_binary,
+    frame_index,
+    frame_range,
+    list_xyz,
+    resolve_xyz,
+    stream_binary_frames,
+    stream_span,
+)
+import json
+import math
 router = APIRouter()
-STATIC = Path(__file__).resolve().parents[1] / "static"
 @router.get("/workers")
 def workers():
-    items = [
-        {"method_id":"chem.mol/etkdg-mmff@v1","arity":1,"roles":["structure"],"category":"geometry.conformer"},
-        {"method_id":"fast_structure/pack_pose_xyz@v1","arity":2,"roles":["A","B"],"category":"packing.pose"},
-        {"method_id":"qm/xtb_sp@v1","arity":1,"roles":["structure"],"category":"energy.single_point"},
-        {"method_id":"qm/xtb_sp_complex_xyz@v1","arity":1,"roles":["complex.xyz"],"category":"energy.single_point"},
-        {"method_id":"qm/deltaE@v1","arity":1,"roles":["energies"],"category":"energy.aggregation"},
-    ]
-    return items
+    return WORKERS
+LIBRARY = [
+    {"smiles": "C=CC1=CC=NC=C1", "synonyms": ["4-VP"], "tags": ["monomer"]},
+    {"smiles": "C=CC(=O)O", "synonyms": ["AA"], "tags": ["monomer"]},
+    {"smiles": "C1CC2CCC3C(C1)CCC4=CC(=O)CCC234", "synonyms": ["Template_Estradiol"], "tags": ["template"]},
+    {"smiles": "CC1=CC=CC=C1", "synonyms": ["Porogen_Toluene"], "tags": ["porogen"]},
+]
+DEMO_PROPERTY = Property(
+    property_id="PR_sample_deltaE", name="qm/deltaE@v1",
+    cache_key=make_cache_key("qm/deltaE@v1", "/static/sample.xyz"),
+    value=-22.4, units="kJ/mol", category="energy.aggregation", context="complex-level",
+    qualifiers={"artifacts": {"pose_xyz_paths": ["/static/sample.xyz"]}},
+    provenance={"demo": True},
+).model_dump()
+_seeded = False
+def _repo():
+    """Shared repository, with the built-in library upserted once per process."""
+    global _seeded
+    repo = get_repository()
+    if not _seeded:
+        repo.upsert_structures({**s, "source": "library"} for s in LIBRARY)
+        repo.add_properties([DEMO_PROPERTY], source="physics")
+        _seeded = True
+    return repo
 @router.get("/structures")
-def structures(tag: str | None = None):
-    def mk(name, smiles, tags):
-        return ChemicalStructure(
-            chemical_structure_id="CS_"+uuid.uuid4().hex[:6],
-            inchikey="IK_"+uuid.uuid4().hex[:14].upper(),
-            smiles=smiles,
-            synonyms=[name],
-            tags=tags
-        ).model_dump()
-    pool = [
-        mk("4-VP", "C=CC1=CC=NC=C1", ["monomer"]),
-        mk("AA", "C=CC(=O)O", ["monomer"]),
-        mk("Template_Estradiol", "C1CC2CCC3C(C1)CCC4=CC(=O)CCC234", ["template"]),
-        mk("Porogen_Toluene", "CC1=CC=CC=C1", ["porogen"]),
-    ]
-    if tag:
-        return [p for p in pool if tag in p["tags"]]
-    return pool
+def structures(response: Response, tag: str | None = None, limit: int = 100, cursor: int | None = None):
+    """Stored structures (library + designer candidates), keyset-paginated via X-Next-Cursor."""
+    page = _repo().list_structures(tag=tag, limit=limit, cursor=cursor)
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = str(page["next_cursor"])
+    return page["items"]
+@router.get("/structures/search/similar")
+def similar_structures(smiles: str, k: int = 10, threshold: float = 0.0, tag: str | None = None):
+    """Tanimoto top-k (Morgan r=2, 2048 bits) over stored structures, optionally within a tag."""
+    _repo()
+    return get_fingerprint_index().similar(smiles, k=max(1, min(k, MAX_PAGE)), threshold=threshold, tag=tag)
+@router.get("/structures/search/substructure")
+def substructure_structures(query: str, limit: int = 100, tag: str | None = None):
+    """Structures containing `query` (SMILES or SMARTS): pattern-fingerprint screen, then RDKit match."""
+    _repo()
+    return get_fingerprint_index().substructure(query, limit=max(1, min(limit, MAX_PAGE)), tag=tag)
+@router.get("/structures/search/stats")
+def search_stats():
+    return get_fingerprint_index().stats()
+@router.get("/structures/{ref}")
+def structure(ref: str):
+    found = _repo().get_structure(ref)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown structure '{ref}'")
+    return found
+def _resolve(ref):
+    """inchikey / chemical_structure_id / synonym / SMILES from the repository, else a raw SMILES."""
+    found = _repo().get_structure(ref)
+    if found is not None:
+        return {"name": found["synonyms"][0] if found["synonyms"] else found["smiles"],
+                "smiles": canonical_smiles(found["smiles"])}
+    return {"name": ref, "smiles": canonical_smiles(ref)}
+def _int_field(payload: dict, key: str, minimum: int | None = None, default: int | None = None):
+    """Optional integer in a JSON payload (None when absent); 400 for anything else."""
+    value = payload.get(key)
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or minimum is not None and number < minimum:
+        bound = f" >= {minimum}" if minimum is not None else ""
+        raise HTTPException(status_code=400, detail=f"`{key}` must be an integer{bound}, got {value!r}")
+    return number
+def _wait_field(payload: dict):
+    """`wait`: absent/false/0 -> don't wait; true -> until done (None); seconds >= 0 otherwise."""
+    wait = payload.get("wait")
+    if wait is None or wait is False:
+        return False, None
+    if wait is True:
+        return True, None
+    try:
+        seconds = float(wait)
+    except (TypeError, ValueError):
+        seconds = math.nan
+    if not math.isfinite(seconds) or seconds < 0:
+        raise HTTPException(status_code=400, detail=f"`wait` must be true or a number of seconds >= 0, got {wait!r}")
+    return seconds > 0, seconds
 @router.post("/runs")
 def create_run(payload: dict):
-    run = Run(run_id="RUN_"+uuid.uuid4().hex[:8], name="physics-engine", status="running")
-    steps = [{"run_step_id":"ST_"+uuid.uuid4().hex[:6], "run_id":run.run_id, "method_id":m, "status":"queued"} for m in payload.get("workers", [])]
-    return {"run": run.model_dump(), "steps": steps}
+    """
+    Builds the step DAG for the selected workers over template / monomers /
+    porogen and starts it on the physics worker pool. Returns immediately with
+    queued steps unless `wait` (seconds, or true) is given; poll GET /runs/{run_id}.
+    Steps already computed for identical inputs are reused ("skipped") unless
+    `cache` is false.
+    """
+    known = {w["method_id"] for w in WORKERS}
+    unknown = [m for m in payload.get("workers", []) if m not in known]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown worker method(s): {unknown}")
+    should_wait, timeout = _wait_field(payload)
+    max_concurrency = _int_field(payload, "max_concurrency", minimum=1)
+    template = _resolve(payload["template"]) if payload.get("template") else None
+    porogen = _resolve(payload["porogen"]) if payload.get("porogen") else None
+    monomers = [_resolve(m) for m in payload.get("monomers", []) if m]
+    structures = [s for s in [template, *monomers, porogen] if s]
+    pairs = [(template, m) for m in monomers] if template else []
+    execution = submit_run(
+        structures, pairs, payload.get("workers", []),
+        selector={"template": template, "monomers": monomers, "porogen": porogen},
+        max_concurrency=max_concurrency,
+        use_cache=payload.get("cache", True) is not False,
+    )
+    if should_wait:
+        execution.wait(timeout)
+    return execution.snapshot()
+def _pool(refs, tag):
+    """List of refs, or "*" for every library structure tagged `tag`."""
+    if refs == "*":
+        return [_resolve(p["chemical_structure_id"])
+                for p in _repo().list_structures(tag=tag, limit=MAX_PAGE)["items"]]
+    return [_resolve(r) for r in (refs or []) if r]
+@router.post("/screens")
+def create_screen(payload: dict):
+    """
+    Combinatorial screen over templates x porogens x monomers (each a list of refs,
+    or "*" for the tagged library pool; porogens optional). `sample` draws that many
+    combinations (seeded by `seed`). All combinations share one step DAG, so common
+    upstream steps run once. Streams SSE events: "screen", one "combination" per
+    grid point as its deltaE(s) finish, then "done" with the run (also pollable
+    via GET /runs/{run_id}).
+    """
+    known = {w["method_id"] for w in WORKERS}
+    unknown = [m for m in payload.get("workers", []) if m not in known]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown worker method(s): {unknown}")
+    sample = _int_field(payload, "sample", minimum=1)
+    seed = _int_field(payload, "seed", default=0)
+    max_concurrency = _int_field(payload, "max_concurrency", minimum=1)
+    templates = _pool(payload.get("templates"), "template")
+    porogens = _pool(payload.get("porogens"), "porogen")
+    monomers = _pool(payload.get("monomers"), "monomer")
+    if not templates or not monomers:
+        raise HTTPException(status_code=400, detail="At least one template and one monomer are required")
+    combos = expand_combinations(templates, porogens, monomers,
+                                 sample=sample, seed=seed)
+    if len(combos) > SCREEN_MAX_COMBINATIONS:
+        raise HTTPException(status_code=400, detail=(
+            f"{len(combos)} combinations exceed the limit of {SCREEN_MAX_COMBINATIONS}; "
+            "pass `sample` to screen a subset"))
+    screen = Screen(
+        combos, payload.get("workers", []),
+        selector={"templates": templates, "porogens": porogens, "monomers": monomers,
+                  "sample": sample, "seed": seed},
+        max_concurrency=max_concurrency,
+        use_cache=payload.get("cache", True) is not False,
+    ).start()
+    def gen():
+        for event in screen.events():
+            yield f"data: {json.dumps(event)}\n\n"
+        yield "data: [DONE]\n\n"
+    return StreamingResponse(gen(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+RUN_NAMES = ["physics-engine", "physics-screen"]
+@router.get("/runs")
+def runs(response: Response, name: str | None = None, limit: int = 50, cursor: int | None = None):
+    """Persisted physics runs/screens, newest first (X-Next-Cursor for the next page)."""
+    page = get_repository().list_runs(names=[name] if name else RUN_NAMES, limit=limit, cursor=cursor)
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = str(page["next_cursor"])
+    return page["items"]
+@router.get("/runs/{run_id}")
+def run_status(run_id: str):
+    execution = get_run(run_id)
+    if execution is not None:
+        return execution.snapshot()
+    run = get_repository().get_run(run_id)  # finished and evicted, or from an earlier process
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run '{run_id}'")
+    return {"run": run, "steps": None,
+            "properties": get_repository().list_properties(run_id=run_id, limit=MAX_PAGE)["items"]}
+@router.get("/cache/metrics")
+def cache_metrics():
+    return get_step_cache().stats()
+@router.get("/runs/{run_id}/steps/{run_step_id}/geometry.bin")
+def step_geometry(run_id: str, run_step_id: str):
+    """A finished step's XYZ result (conformer / packed complex) as one PFXB frame."""
+    execution = get_run(run_id)
+    step = execution.by_id.get(run_step_id) if execution else None
+    if step is None:
+        raise HTTPException(status_code=404, detail=f"Unknown step '{run_step_id}' in run '{run_id}'")
+    if not (step.result or {}).get("xyz"):
+        raise HTTPException(status_code=409, detail=f"Step '{run_step_id}' has no geometry ({step.status})")
+    return Response(encode_xyz_binary(step.result["xyz"]), media_type=BIN_MEDIA_TYPE)
 @router.get("/properties")
-def props():
-    items = [Property(
-        property_id="PR_"+uuid.uuid4().hex[:10],
-        name="qm/deltaE@v1", cache_key=uuid.uuid4().hex,
-        value=-22.4, units="kJ/mol", category="energy.aggregation", context="complex-level",
-        qualifiers={"artifacts":{"pose_xyz_paths":["/static/sample.xyz"]}}
-    ).model_dump()]
-    return {"properties": items}
+def props(response: Response, name: str | None = None, run_id: str | None = None,
+          limit: int = 100, cursor: int | None = None):
+    """Stored physics properties (deltaE of finished runs), oldest first."""
+    page = _repo().list_properties(source="physics", name=name, run_id=run_id, limit=limit, cursor=cursor)
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = str(page["next_cursor"])
+    return {"properties": page["items"], "next_cursor": page["next_cursor"]}
 @router.get("/complex.xyz")
-def complex_xyz():
-    return Response((STATIC / "sample.xyz").read_text(), media_type="text/plain")
+def complex_xyz(request: Request):
+    path = resolve_xyz("sample.xyz")
+    return stream_span(request, path, 0, path.stat().st_size)
+@router.get("/xyz")
+def trajectories():
+    return list_xyz()
+@router.get("/xyz/{name}")
+def trajectory(name: str, request: Request):
+    """Whole file, streamed; supports `Range: bytes=...` (206) for partial fetches."""
+    path = resolve_xyz(name)
+    return stream_span(request, path, 0, path.stat().st_size)
+@router.get("/xyz/{name}/index")
+def trajectory_index(name: str, offsets: bool = False):
+    """Frame count and atoms per frame (byte offsets with ?offsets=true)."""
+    index = frame_index(resolve_xyz(name))
+    out = {"name": name, "frames": index.frames, "bytes": index.size, "atoms": index.atoms}
+    if offsets:
+        out["offsets"] = index.offsets
+    return out
+@router.get("/xyz/{name}/frames")
+def trajectory_frames(name: str, request: Request, start: int = 0, stop: int | None = None):
+    """Frames [start, stop) as one contiguous XYZ block (Range applies within it)."""
+    path = resolve_xyz(name)
+    index = frame_index(path)
+    start, stop = frame_range(index, start, stop)
+    return stream_span(request, path, *index.span(start, stop),
+                       headers={"X-Frames": f"{start}-{stop - 1}/{index.frames}"})
+@router.get("/xyz/{name}/frames/{frame}")
+def trajectory_frame(name: str, frame: int, request: Request):
+    return trajectory_frames(name, request, frame, frame + 1)
+@router.get("/xyz/{name}/binary")
+def trajectory_binary(name: str, request: Request):
+    """Whole trajectory as PFXB (header, u8 elements, f32 xyz); encoded once, Range-capable."""
+    target, _, _ = binary_file(resolve_xyz(name))
+    return stream_span(request, target, 0, target.stat().st_size, media_type=BIN_MEDIA_TYPE)
+@router.get("/xyz/{name}/binary/frames")
+def trajectory_binary_frames(name: str, start: int = 0, stop: int | None = None):
+    path = resolve_xyz(name)
+    return stream_binary_frames(path, *frame_range(frame_index(path), start, stop))
+@router.get("/xyz/{name}/binary/frames/{frame}")
+def trajectory_binary_frame(name: str, frame: int):
+    return trajectory_binary_frames(name, frame, frame + 1)
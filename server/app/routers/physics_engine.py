@@ -0,0 +1,462 @@
+# server/app/routers/physics_engine.py
+from __future__ import annotations
+
+import datetime as dt
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..cache import ResultCache, get_step_cache, make_cache_key
+from ..instrument import Trace, record
+from ..models import Property, Run
+from ..store import get_repository
+from .physics_methods import (
+    CONFORMER,
+    DELTA_E,
+    PACK_POSE,
+    SINGLE_POINT,
+    SINGLE_POINT_COMPLEX,
+    run_method,
+)
+
+# -----------------------------------------------------------------------------
+# Worker pool
+# -----------------------------------------------------------------------------
+PHYSICS_WORKERS: int = int(os.getenv("POLYFOLD_PHYSICS_WORKERS", "0")) or (os.cpu_count() or 1)
+PHYSICS_RETAIN: int = int(os.getenv("POLYFOLD_PHYSICS_RETAIN", "128"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PHYSICS_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    """Discard a broken pool so the next run spawns a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().isoformat() + "Z"
+
+
+# -----------------------------------------------------------------------------
+# Steps + DAG construction
+# -----------------------------------------------------------------------------
+@dataclass
+class Step:
+    run_step_id: str
+    run_id: str
+    method_id: str
+    label: Dict[str, str]                      # role -> structure name, for display
+    inputs: Dict[str, Any] = field(default_factory=dict)   # literal inputs
+    deps: Dict[str, str] = field(default_factory=dict)     # "role" / "role:name" -> step id
+    params: Dict[str, Any] = field(default_factory=dict)
+    implicit: bool = False                     # pulled in as a dependency, not selected
+    status: str = "queued"                     # queued|running|done|skipped|failed|blocked
+    result: Optional[Dict[str, Any]] = None
+    cache_key: Optional[str] = None            # method_id + hash of resolved inputs/params
+    cache_hit: bool = False
+    error: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    duration_s: Optional[float] = None
+    _t0: float = field(default=0.0, repr=False)
+
+    def public(self) -> Dict[str, Any]:
+        return {
+            "run_step_id": self.run_step_id,
+            "run_id": self.run_id,
+            "method_id": self.method_id,
+            "roles": self.label,
+            "depends_on": sorted(set(self.deps.values())),
+            "implicit": self.implicit,
+            "status": self.status,
+            "cache_key": self.cache_key,
+            "cache_hit": self.cache_hit,
+            "result": self.result,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_s": self.duration_s,
+        }
+
+
+class GraphBuilder:
+    """
+    Expands selected worker methods over the run's structures into a DAG.
+    Shared upstream work (e.g. one conformer per unique SMILES) becomes one step.
+    """
+
+    def __init__(self, run_id: str, selected: List[str]):
+        self.run_id = run_id
+        self.selected = set(selected)
+        self.steps: "OrderedDict[Tuple, Step]" = OrderedDict()
+
+    def _add(self, key: Tuple, method_id: str, label: Dict[str, str],
+             inputs: Optional[Dict[str, Any]] = None,
+             deps: Optional[Dict[str, str]] = None) -> str:
+        step = self.steps.get(key)
+        if step is None:
+            step = Step(
+                run_step_id="ST_" + uuid.uuid4().hex[:8],
+                run_id=self.run_id,
+                method_id=method_id,
+                label=label,
+                inputs=inputs or {},
+                deps=deps or {},
+                implicit=method_id not in self.selected,
+            )
+            self.steps[key] = step
+        elif method_id in self.selected:
+            step.implicit = False
+        return step.run_step_id
+
+    def conformer(self, s: Dict[str, str]) -> str:
+        return self._add((CONFORMER, s["smiles"]), CONFORMER, {"structure": s["name"]},
+                         inputs={"structure": {"smiles": s["smiles"]}})
+
+    def energy(self, s: Dict[str, str]) -> str:
+        return self._add((SINGLE_POINT, s["smiles"]), SINGLE_POINT, {"structure": s["name"]},
+                         deps={"structure": self.conformer(s)})
+
+    def pose(self, a: Dict[str, str], b: Dict[str, str]) -> str:
+        return self._add((PACK_POSE, a["smiles"], b["smiles"]), PACK_POSE,
+                         {"A": a["name"], "B": b["name"]},
+                         deps={"A": self.conformer(a), "B": self.conformer(b)})
+
+    def complex_energy(self, a: Dict[str, str], b: Dict[str, str]) -> str:
+        return self._add((SINGLE_POINT_COMPLEX, a["smiles"], b["smiles"]), SINGLE_POINT_COMPLEX,
+                         {"complex.xyz": f"{a['name']}+{b['name']}"},
+                         deps={"complex.xyz": self.pose(a, b)})
+
+    def delta(self, a: Dict[str, str], b: Dict[str, str]) -> str:
+        return self._add((DELTA_E, a["smiles"], b["smiles"]), DELTA_E,
+                         {"A": a["name"], "B": b["name"]},
+                         deps={"energies:complex": self.complex_energy(a, b),
+                               "energies:A": self.energy(a),
+                               "energies:B": self.energy(b)})
+
+    def add_structures(self, structures: List[Dict[str, str]]) -> None:
+        for s in structures:
+            if CONFORMER in self.selected:
+                self.conformer(s)
+            if SINGLE_POINT in self.selected:
+                self.energy(s)
+
+    def add_pair(self, a: Dict[str, str], b: Dict[str, str]) -> None:
+        if PACK_POSE in self.selected:
+            self.pose(a, b)
+        if SINGLE_POINT_COMPLEX in self.selected:
+            self.complex_energy(a, b)
+        if DELTA_E in self.selected:
+            self.delta(a, b)
+
+    def build(self) -> List[Step]:
+        # dependencies were added before their dependents, but keep a topological
+        # order explicitly so callers can rely on it
+        by_id = {s.run_step_id: s for s in self.steps.values()}
+        ordered: List[Step] = []
+        seen: set = set()
+
+        def visit(step: Step) -> None:
+            if step.run_step_id in seen:
+                return
+            seen.add(step.run_step_id)
+            for dep in step.deps.values():
+                visit(by_id[dep])
+            ordered.append(step)
+
+        for step in self.steps.values():
+            visit(step)
+        return ordered
+
+
+# -----------------------------------------------------------------------------
+# Execution
+# -----------------------------------------------------------------------------
+def step_cache_key(method_id: str, inputs: Dict[str, Any], params: Dict[str, Any]) -> str:
+    """
+    Content address of a step: method_id plus a hash of its resolved inputs
+    (canonical SMILES, upstream XYZ text/energies) and params.
+    """
+    return make_cache_key(method_id, json.dumps({"inputs": inputs, "params": params},
+                                                sort_keys=True, separators=(",", ":")))
+
+
+class RunExecution:
+    """
+    Runs a step DAG on the shared process pool: every step whose dependencies
+    are done is submitted (up to max_concurrency at once); failures block the
+    steps downstream of them. Step statuses and Run.counters update live.
+
+    Before a ready step is submitted its fully resolved inputs are hashed with
+    its method_id and params; if the step cache already holds that key the
+    step is marked "skipped" with the stored result and never reaches the pool.
+
+    on_step, if given, is called from the scheduler thread with every step that
+    settles (done, skipped, failed or blocked); it must not block.
+    """
+
+    def __init__(self, run: Run, steps: List[Step], max_concurrency: int = PHYSICS_WORKERS,
+                 cache: Optional[ResultCache] = None,
+                 on_step: Optional[Callable[[Step], None]] = None):
+        self.run = run
+        self.steps = steps
+        self.by_id = {s.run_step_id: s for s in steps}
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        self.on_step = on_step
+        self.run.counters = {"created": 0, "skipped": 0, "errors": 0, "blocked": 0}
+        self.trace = Trace()  # step wall times (submit -> result) per method
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "RunExecution":
+        self._thread = threading.Thread(target=self._loop, name=f"physics-{self.run.run_id}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def _inputs(self, step: Step) -> Dict[str, Any]:
+        inputs = dict(step.inputs)
+        for key, dep_id in step.deps.items():
+            role, _, name = key.partition(":")
+            result = self.by_id[dep_id].result
+            if name:
+                inputs.setdefault(role, {})[name] = result
+            else:
+                inputs[role] = result
+        return inputs
+
+    def _settled(self, step: Step) -> None:
+        if self.on_step is not None:
+            self.on_step(step)
+
+    def _block_downstream(self, step: Step, dependents: Dict[str, List[str]]) -> None:
+        for dep_id in dependents.get(step.run_step_id, []):
+            child = self.by_id[dep_id]
+            if child.status == "queued":
+                child.status = "blocked"
+                child.error = f"upstream step {step.run_step_id} ({step.method_id}) failed"
+                self.run.counters["blocked"] += 1
+                self._settled(child)
+                self._block_downstream(child, dependents)
+
+    def _loop(self) -> None:
+        dependents: Dict[str, List[str]] = {}
+        remaining: Dict[str, int] = {}
+        for s in self.steps:
+            remaining[s.run_step_id] = len(set(s.deps.values()))
+            for dep in set(s.deps.values()):
+                dependents.setdefault(dep, []).append(s.run_step_id)
+        ready: Deque[Step] = deque(s for s in self.steps if remaining[s.run_step_id] == 0)
+        running: Dict[Future, Step] = {}
+
+        def release(step: Step) -> None:
+            for child_id in dependents.get(step.run_step_id, []):
+                remaining[child_id] -= 1
+                if remaining[child_id] == 0 and self.by_id[child_id].status == "queued":
+                    ready.append(self.by_id[child_id])
+
+        pool: Optional[ProcessPoolExecutor] = None
+        try:
+            pool = get_pool()
+            while ready or running:
+                while ready and len(running) < self.max_concurrency:
+                    step = ready.popleft()
+                    inputs = self._inputs(step)
+                    step.cache_key = step_cache_key(step.method_id, inputs, step.params)
+                    cached = self.cache.get(step.cache_key) if self.cache is not None else None
+                    if cached is not None:
+                        with self._lock:
+                            step.result = cached
+                            step.status = "skipped"
+                            step.cache_hit = True
+                            step.started_at = step.finished_at = _now()
+                            step.duration_s = 0.0
+                            self.run.counters["skipped"] += 1
+                        self._settled(step)
+                        release(step)
+                        continue
+                    with self._lock:
+                        step.status = "running"
+                        step.started_at = _now()
+                    step._t0 = time.perf_counter()
+                    fut = pool.submit(run_method, step.method_id, inputs, step.params)
+                    running[fut] = step
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    step = running.pop(fut)
+                    with self._lock:
+                        step.finished_at = _now()
+                        step.duration_s = round(time.perf_counter() - step._t0, 4)
+                        record(step.method_id, step._t0, time.perf_counter() - step._t0, into=self.trace)
+                        try:
+                            step.result = fut.result()
+                            step.status = "done"
+                            self.run.counters["created"] += 1
+                        except BrokenProcessPool:  # not the step's fault: fail the run below
+                            raise
+                        except Exception as e:
+                            step.status = "failed"
+                            step.error = repr(e)
+                            self.run.counters["errors"] += 1
+                            self._settled(step)
+                            self._block_downstream(step, dependents)
+                            continue
+                    if self.cache is not None:
+                        self.cache.put(step.cache_key, step.result)
+                    self._settled(step)
+                    release(step)
+        except Exception as e:  # pool broke / could not start: fail what is left
+            if isinstance(e, BrokenProcessPool) and pool is not None:
+                _drop_pool(pool)
+            with self._lock:
+                for step in self.steps:
+                    if step.status in ("queued", "running"):
+                        step.status = "failed"
+                        step.error = repr(e)
+                        self.run.counters["errors"] += 1
+                        self._settled(step)
+        finally:
+            self._finish()
+
+    def _finish(self) -> None:
+        with self._lock:
+            c = self.run.counters
+            if c["errors"] == 0 and c["blocked"] == 0:
+                self.run.status = "done"
+            elif c["created"] + c["skipped"] > 0:
+                self.run.status = "partial"
+            else:
+                self.run.status = "failed"
+            self.run.finished_at = _now()
+            self.run.provenance["timings"] = self.trace.totals()  # per method, summed over steps
+        self._persist()
+        self._finished.set()
+
+    def _persist(self) -> None:
+        """Finished run + its deltaE properties go to the shared repository."""
+        try:
+            repo = get_repository()
+            with self._lock:
+                run, props = self.run.model_dump(), self.properties()
+            repo.add_properties(props, source="physics")
+            repo.save_run(run)
+        except sqlite3.Error as e:  # storage trouble must not fail the run itself
+            with self._lock:
+                self.run.provenance["store_error"] = repr(e)
+
+    def properties(self) -> List[Dict[str, Any]]:
+        """deltaE results as Property records."""
+        props = []
+        for step in self.steps:
+            if step.method_id != DELTA_E or step.status not in ("done", "skipped"):
+                continue
+            a = self.by_id[step.deps["energies:A"]]
+            b = self.by_id[step.deps["energies:B"]]
+            pose_id = self.by_id[step.deps["energies:complex"]].deps["complex.xyz"]
+            props.append(Property(
+                property_id="PR_" + step.run_step_id[3:],
+                name=DELTA_E,
+                cache_key=step.cache_key,
+                value=step.result["deltaE_kJmol"],
+                units="kJ/mol",
+                category="energy.aggregation",
+                context="complex-level",
+                qualifiers={"roles": step.label, "artifacts": {"pose_step_id": pose_id}},
+                provenance={"run_id": self.run.run_id, "run_step_id": step.run_step_id,
+                            "surrogate": "lj-stub", "cache_hit": step.cache_hit},
+            ).model_dump())
+        return props
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "run": self.run.model_dump(),
+                "steps": [s.public() for s in self.steps],
+                "properties": self.properties(),
+            }
+
+
+# -----------------------------------------------------------------------------
+# Run registry
+# -----------------------------------------------------------------------------
+_runs: "OrderedDict[str, RunExecution]" = OrderedDict()
+_runs_lock = threading.Lock()
+
+
+def register_run(execution: RunExecution) -> RunExecution:
+    """
+    Make a run pollable via get_run. Beyond PHYSICS_RETAIN the oldest finished
+    runs are dropped; runs still executing are always kept.
+    """
+    with _runs_lock:
+        _runs[execution.run.run_id] = execution
+        excess = len(_runs) - PHYSICS_RETAIN
+        if excess > 0:
+            for run_id in [r for r, e in _runs.items() if e.finished][:excess]:
+                del _runs[run_id]
+    return execution
+
+
+def new_run(name: str, workers: List[str], selector: Dict[str, Any]) -> Run:
+    return Run(run_id="RUN_" + uuid.uuid4().hex[:8], name=name, status="running",
+               method_graph=list(workers), selector=selector)
+
+
+def submit_run(structures: List[Dict[str, str]],
+               pairs: List[Tuple[Dict[str, str], Dict[str, str]]],
+               workers: List[str],
+               selector: Dict[str, Any],
+               max_concurrency: Optional[int] = None,
+               use_cache: bool = True) -> RunExecution:
+    """
+    Build the DAG for `workers` over structures/pairs and start executing it.
+    use_cache=False bypasses the step cache and recomputes every step.
+    """
+    run = new_run("physics-engine", workers, selector)
+    builder = GraphBuilder(run.run_id, workers)
+    builder.add_structures(structures)
+    for a, b in pairs:
+        builder.add_pair(a, b)
+    execution = RunExecution(run, builder.build(), max_concurrency or PHYSICS_WORKERS,
+                             cache=get_step_cache() if use_cache else None)
+    return register_run(execution).start()
+
+
+def get_run(run_id: str) -> Optional[RunExecution]:
+    with _runs_lock:
+        return _runs.get(run_id)
@@ -0,0 +1,190 @@
+# server/app/routers/physics_methods.py
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..lazy import LazyModule
+
+
+def _quiet_rdkit(_module) -> None:
+    from rdkit import rdBase
+    rdBase.DisableLog("rdApp.error")
+
+
+np = LazyModule("numpy")
+Chem = LazyModule("rdkit.Chem", on_import=_quiet_rdkit)
+AllChem = LazyModule("rdkit.Chem.AllChem", on_import=_quiet_rdkit)
+
+# -----------------------------------------------------------------------------
+# Worker method catalogue (IDs match the orchestrator)
+# -----------------------------------------------------------------------------
+# `consumes` / `produces` name the artifact kinds flowing between steps; the run
+# engine wires the dependency DAG from them plus each method's roles.
+WORKERS: List[Dict[str, Any]] = [
+    {"method_id": "chem.mol/etkdg-mmff@v1", "arity": 1, "roles": ["structure"],
+     "category": "geometry.conformer", "consumes": "smiles", "produces": "geometry"},
+    {"method_id": "fast_structure/pack_pose_xyz@v1", "arity": 2, "roles": ["A", "B"],
+     "category": "packing.pose", "consumes": "geometry", "produces": "complex.xyz"},
+    {"method_id": "qm/xtb_sp@v1", "arity": 1, "roles": ["structure"],
+     "category": "energy.single_point", "consumes": "geometry", "produces": "energy"},
+    {"method_id": "qm/xtb_sp_complex_xyz@v1", "arity": 1, "roles": ["complex.xyz"],
+     "category": "energy.single_point", "consumes": "complex.xyz", "produces": "energy"},
+    {"method_id": "qm/deltaE@v1", "arity": 1, "roles": ["energies"],
+     "category": "energy.aggregation", "consumes": "energy", "produces": "deltaE"},
+]
+
+CONFORMER = "chem.mol/etkdg-mmff@v1"
+PACK_POSE = "fast_structure/pack_pose_xyz@v1"
+SINGLE_POINT = "qm/xtb_sp@v1"
+SINGLE_POINT_COMPLEX = "qm/xtb_sp_complex_xyz@v1"
+DELTA_E = "qm/deltaE@v1"
+
+
+def canonical_smiles(smiles: str) -> str:
+    """RDKit canonical SMILES so equivalent spellings share steps and cache keys."""
+    mol = Chem.MolFromSmiles(smiles)
+    return Chem.MolToSmiles(mol) if mol is not None else smiles
+
+
+# -----------------------------------------------------------------------------
+# XYZ helpers
+# -----------------------------------------------------------------------------
+def parse_xyz(text: str) -> Tuple[List[str], "np.ndarray"]:
+    """First frame of an XYZ block -> (elements, (n, 3) float64 coordinates)."""
+    lines = text.splitlines()
+    n = int(lines[0].split()[0])
+    elements: List[str] = []
+    coords = np.empty((n, 3), dtype=np.float64)
+    for i, line in enumerate(lines[2:2 + n]):
+        parts = line.split()
+        elements.append(parts[0])
+        coords[i] = [float(v) for v in parts[1:4]]
+    return elements, coords
+
+
+def format_xyz(elements: List[str], coords: "np.ndarray", comment: str = "") -> str:
+    rows = [f"{e:<2s} {x:12.6f} {y:12.6f} {z:12.6f}" for e, (x, y, z) in zip(elements, coords)]
+    return "\n".join([str(len(elements)), comment, *rows]) + "\n"
+
+
+# -----------------------------------------------------------------------------
+# Local stub implementations (no xtb needed)
+# -----------------------------------------------------------------------------
+# The single-point "energy" is a Lennard-Jones surrogate over non-bonded atom
+# pairs (UFF-like sigma/epsilon, pairs closer than 2 A treated as bonded). It is
+# NOT a QM energy, but it is consistent: intramolecular terms cancel in
+# E(complex) - E(A) - E(B), so deltaE is the intermolecular contact energy.
+_LJ: Dict[str, Tuple[float, float]] = {  # element -> (sigma A, epsilon kJ/mol)
+    "H": (2.571, 0.184), "B": (3.638, 0.753), "C": (3.431, 0.439), "N": (3.261, 0.289),
+    "O": (3.118, 0.251), "F": (2.997, 0.209), "Si": (3.826, 1.682), "P": (3.695, 1.276),
+    "S": (3.595, 1.046), "Cl": (3.516, 0.950), "Br": (3.732, 1.050), "I": (4.009, 1.414),
+}
+_LJ_DEFAULT = (3.5, 0.4)
+_BONDED_CUTOFF_A = 2.0
+
+
+def _lj_params(elements: List[str]) -> Tuple["np.ndarray", "np.ndarray"]:
+    p = np.array([_LJ.get(e, _LJ_DEFAULT) for e in elements], dtype=np.float64)
+    return p[:, 0], p[:, 1]
+
+
+def _lj_energy(elements: List[str], coords: "np.ndarray") -> float:
+    sigma, eps = _lj_params(elements)
+    d = np.linalg.norm(coords[:, None, :] - coords[None, :, :], axis=-1)
+    iu = np.triu_indices(len(elements), k=1)
+    r = d[iu]
+    keep = r > _BONDED_CUTOFF_A
+    s = 0.5 * (sigma[:, None] + sigma[None, :])[iu][keep]
+    e = np.sqrt(eps[:, None] * eps[None, :])[iu][keep]
+    sr6 = (s / r[keep]) ** 6
+    return float(np.sum(4.0 * e * (sr6 * sr6 - sr6)))
+
+
+def _cross_lj(el_a, xyz_a, el_b, xyz_b) -> float:
+    sa, ea = _lj_params(el_a)
+    sb, eb = _lj_params(el_b)
+    r = np.linalg.norm(xyz_a[:, None, :] - xyz_b[None, :, :], axis=-1)
+    s = 0.5 * (sa[:, None] + sb[None, :])
+    e = np.sqrt(ea[:, None] * eb[None, :])
+    sr6 = (s / np.maximum(r, 0.5)) ** 6
+    return float(np.sum(4.0 * e * (sr6 * sr6 - sr6)))
+
+
+def etkdg_mmff(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """SMILES -> ETKDG conformer, MMFF-relaxed; returns XYZ + MMFF energy."""
+    smiles = inputs["structure"]["smiles"]
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError(f"invalid SMILES: {smiles!r}")
+    mol = Chem.AddHs(mol)
+    if AllChem.EmbedMolecule(mol, randomSeed=int(params.get("seed", 42))) != 0:
+        raise RuntimeError(f"ETKDG embedding failed for {smiles!r}")
+    energy = None
+    if AllChem.MMFFHasAllMoleculeParams(mol):
+        AllChem.MMFFOptimizeMolecule(mol, maxIters=int(params.get("max_iters", 500)))
+        ff = AllChem.MMFFGetMoleculeForceField(mol, AllChem.MMFFGetMoleculeProperties(mol))
+        energy = ff.CalcEnergy() * 4.184  # kcal/mol -> kJ/mol
+    return {
+        "smiles": smiles,
+        "xyz": Chem.MolToXYZBlock(mol),
+        "n_atoms": mol.GetNumAtoms(),
+        "energy_mmff_kJmol": energy,
+    }
+
+
+def pack_pose_xyz(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rigid pose of B next to A: B is slid along +x from contact and the offset
+    with the lowest cross LJ energy is kept. Returns the complex XYZ (A then B).
+    """
+    el_a, xyz_a = parse_xyz(inputs["A"]["xyz"])
+    el_b, xyz_b = parse_xyz(inputs["B"]["xyz"])
+    xyz_a = xyz_a - xyz_a.mean(axis=0)
+    xyz_b = xyz_b - xyz_b.mean(axis=0)
+    base = xyz_a[:, 0].max() - xyz_b[:, 0].min()
+    best = None
+    for gap in np.arange(1.5, 6.01, float(params.get("step_A", 0.25))):
+        shifted = xyz_b + np.array([base + gap, 0.0, 0.0])
+        e = _cross_lj(el_a, xyz_a, el_b, shifted)
+        if best is None or e < best[0]:
+            best = (e, shifted)
+    elements = el_a + el_b
+    coords = np.vstack([xyz_a, best[1]])
+    return {
+        "xyz": format_xyz(elements, coords, f"A:{len(el_a)} B:{len(el_b)}"),
+        "n_atoms": len(elements),
+        "contact_energy_kJmol": best[0],
+    }
+
+
+def xtb_sp(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Single point on one structure's geometry (LJ surrogate, see above)."""
+    elements, coords = parse_xyz(inputs["structure"]["xyz"])
+    return {"energy_kJmol": _lj_energy(elements, coords), "surrogate": "lj-stub"}
+
+
+def xtb_sp_complex_xyz(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Single point on a packed complex (LJ surrogate, see above)."""
+    elements, coords = parse_xyz(inputs["complex.xyz"]["xyz"])
+    return {"energy_kJmol": _lj_energy(elements, coords), "surrogate": "lj-stub"}
+
+
+def delta_e(inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """deltaE = E(complex) - E(A) - E(B)."""
+    e = inputs["energies"]
+    value = e["complex"]["energy_kJmol"] - e["A"]["energy_kJmol"] - e["B"]["energy_kJmol"]
+    return {"deltaE_kJmol": value, "units": "kJ/mol"}
+
+
+METHODS: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = {
+    CONFORMER: etkdg_mmff,
+    PACK_POSE: pack_pose_xyz,
+    SINGLE_POINT: xtb_sp,
+    SINGLE_POINT_COMPLEX: xtb_sp_complex_xyz,
+    DELTA_E: delta_e,
+}
+
+
+def run_method(method_id: str, inputs: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Process-pool entry point: look the implementation up by method_id."""
+    return METHODS[method_id](inputs, params)
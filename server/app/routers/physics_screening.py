@@ -0,0 +1,144 @@
+# server/app/routers/physics_screening.py
+from __future__ import annotations
+
+import itertools
+import os
+import queue
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..cache import get_step_cache
+from .physics_engine import (
+    PHYSICS_WORKERS,
+    GraphBuilder,
+    RunExecution,
+    Step,
+    new_run,
+    register_run,
+)
+from .physics_methods import DELTA_E
+
+# -----------------------------------------------------------------------------
+# Combinatorial screening (template x porogen x monomer)
+# -----------------------------------------------------------------------------
+# Every combination needs deltaE(template, monomer) and, when a porogen is
+# given, deltaE(porogen, monomer). All of them go into ONE step DAG, so each
+# unique conformer / single point / pose is computed once for the whole grid
+# (and reused across screens through the step cache).
+SCREEN_MAX_COMBINATIONS: int = int(os.getenv("POLYFOLD_SCREEN_MAX", "2000"))
+
+Structure = Dict[str, str]
+Combination = Tuple[Structure, Optional[Structure], Structure]
+
+
+def expand_combinations(templates: List[Structure], porogens: List[Structure],
+                        monomers: List[Structure], sample: Optional[int] = None,
+                        seed: int = 0) -> List[Combination]:
+    """Cartesian product, or `sample` combinations drawn from it without replacement."""
+    grid: List[Combination] = list(itertools.product(templates, porogens or [None], monomers))
+    if sample is not None and sample < len(grid):
+        grid = random.Random(seed).sample(grid, sample)
+    return grid
+
+
+class Screen:
+    """
+    One screening run: the shared DAG, its RunExecution, and per-combination
+    bookkeeping so results can be emitted as soon as both deltaEs settle.
+    """
+
+    def __init__(self, combinations: List[Combination], workers: List[str],
+                 selector: Dict[str, Any], max_concurrency: Optional[int] = None,
+                 use_cache: bool = True):
+        self.combinations = combinations
+        self.workers = list(dict.fromkeys([*workers, DELTA_E]))
+        self.run = new_run("physics-screen", self.workers, selector)
+        builder = GraphBuilder(self.run.run_id, self.workers)
+        self._needs: List[Dict[str, str]] = []  # per combination: "template"/"porogen" -> step id
+        self._waiting: Dict[str, List[int]] = {}  # deltaE step id -> combination indexes
+        for t, p, m in combinations:
+            needs = {"template": builder.delta(t, m)}
+            if p is not None:
+                needs["porogen"] = builder.delta(p, m)
+            self._needs.append(needs)
+            for step_id in needs.values():
+                self._waiting.setdefault(step_id, []).append(len(self._needs) - 1)
+        self.pipeline_steps = self._pipeline_steps(combinations[0]) * len(combinations) \
+            if combinations else 0
+        self._events: "queue.Queue[Step]" = queue.Queue()
+        self.execution = RunExecution(
+            self.run, builder.build(), max_concurrency or PHYSICS_WORKERS,
+            cache=get_step_cache() if use_cache else None,
+            on_step=self._on_step,
+        )
+        self.run.provenance.update({"combinations": len(combinations),
+                                    "steps": len(self.execution.steps),
+                                    "pipeline_steps": self.pipeline_steps})
+
+    def _pipeline_steps(self, combination: Combination) -> int:
+        """Steps one combination would need as a standalone run (for comparison)."""
+        t, p, m = combination
+        builder = GraphBuilder(self.run.run_id, self.workers)
+        builder.delta(t, m)
+        if p is not None:
+            builder.delta(p, m)
+        return len(builder.steps)
+
+    def _on_step(self, step: Step) -> None:
+        if step.run_step_id in self._waiting:
+            self._events.put(step)
+
+    def start(self) -> "Screen":
+        register_run(self.execution).start()
+        return self
+
+    def _combination(self, index: int) -> Dict[str, Any]:
+        t, p, m = self.combinations[index]
+        steps = {role: self.execution.by_id[sid] for role, sid in self._needs[index].items()}
+        failed = [s for s in steps.values() if s.status not in ("done", "skipped")]
+        event: Dict[str, Any] = {
+            "type": "combination",
+            "index": index,
+            "template": t["name"],
+            "porogen": p["name"] if p else None,
+            "monomer": m["name"],
+            "status": "failed" if failed else "done",
+            "cache_hit": all(s.cache_hit for s in steps.values()),
+        }
+        if failed:
+            event["error"] = failed[0].error or f"deltaE step {failed[0].status}"
+            return event
+        for role, s in steps.items():
+            event[f"deltaE_{role}_kJmol"] = s.result["deltaE_kJmol"]
+            event[f"{role}_cache_key"] = s.cache_key
+        if "porogen" in steps:
+            # < 0: the monomer binds the template more strongly than the porogen
+            event["selectivity_kJmol"] = event["deltaE_template_kJmol"] - event["deltaE_porogen_kJmol"]
+        return event
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """Combination events in completion order, then a final "done" event."""
+        yield {"type": "screen", "run_id": self.run.run_id,
+               "combinations": len(self.combinations),
+               "steps": len(self.execution.steps), "pipeline_steps": self.pipeline_steps}
+        pending = {sid: set(ids) for sid, ids in self._waiting.items()}
+        emitted = set()
+        settled: set = set()
+        while len(emitted) < len(self.combinations):
+            try:
+                step = self._events.get(timeout=0.5)
+            except queue.Empty:
+                if self.execution.wait(0) and self._events.empty():
+                    break
+                continue
+            settled.add(step.run_step_id)
+            for index in sorted(pending.pop(step.run_step_id, ())):
+                if index not in emitted and settled.issuperset(self._needs[index].values()):
+                    emitted.add(index)
+                    yield self._combination(index)
+        for index in range(len(self.combinations)):  # scheduler died before settling these
+            if index not in emitted:
+                yield self._combination(index)
+        self.execution.wait()
+        snapshot = self.execution.snapshot()
+        yield {"type": "done", "run": snapshot["run"]}
@@ -0,0 +1,225 @@
+# server/app/routers/physics_search.py
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..lazy import LazyModule
+from ..store import Repository, get_repository
+
+
+def _quiet_rdkit(_module) -> None:
+    from rdkit import rdBase
+    rdBase.DisableLog("rdApp.error")
+
+
+np = LazyModule("numpy")
+Chem = LazyModule("rdkit.Chem", on_import=_quiet_rdkit)
+rdFingerprintGenerator = LazyModule("rdkit.Chem.rdFingerprintGenerator", on_import=_quiet_rdkit)
+
+# -----------------------------------------------------------------------------
+# Fingerprint index over the structure repository
+# -----------------------------------------------------------------------------
+# Two packed bit matrices (one row per stored structure, FP_BITS / 8 bytes):
+#   - Morgan (radius 2) for Tanimoto similarity: popcounts of row & query,
+#   - RDKit pattern fingerprints as a substructure screen: a structure can only
+#     contain the query if every query bit is also set in its row.
+# Rows are appended incrementally: each query first pulls structures whose
+# repository `seq` is newer than the last one indexed.
+FP_BITS = 2048
+MORGAN_RADIUS = 2
+_WORDS = FP_BITS // 64
+
+
+def _popcount(words: "np.ndarray") -> "np.ndarray":
+    """Row-wise popcount of a (n, words) uint64 matrix."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[words.view(np.uint8)].reshape(len(words), -1).sum(axis=1, dtype=np.int32)
+
+
+def _pack(bitvect) -> "np.ndarray":
+    bits = np.frombuffer(bitvect.ToBitString().encode("ascii"), dtype=np.uint8) - ord("0")
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def _query_mol(query: str):
+    """SMILES first (so "C=Cc1ccncc1" means vinylpyridine with its aromaticity), then SMARTS."""
+    mol = Chem.MolFromSmiles(query)
+    if mol is None:
+        mol = Chem.MolFromSmarts(query)
+        if mol is not None:
+            mol.UpdatePropertyCache(strict=False)
+            Chem.FastFindRings(mol)
+    if mol is None:
+        raise HTTPException(status_code=400, detail=f"Could not parse query {query!r} as SMILES or SMARTS")
+    return mol
+
+
+class FingerprintIndex:
+    """
+    In-memory fingerprint matrices for every parsable structure in the
+    repository. Rows grow by doubling; `refresh` appends what is new.
+    """
+
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        self._morgan_gen = None
+        self._lock = threading.Lock()
+        self._n = 0
+        self._morgan = np.zeros((0, _WORDS), dtype=np.uint64)
+        self._pattern = np.zeros((0, _WORDS), dtype=np.uint64)
+        self._bits = np.zeros(0, dtype=np.int32)       # Morgan popcount per row
+        self._seqs = np.zeros(0, dtype=np.int64)      # repository seq per row (ascending)
+        self._ids: List[str] = []
+        self._mols: List[bytes] = []                  # RDKit binary: ~3x cheaper than re-parsing SMILES
+        self._last_seq = 0
+        self.unparsable = 0
+
+    def _morgan_fp(self, mol):
+        if self._morgan_gen is None:
+            self._morgan_gen = rdFingerprintGenerator.GetMorganGenerator(
+                radius=MORGAN_RADIUS, fpSize=FP_BITS)
+        return self._morgan_gen.GetFingerprint(mol)
+
+    def _grow(self, extra: int) -> None:
+        need = self._n + extra
+        if need <= len(self._morgan):
+            return
+        cap = max(need, 2 * len(self._morgan), 1024)
+        for name in ("_morgan", "_pattern"):
+            old = getattr(self, name)
+            new = np.zeros((cap, _WORDS), dtype=np.uint64)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+        bits = np.zeros(cap, dtype=np.int32)
+        bits[:self._n] = self._bits[:self._n]
+        self._bits = bits
+        seqs = np.zeros(cap, dtype=np.int64)
+        seqs[:self._n] = self._seqs[:self._n]
+        self._seqs = seqs
+
+    def refresh(self) -> int:
+        """Index structures added to the repository since the last call; returns how many."""
+        with self._lock:
+            added = 0
+            batch: List[Tuple[int, Dict[str, Any]]] = []
+            for item in self.repo.iter_structures(after=self._last_seq):
+                batch.append(item)
+                if len(batch) >= 1024:
+                    added += self._append(batch)
+                    batch = []
+            if batch:
+                added += self._append(batch)
+            return added
+
+    def _append(self, batch: List[Tuple[int, Dict[str, Any]]]) -> int:
+        self._grow(len(batch))
+        for seq, s in batch:
+            self._last_seq = seq
+            mol = Chem.MolFromSmiles(s["smiles"])
+            if mol is None:
+                self.unparsable += 1
+                continue
+            row = self._n
+            self._morgan[row] = _pack(self._morgan_fp(mol))
+            self._pattern[row] = _pack(Chem.PatternFingerprint(mol, fpSize=FP_BITS))
+            self._bits[row] = int(_popcount(self._morgan[row:row + 1])[0])
+            self._seqs[row] = seq
+            self._ids.append(s["chemical_structure_id"])
+            self._mols.append(mol.ToBinary())
+            self._n += 1
+        return len(batch)
+
+    def _rows(self, tag: Optional[str]) -> Optional["np.ndarray"]:
+        """Row indices of structures currently tagged `tag` (None = all rows)."""
+        if tag is None:
+            return None
+        seqs = np.asarray(self.repo.tag_seqs(tag), dtype=np.int64)
+        indexed = self._seqs[:self._n]
+        pos = np.searchsorted(indexed, seqs)
+        ok = pos < self._n
+        ok[ok] = indexed[pos[ok]] == seqs[ok]
+        return pos[ok]
+
+    def similar(self, query: str, k: int = 10, threshold: float = 0.0,
+                tag: Optional[str] = None) -> Dict[str, Any]:
+        """Tanimoto top-k of the query's Morgan fingerprint against every indexed row."""
+        t0 = time.perf_counter()
+        self.refresh()
+        mol = Chem.MolFromSmiles(query)
+        if mol is None:
+            raise HTTPException(status_code=400, detail=f"Invalid SMILES {query!r}")
+        q = _pack(self._morgan_fp(mol))
+        q_bits = int(_popcount(q[None, :])[0])
+        with self._lock:
+            rows = self._rows(tag)
+            morgan = self._morgan[:self._n] if rows is None else self._morgan[rows]
+            bits = self._bits[:self._n] if rows is None else self._bits[rows]
+            common = _popcount(morgan & q)
+            union = bits + q_bits - common
+            sims = np.where(union > 0, common / np.maximum(union, 1), 0.0)
+            k = max(0, min(k, len(sims)))
+            top = np.argpartition(-sims, k - 1)[:k] if 0 < k < len(sims) else np.arange(len(sims))
+            top = top[np.argsort(-sims[top], kind="stable")]
+            hits = [(self._ids[int(rows[i]) if rows is not None else int(i)], float(sims[i]))
+                    for i in top if sims[i] >= threshold][:k]
+            searched = len(sims)
+        return {
+            "query": query,
+            "results": [{"similarity": round(sim, 4), "structure": self.repo.get_structure(sid)}
+                        for sid, sim in hits],
+            "stats": {"indexed": self._n, "searched": searched,
+                      "ms": round((time.perf_counter() - t0) * 1000, 3)},
+        }
+
+    def substructure(self, query: str, limit: int = 100, tag: Optional[str] = None) -> Dict[str, Any]:
+        """Pattern-fingerprint screen, then RDKit HasSubstructMatch on the survivors only."""
+        t0 = time.perf_counter()
+        self.refresh()
+        qmol = _query_mol(query)
+        q = _pack(Chem.PatternFingerprint(qmol, fpSize=FP_BITS))
+        with self._lock:
+            rows = self._rows(tag)
+            pattern = self._pattern[:self._n] if rows is None else self._pattern[rows]
+            passed = np.flatnonzero(np.all((pattern & q) == q, axis=1))
+            if rows is not None:
+                passed = rows[passed]
+            candidates = [(self._ids[i], self._mols[i]) for i in passed.tolist()]
+            searched = len(pattern)
+        matched: List[str] = []
+        checked = 0
+        for sid, binary in candidates:
+            if len(matched) >= limit:
+                break
+            checked += 1
+            if Chem.Mol(binary).HasSubstructMatch(qmol):
+                matched.append(sid)
+        return {
+            "query": query,
+            "results": [self.repo.get_structure(sid) for sid in matched],
+            "stats": {"indexed": self._n, "searched": searched, "screen_passed": len(candidates),
+                      "checked": checked, "matched": len(matched),
+                      "ms": round((time.perf_counter() - t0) * 1000, 3)},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"indexed": self._n, "last_seq": self._last_seq, "unparsable": self.unparsable,
+                    "bits": FP_BITS, "matrix_bytes": int(2 * self._n * FP_BITS // 8)}
+
+
+_index: Optional[FingerprintIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex(get_repository())
+    return _index
@@ -0,0 +1,398 @@
+# server/app/routers/physics_xyz.py
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from ..cache import make_cache_key
+from ..instrument import span
+from ..lazy import LazyModule
+
+np = LazyModule("numpy")
+
+# -----------------------------------------------------------------------------
+# XYZ trajectory files
+# -----------------------------------------------------------------------------
+# Trajectories are looked up by file name in the app's static dir and in
+# POLYFOLD_XYZ_DIR (os.pathsep-separated). Only plain "*.xyz" names are served.
+STATIC = Path(__file__).resolve().parents[1] / "static"
+XYZ_DIRS: List[Path] = [STATIC] + [
+    Path(d) for d in os.getenv("POLYFOLD_XYZ_DIR", "").split(os.pathsep) if d
+]
+STREAM_CHUNK_BYTES: int = int(os.getenv("POLYFOLD_XYZ_CHUNK_BYTES", str(256 * 1024)))
+INDEX_VERSION = 1
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.\-]+\.xyz$")
+
+
+def resolve_xyz(name: str) -> Path:
+    if not _NAME_RE.match(name) or name.startswith("."):
+        raise HTTPException(status_code=400, detail=f"Invalid trajectory name '{name}'")
+    for root in XYZ_DIRS:
+        path = root / name
+        if path.is_file():
+            return path
+    raise HTTPException(status_code=404, detail=f"Unknown trajectory '{name}'")
+
+
+def list_xyz() -> List[Dict[str, object]]:
+    seen: Dict[str, Path] = {}
+    for root in XYZ_DIRS:
+        if root.is_dir():
+            for path in sorted(root.glob("*.xyz")):
+                seen.setdefault(path.name, path)
+    return [{"name": name, "bytes": path.stat().st_size} for name, path in seen.items()]
+
+
+# -----------------------------------------------------------------------------
+# Frame index: byte offsets per frame, cached in "<file>.idx"
+# -----------------------------------------------------------------------------
+@dataclass
+class FrameIndex:
+    size: int
+    mtime_ns: int
+    offsets: List[int]   # frame i spans offsets[i]:offsets[i + 1]
+    atoms: List[int]     # atom count per frame
+
+    @property
+    def frames(self) -> int:
+        return len(self.atoms)
+
+    def span(self, start: int, stop: int) -> Tuple[int, int]:
+        """Byte span of frames [start, stop)."""
+        return self.offsets[start], self.offsets[stop]
+
+
+SCAN_WINDOW_BYTES = 8 * 1024 * 1024
+
+
+def _line_starts(mm: mmap.mmap, size: int, window: int) -> Iterator["np.ndarray"]:
+    """Absolute line-start offsets, one array per `window` bytes (bounded memory)."""
+    for base in range(0, size, window):
+        view = np.frombuffer(mm, dtype=np.uint8, count=min(window, size - base), offset=base)
+        starts = np.flatnonzero(view == 10) + (base + 1)
+        del view  # no exported buffer may outlive the mmap
+        if base == 0:
+            starts = np.concatenate(([0], starts))
+        yield starts[starts < size]
+
+
+def _scan(path: Path, window: int = SCAN_WINDOW_BYTES) -> FrameIndex:
+    """
+    One pass over the file in fixed-size windows: newline positions are found
+    vectorized per window, then the walk only touches the atom-count line of
+    each frame (frame = n + 2 lines), carrying the lines still to skip over
+    window boundaries. Peak memory is a few times `window`, whatever the size.
+    """
+    st = path.stat()
+    starts: List[int] = []
+    atoms: List[int] = []
+    end = 0
+    if st.st_size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            skip = 0          # lines of the current frame still ahead
+            seen = 0          # lines in earlier windows
+            frame_open = False  # a frame ended; its end offset is the next line start
+            end = st.st_size
+            for line_start in _line_starts(mm, st.st_size, window):
+                i = skip
+                while i < len(line_start):
+                    start = int(line_start[i])
+                    if frame_open:
+                        end, frame_open = start, False
+                    stop = mm.find(b"\n", start)
+                    head = mm[start:stop if stop >= 0 else st.st_size].strip()
+                    if not head:  # blank separator / trailing lines
+                        i += 1
+                        continue
+                    try:
+                        n = int(head.split()[0])
+                    except ValueError:
+                        raise HTTPException(status_code=422, detail=(
+                            f"{path.name}: expected an atom count on line {seen + i + 1}"))
+                    starts.append(start)
+                    atoms.append(n)
+                    end, frame_open = st.st_size, True
+                    i += n + 2
+                skip = i - len(line_start)
+                seen += len(line_start)
+            if skip > 0:
+                raise HTTPException(status_code=422, detail=(
+                    f"{path.name}: truncated frame {len(atoms) - 1}"))
+    offsets = starts + [end]
+    return FrameIndex(st.st_size, st.st_mtime_ns, offsets, atoms)
+
+
+def _idx_path(path: Path) -> Path:
+    return path.with_name(path.name + ".idx")
+
+
+def _read_idx(path: Path, size: int, mtime_ns: int) -> Optional[FrameIndex]:
+    try:
+        data = json.loads(_idx_path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    if (data.get("version"), data.get("size"), data.get("mtime_ns")) != (INDEX_VERSION, size, mtime_ns):
+        return None
+    return FrameIndex(size, mtime_ns, data["offsets"], data["atoms"])
+
+
+def _write_idx(path: Path, index: FrameIndex) -> None:
+    target = _idx_path(path)
+    tmp = target.with_name(target.name + f".{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "size": index.size,
+                                   "mtime_ns": index.mtime_ns, "offsets": index.offsets,
+                                   "atoms": index.atoms}))
+        os.replace(tmp, target)
+    except OSError:  # read-only data dir: the in-memory copy still applies
+        tmp.unlink(missing_ok=True)
+
+
+_indexes: "OrderedDict[str, FrameIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+_INDEX_MEMO = 64
+
+
+def frame_index(path: Path) -> FrameIndex:
+    """In-memory memo -> "<file>.idx" -> full scan; stale entries (size/mtime) are rebuilt."""
+    st = path.stat()
+    key = str(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and (index.size, index.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            _indexes.move_to_end(key)
+            return index
+    index = _read_idx(path, st.st_size, st.st_mtime_ns)
+    if index is None:
+        with span("xyz_index"):
+            index = _scan(path)
+        _write_idx(path, index)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > _INDEX_MEMO:
+            _indexes.popitem(last=False)
+    return index
+
+
+# -----------------------------------------------------------------------------
+# Byte-range streaming
+# -----------------------------------------------------------------------------
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Single "bytes=a-b" range -> [start, end) within length; None = whole body."""
+    if not header or "," in header:  # multi-range: answer with the full body
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or m.group(1) == m.group(2) == "":
+        return None
+    first, last = m.group(1), m.group(2)
+    if first == "":
+        start, end = max(0, length - int(last)), length
+    else:
+        start = int(first)
+        end = min(length, int(last) + 1) if last else length
+    if start >= length or start >= end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{length}"})
+    return start, end
+
+
+def _iter_file(path: Path, start: int, end: int) -> Iterator[bytes]:
+    if end <= start:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for pos in range(start, end, STREAM_CHUNK_BYTES):
+            yield mm[pos:min(end, pos + STREAM_CHUNK_BYTES)]
+
+
+def stream_span(request: Request, path: Path, start: int, end: int,
+                media_type: str = "text/plain",
+                headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    Stream bytes [start, end) of `path`, honouring a single HTTP Range
+    (relative to the span) with 206 + Content-Range. Not zero-copy: ASGI
+    has no sendfile path here, so each STREAM_CHUNK_BYTES slice of the mmap
+    is copied into a bytes object (read in the threadpool) and memory per
+    request stays at one chunk whatever the file size.
+    """
+    length = end - start
+    st = path.stat()
+    out = {"Accept-Ranges": "bytes", "ETag": f'"{st.st_size:x}-{st.st_mtime_ns:x}-{start:x}-{end:x}"',
+           **(headers or {})}
+    status = 200
+    rng = _parse_range(request.headers.get("range"), length)
+    if rng is not None:
+        status = 206
+        out["Content-Range"] = f"bytes {rng[0]}-{rng[1] - 1}/{length}"
+        start, end = start + rng[0], start + rng[1]
+    out["Content-Length"] = str(end - start)
+    return StreamingResponse(_iter_file(path, start, end), status_code=status,
+                             media_type=media_type, headers=out)
+
+
+def frame_range(index: FrameIndex, start: int, stop: Optional[int]) -> Tuple[int, int]:
+    stop = index.frames if stop is None else min(stop, index.frames)
+    if start < 0 or start >= index.frames or stop <= start:
+        raise HTTPException(status_code=416, detail=(
+            f"Frames [{start}, {stop}) out of range (trajectory has {index.frames})"))
+    return start, stop
+
+
+# -----------------------------------------------------------------------------
+# Binary coordinates ("PFXB"): what the 3D viewer actually needs
+# -----------------------------------------------------------------------------
+# Little-endian layout, every section 4-byte aligned so the browser can wrap the
+# payload in typed arrays without copying:
+#   header   32 bytes  magic "PFXB", u16 version, u16 header bytes, u32 frames,
+#                      u32 atoms per frame, u64 source size, u64 source mtime_ns
+#   elements u8[atoms] atomic numbers (0 = unknown), zero-padded to 4 bytes
+#   coords   f32[frames][atoms][3]
+# The whole-trajectory encoding is written once next to the source as
+# "<file>.pfxb"; frame subsets are sliced out of it.
+BIN_MAGIC = b"PFXB"
+BIN_VERSION = 1
+BIN_HEADER = 32
+BIN_MEDIA_TYPE = "application/vnd.polyfold.xyz-binary"
+
+_SYMBOLS = (
+    "H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn "
+    "Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce "
+    "Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn"
+).split()
+ATOMIC_NUMBERS: Dict[str, int] = {s: z for z, s in enumerate(_SYMBOLS, start=1)}
+
+
+def _pad4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def _header(frames: int, atoms: int, size: int = 0, mtime_ns: int = 0) -> bytes:
+    return b"".join([
+        BIN_MAGIC,
+        np.array([BIN_VERSION, BIN_HEADER], dtype="<u2").tobytes(),
+        np.array([frames, atoms], dtype="<u4").tobytes(),
+        np.array([size, mtime_ns], dtype="<u8").tobytes(),
+    ])
+
+
+def _elements_block(elements: List[str]) -> bytes:
+    z = np.array([ATOMIC_NUMBERS.get(e.capitalize(), 0) for e in elements], dtype=np.uint8)
+    return z.tobytes().ljust(_pad4(len(z)), b"\0")
+
+
+def _frame_arrays(block: bytes, n: int) -> Tuple[List[str], "np.ndarray"]:
+    """Elements + (n, 3) float32 coordinates of one XYZ frame (extra columns ignored)."""
+    body = block.split(b"\n", 2)[2] if n else b""
+    rows = body.split(b"\n")[:n]
+    tokens = [r.split() for r in rows]
+    elements = [t[0].decode() for t in tokens]
+    coords = np.array([t[1:4] for t in tokens], dtype=np.float32).reshape(n, 3)
+    return elements, coords
+
+
+@lru_cache(maxsize=256)
+def encode_xyz_binary(text: str) -> bytes:
+    """Single XYZ block (e.g. a step's geometry) -> PFXB with one frame."""
+    data = text.encode()
+    n = int(data.split(None, 1)[0])
+    elements, coords = _frame_arrays(data, n)
+    return _header(1, n) + _elements_block(elements) + coords.astype("<f4").tobytes()
+
+
+def _encode_file(path: Path, index: FrameIndex) -> bytes:
+    if len(set(index.atoms)) > 1:
+        raise HTTPException(status_code=422, detail=(
+            f"{path.name}: frames have different atom counts; binary needs a fixed topology"))
+    n = index.atoms[0] if index.atoms else 0
+    coords = np.empty((index.frames, n, 3), dtype="<f4")
+    elements: List[str] = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(index.frames):
+            els, xyz = _frame_arrays(mm[index.offsets[i]:index.offsets[i + 1]], n)
+            if i == 0:
+                elements = els
+            coords[i] = xyz
+    return (_header(index.frames, n, index.size, index.mtime_ns)
+            + _elements_block(elements) + coords.tobytes())
+
+
+def _bin_paths(path: Path) -> List[Path]:
+    """Sidecar "<file>.pfxb", or a temp-dir copy when the data dir is read-only."""
+    digest = make_cache_key("xyz-binary", str(path.resolve()))[:16]
+    return [path.with_name(path.name + ".pfxb"),
+            Path(tempfile.gettempdir()) / f"polyfold-{digest}.pfxb"]
+
+
+def _fresh(target: Path, index: FrameIndex) -> bool:
+    try:
+        with open(target, "rb") as f:
+            head = f.read(BIN_HEADER)
+    except OSError:
+        return False
+    return (len(head) == BIN_HEADER and head[:4] == BIN_MAGIC
+            and tuple(int(v) for v in np.frombuffer(head, dtype="<u8", count=2, offset=16))
+            == (index.size, index.mtime_ns))
+
+
+def binary_file(path: Path) -> Tuple[Path, int, int]:
+    """
+    Cached whole-trajectory encoding -> (pfxb path, coords offset, bytes per frame).
+    Re-encoded when the header's source size/mtime no longer match.
+    """
+    index = frame_index(path)
+    n = index.atoms[0] if index.atoms else 0
+    layout = (BIN_HEADER + _pad4(n), n * 12)
+    candidates = _bin_paths(path)
+    for target in candidates:
+        if _fresh(target, index):
+            return (target, *layout)
+    with span("xyz_encode"):
+        data = _encode_file(path, index)
+    for target in candidates:
+        tmp = target.with_name(target.name + f".{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, target)
+            return (target, *layout)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+    raise HTTPException(status_code=500, detail=f"Could not cache binary encoding of {path.name}")
+
+
+def binary_frames(path: Path, start: int, stop: int) -> Tuple[bytes, bytes, Path, int, int]:
+    """(header, elements) for frames [start, stop) + the byte span of their coords in the cache."""
+    target, coords_at, frame_bytes = binary_file(path)
+    with open(target, "rb") as f:
+        head = f.read(coords_at)
+    atoms = int(np.frombuffer(head, dtype="<u4", count=1, offset=12)[0])
+    return (_header(stop - start, atoms), head[BIN_HEADER:coords_at], target,
+            coords_at + start * frame_bytes, coords_at + stop * frame_bytes)
+
+
+def stream_binary_frames(path: Path, start: int, stop: int) -> StreamingResponse:
+    header, elements, target, begin, end = binary_frames(path, start, stop)
+    prefix = header + elements
+
+    def body() -> Iterator[bytes]:
+        yield prefix
+        yield from _iter_file(target, begin, end)
+
+    return StreamingResponse(body(), media_type=BIN_MEDIA_TYPE, headers={
+        "Content-Length": str(len(prefix) + end - begin),
+        "X-Frames": f"{start}-{stop - 1}",
+    })
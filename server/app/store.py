@@ -0,0 +1,355 @@
+# server/app/store.py
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .lazy import LazyModule
+
+
+def _quiet_rdkit(_module) -> None:
+    from rdkit import rdBase
+    rdBase.DisableLog("rdApp.error")
+
+
+Chem = LazyModule("rdkit.Chem", on_import=_quiet_rdkit)
+
+# -----------------------------------------------------------------------------
+# Structure identity
+# -----------------------------------------------------------------------------
+# IDs are derived from content, so the same molecule gets the same
+# chemical_structure_id in every process and every run.
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().isoformat() + "Z"
+
+
+def structure_identity(smiles: str, inchikey: Optional[str] = None) -> Tuple[str, str, str]:
+    """SMILES -> (chemical_structure_id, inchikey, canonical SMILES)."""
+    mol = Chem.MolFromSmiles(smiles)
+    canonical = Chem.MolToSmiles(mol) if mol is not None else smiles
+    if not inchikey and mol is not None:
+        try:
+            inchikey = Chem.MolToInchiKey(mol) or None
+        except Exception:  # RDKit built without InChI
+            inchikey = None
+    if not inchikey:
+        inchikey = "IK_" + hashlib.sha256(canonical.encode()).hexdigest()[:14].upper()
+    return "CS_" + hashlib.sha256(inchikey.encode()).hexdigest()[:12], inchikey, canonical
+
+
+# -----------------------------------------------------------------------------
+# Repository
+# -----------------------------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS structures (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    chemical_structure_id TEXT NOT NULL UNIQUE,
+    inchikey TEXT NOT NULL UNIQUE,
+    smiles TEXT NOT NULL,
+    synonyms TEXT NOT NULL DEFAULT '[]',
+    tags TEXT NOT NULL DEFAULT '[]',
+    source TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS structures_smiles ON structures (smiles);
+CREATE TABLE IF NOT EXISTS structure_tags (
+    tag TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (tag, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS structure_synonyms (
+    synonym TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (synonym, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_name ON runs (name, seq);
+CREATE TABLE IF NOT EXISTS properties (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    property_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    cache_key TEXT,
+    value REAL,
+    category TEXT,
+    source TEXT,
+    source_id TEXT,
+    run_id TEXT,
+    chemical_structure_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS properties_name ON properties (name, seq);
+CREATE INDEX IF NOT EXISTS properties_run ON properties (run_id, seq);
+CREATE INDEX IF NOT EXISTS properties_structure ON properties (chemical_structure_id, seq);
+CREATE INDEX IF NOT EXISTS properties_source ON properties (source, seq);
+CREATE INDEX IF NOT EXISTS properties_source_id ON properties (source_id, seq);
+CREATE INDEX IF NOT EXISTS properties_cache_key ON properties (cache_key);
+"""
+
+MAX_PAGE = 1000
+
+
+def _page(rows: List[sqlite3.Row], limit: int) -> Tuple[List[sqlite3.Row], Optional[int]]:
+    """Rows fetched with LIMIT limit + 1 -> (page, next cursor or None)."""
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["seq"]
+    return rows, None
+
+
+class Repository:
+    """
+    SQLite-backed store for structures, runs and properties shared by the
+    physics, literature and designer routers. Listing is keyset-paginated on an
+    autoincrement `seq` (pass the returned `next_cursor` back as `cursor`), so
+    pages stay O(limit) regardless of table size; tag / run / name filters hit
+    their own indexes.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    # -- structures -----------------------------------------------------------
+    @staticmethod
+    def _structure(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "chemical_structure_id": row["chemical_structure_id"],
+            "inchikey": row["inchikey"],
+            "smiles": row["smiles"],
+            "synonyms": json.loads(row["synonyms"]),
+            "tags": json.loads(row["tags"]),
+            "source": row["source"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _upsert_structure(self, smiles: str, synonyms: Sequence[str], tags: Sequence[str],
+                          source: Optional[str], inchikey: Optional[str]) -> Dict[str, Any]:
+        sid, inchikey, canonical = structure_identity(smiles, inchikey)
+        now = _now()
+        row = self._db.execute(
+            "SELECT * FROM structures WHERE inchikey = ?", (inchikey,)
+        ).fetchone()
+        if row is None:
+            cur = self._db.execute(
+                "INSERT INTO structures (chemical_structure_id, inchikey, smiles, synonyms, tags,"
+                " source, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sid, inchikey, canonical, json.dumps(list(dict.fromkeys(synonyms))),
+                 json.dumps(sorted(set(tags))), source, now, now),
+            )
+            seq, new_syn, new_tags = cur.lastrowid, list(synonyms), list(tags)
+        else:
+            seq = row["seq"]
+            old_syn, old_tags = json.loads(row["synonyms"]), json.loads(row["tags"])
+            new_syn = [s for s in synonyms if s not in old_syn]
+            new_tags = [t for t in tags if t not in old_tags]
+            if new_syn or new_tags:
+                self._db.execute(
+                    "UPDATE structures SET synonyms = ?, tags = ?, updated_at = ? WHERE seq = ?",
+                    (json.dumps(list(dict.fromkeys(old_syn + new_syn))),
+                     json.dumps(sorted(set(old_tags + new_tags))), now, seq),
+                )
+        self._db.executemany("INSERT OR IGNORE INTO structure_tags VALUES (?, ?)",
+                             [(t, seq) for t in new_tags])
+        self._db.executemany("INSERT OR IGNORE INTO structure_synonyms VALUES (?, ?)",
+                             [(s, seq) for s in new_syn])
+        return self._structure(self._db.execute(
+            "SELECT * FROM structures WHERE seq = ?", (seq,)).fetchone())
+
+    def upsert_structure(self, smiles: str, synonyms: Sequence[str] = (), tags: Sequence[str] = (),
+                         source: Optional[str] = None,
+                         inchikey: Optional[str] = None) -> Dict[str, Any]:
+        """Insert or merge (synonyms/tags are unioned) one structure; returns it."""
+        with self._lock, self._db:
+            return self._upsert_structure(smiles, synonyms, tags, source, inchikey)
+
+    def upsert_structures(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Batch upsert in one transaction; items are {smiles, synonyms?, tags?, source?, inchikey?}."""
+        with self._lock, self._db:
+            return [self._upsert_structure(i["smiles"], i.get("synonyms", ()), i.get("tags", ()),
+                                           i.get("source"), i.get("inchikey")) for i in items]
+
+    def get_structure(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Look up by chemical_structure_id, inchikey, synonym or (canonical) SMILES."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM structures WHERE chemical_structure_id = ? OR inchikey = ? OR smiles = ?"
+                " LIMIT 1", (ref, ref, ref)).fetchone() or self._db.execute(
+                "SELECT s.* FROM structure_synonyms y JOIN structures s ON s.seq = y.seq"
+                " WHERE y.synonym = ? ORDER BY s.seq LIMIT 1", (ref,)).fetchone()
+        if row is None and Chem.MolFromSmiles(ref) is not None:
+            canonical = structure_identity(ref)[2]
+            if canonical != ref:
+                return self.get_structure(canonical)
+        return self._structure(row) if row is not None else None
+
+    def list_structures(self, tag: Optional[str] = None, limit: int = 100,
+                        cursor: Optional[int] = None) -> Dict[str, Any]:
+        limit = max(1, min(limit, MAX_PAGE))
+        after = cursor or 0
+        with self._lock:
+            if tag:
+                rows = self._db.execute(
+                    "SELECT s.* FROM structure_tags t JOIN structures s ON s.seq = t.seq"
+                    " WHERE t.tag = ? AND t.seq > ? ORDER BY t.seq LIMIT ?",
+                    (tag, after, limit + 1)).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT * FROM structures WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (after, limit + 1)).fetchall()
+        rows, next_cursor = _page(rows, limit)
+        return {"items": [self._structure(r) for r in rows], "next_cursor": next_cursor}
+
+    def iter_structures(self, after: int = 0, batch: int = 5000) -> Iterable[Tuple[int, Dict[str, Any]]]:
+        """(seq, structure) for every structure with seq > after, in insertion order."""
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT * FROM structures WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (after, batch)).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield r["seq"], self._structure(r)
+            after = rows[-1]["seq"]
+
+    def tag_seqs(self, tag: str) -> List[int]:
+        """Ascending `seq`s of every structure carrying `tag` (index-only scan)."""
+        with self._lock:
+            return [r[0] for r in self._db.execute(
+                "SELECT seq FROM structure_tags WHERE tag = ? ORDER BY seq", (tag,))]
+
+    def count_structures(self, tag: Optional[str] = None) -> int:
+        with self._lock:
+            if tag:
+                return self._db.execute(
+                    "SELECT COUNT(*) FROM structure_tags WHERE tag = ?", (tag,)).fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM structures").fetchone()[0]
+
+    # -- runs -----------------------------------------------------------------
+    def save_run(self, run: Dict[str, Any]) -> None:
+        """Insert or replace a Run (model_dump()) by run_id."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO runs (run_id, name, status, started_at, finished_at, data)"
+                " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(run_id) DO UPDATE SET"
+                " status = excluded.status, finished_at = excluded.finished_at, data = excluded.data",
+                (run["run_id"], run["name"], run["status"], run.get("started_at"),
+                 run.get("finished_at"), json.dumps(run, default=str)),
+            )
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def list_runs(self, names: Optional[Sequence[str]] = None, limit: int = 100,
+                  cursor: Optional[int] = None) -> Dict[str, Any]:
+        """Newest first, optionally only runs named in `names`; `cursor` continues below the previous page."""
+        limit = max(1, min(limit, MAX_PAGE))
+        before = cursor or (1 << 62)
+        sql, args = "SELECT seq, data FROM runs WHERE seq < ?", [before]
+        if names:
+            sql += f" AND name IN ({', '.join('?' * len(names))})"
+            args += list(names)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY seq DESC LIMIT ?", (*args, limit + 1)).fetchall()
+        rows, next_cursor = _page(rows, limit)
+        return {"items": [json.loads(r["data"]) for r in rows], "next_cursor": next_cursor}
+
+    # -- properties -----------------------------------------------------------
+    def add_properties(self, props: Iterable[Dict[str, Any]], source: Optional[str] = None) -> int:
+        """
+        Insert or replace Property records (model_dump()) by property_id. Optional
+        index columns are read from the record: run_id / source_id from provenance,
+        chemical_structure_id from qualifiers.
+        """
+        rows = []
+        for p in props:
+            prov, qual = p.get("provenance") or {}, p.get("qualifiers") or {}
+            value = p.get("value")
+            rows.append((
+                p["property_id"], p["name"], p.get("cache_key"),
+                value if isinstance(value, (int, float)) else None, p.get("category"),
+                source or prov.get("source"), p.get("source_id") or prov.get("source_id"),
+                prov.get("run_id"), qual.get("chemical_structure_id"), json.dumps(p, default=str),
+            ))
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO properties (property_id, name, cache_key, value, category, source,"
+                " source_id, run_id, chemical_structure_id, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(property_id) DO UPDATE SET name = excluded.name,"
+                " cache_key = excluded.cache_key, value = excluded.value, category = excluded.category,"
+                " source = excluded.source, source_id = excluded.source_id, run_id = excluded.run_id,"
+                " chemical_structure_id = excluded.chemical_structure_id, data = excluded.data", rows)
+        return len(rows)
+
+    def list_properties(self, name: Optional[str] = None, run_id: Optional[str] = None,
+                        chemical_structure_id: Optional[str] = None, source: Optional[str] = None,
+                        source_id: Optional[str] = None, limit: int = 100,
+                        cursor: Optional[int] = None) -> Dict[str, Any]:
+        limit = max(1, min(limit, MAX_PAGE))
+        clauses, args = ["seq > ?"], [cursor or 0]
+        for column, value in (("name", name), ("run_id", run_id), ("source", source),
+                              ("source_id", source_id),
+                              ("chemical_structure_id", chemical_structure_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT seq, data FROM properties WHERE {' AND '.join(clauses)}"
+                " ORDER BY seq LIMIT ?", (*args, limit + 1)).fetchall()
+        rows, next_cursor = _page(rows, limit)
+        return {"items": [json.loads(r["data"]) for r in rows], "next_cursor": next_cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {t: self._db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                      for t in ("structures", "runs", "properties")}
+        return {**counts, "path": self.path}
+
+
+# -----------------------------------------------------------------------------
+# Process-wide repository
+# -----------------------------------------------------------------------------
+DEFAULT_DB = str(Path(__file__).resolve().parents[1] / "data" / "polyfold.sqlite3")
+
+_repository: Optional[Repository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> Repository:
+    """
+    Shared repository at POLYFOLD_DB (default server/data/polyfold.sqlite3;
+    ":memory:" for a throwaway store).
+    """
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = Repository(os.getenv("POLYFOLD_DB") or DEFAULT_DB)
+    return _repository
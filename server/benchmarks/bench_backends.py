@@ -0,0 +1,95 @@
+# server/benchmarks/bench_backends.py
+"""
+PolyTAO CPU inference backends: tokens/sec and SMILES validity per mode.
+
+Each mode runs in a fresh subprocess (POLYTAO_BACKEND is read at model load),
+warms up, then samples --rounds x --n generations for a fixed set of prompts.
+Needs torch/transformers and the model weights.
+
+    cd server && python -m benchmarks.bench_backends [--modes fp32,int8] [--threads 4]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROMPT_TARGETS = [
+    [],
+    [{"kind": "Mw", "value": 300}, {"kind": "LogP", "value": 1.5}],
+    [{"kind": "TPSA", "value": 60}, {"kind": "NumRings", "value": 2}],
+    [{"kind": "NumRotatableBonds", "value": 4}],
+]
+
+
+def _worker(n: int, rounds: int, max_new_tokens: int) -> dict:
+    from app.routers import aidesigner_helpers as helpers
+
+    status = helpers.warm_up()
+    tokenizer, _, _, _ = helpers.get_model()
+    prompts = [helpers.build_prompt(None, t, {}) for t in PROMPT_TARGETS]
+
+    texts = []
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for p in prompts:
+            texts.extend(helpers.sample_texts(p, n=n, max_new_tokens=max_new_tokens))
+    gen_s = time.perf_counter() - t0
+
+    tokens = sum(len(tokenizer(t, add_special_tokens=False)["input_ids"]) for t in texts)
+    smiles = [smi for smi, _ in helpers.postprocess_texts(texts, workers=1)]
+    valid = [s for s in smiles if s]
+    return {
+        "backend": helpers.INFERENCE_BACKEND,
+        "threads": status.get("threads"),
+        "load_timings": status.get("timings"),
+        "generations": len(texts),
+        "tokens_per_s": round(tokens / gen_s, 1),
+        "generations_per_s": round(len(texts) / gen_s, 2),
+        "validity_rate": round(len(valid) / len(texts), 3),
+        "unique_valid": len(set(valid)),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modes", default="fp32,int8,compile")
+    ap.add_argument("--n", type=int, default=8)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--max-new-tokens", type=int, default=128)
+    ap.add_argument("--threads", type=int, default=0, help="POLYTAO_NUM_THREADS for every mode")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.n, args.rounds, args.max_new_tokens)))
+        return
+
+    results = []
+    for mode in args.modes.split(","):
+        env = dict(os.environ, POLYTAO_BACKEND=mode, POLYTAO_NUM_THREADS=str(args.threads))
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_backends", "--worker",
+             "--n", str(args.n), "--rounds", str(args.rounds),
+             "--max-new-tokens", str(args.max_new_tokens)],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            results.append({"backend": mode, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    base = next((r for r in results if r.get("backend") == "fp32" and "error" not in r), None)
+    if base:
+        for r in results:
+            if "error" not in r:
+                r["speedup_vs_fp32"] = round(r["tokens_per_s"] / base["tokens_per_s"], 2)
+                r["validity_delta_vs_fp32"] = round(r["validity_rate"] - base["validity_rate"], 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
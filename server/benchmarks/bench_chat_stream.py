@@ -0,0 +1,126 @@
+# server/benchmarks/bench_chat_stream.py
+"""
+Copilot time-to-first-token, fully offline: starts the OpenAI-compatible stub
+(`benchmarks.openai_stub`) and the API on local ports, then streams
+/api/chat/stream at several concurrency levels. The baseline is the previous
+code path: one blocking, non-streamed completion, where the first byte
+arrives only with the whole reply. Also checks that closing the browser side
+mid-stream abandons the upstream stream.
+
+    cd server && python -m benchmarks.bench_chat_stream [--ttft-ms 300] [--token-ms 15] [--concurrency 1,8,32]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from .openai_stub import create_app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def _pct(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+
+
+async def _stream_once(client: httpx.AsyncClient, url: str):
+    t0 = time.perf_counter()
+    ttft = None
+    events = 0
+    async with client.stream("GET", url, params={"text": "How do I pick a monomer?"}) as r:
+        async for line in r.aiter_lines():
+            if line.startswith("data: ") and line != "data: [DONE]":
+                if ttft is None:
+                    ttft = time.perf_counter() - t0
+                events += 1
+    return ttft, time.perf_counter() - t0, events
+
+
+async def _level(url: str, concurrency: int):
+    async with httpx.AsyncClient(timeout=120) as client:
+        results = await asyncio.gather(*(_stream_once(client, url) for _ in range(concurrency)))
+    ttfts = [r[0] for r in results]
+    totals = [r[1] for r in results]
+    return {"concurrency": concurrency, "ttft_ms": {"p50": _pct(ttfts, 0.5), "p95": _pct(ttfts, 0.95)},
+            "total_ms": {"p50": _pct(totals, 0.5), "p95": _pct(totals, 0.95)},
+            "events_per_reply": results[0][2]}
+
+
+async def _abandon(url: str) -> None:
+    async with httpx.AsyncClient(timeout=30) as client:
+        async with client.stream("GET", url, params={"text": "hi"}) as r:
+            async for line in r.aiter_lines():
+                if line.startswith("data: "):
+                    break  # close the connection after the first token
+
+
+def _blocking_baseline(base_url: str, repeat: int) -> float:
+    from openai import OpenAI
+
+    client = OpenAI(api_key="local", base_url=base_url)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        client.chat.completions.create(model="gpt-4o-mini", temperature=0.3,
+                                       messages=[{"role": "user", "content": "hi"}])
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ttft-ms", type=float, default=300.0)
+    ap.add_argument("--token-ms", type=float, default=15.0)
+    ap.add_argument("--concurrency", default="1,8,32")
+    args = ap.parse_args()
+
+    stub_port, api_port = _free_port(), _free_port()
+    base_url = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("POLYFOLD_ROUTERS", "chat")
+    _serve(create_app(args.ttft_ms, args.token_ms), stub_port)
+    from app.main import app
+    _serve(app, api_port)
+    url = f"http://127.0.0.1:{api_port}/api/chat/stream"
+
+    asyncio.run(_level(url, 1))  # warm the API's upstream client and pool
+    levels = [asyncio.run(_level(url, int(c))) for c in args.concurrency.split(",")]
+    before = httpx.get(f"http://127.0.0.1:{stub_port}/stats").json()
+    asyncio.run(_abandon(url))
+    time.sleep(0.5)
+    after = httpx.get(f"http://127.0.0.1:{stub_port}/stats").json()
+    blocking = _blocking_baseline(base_url, 3)
+
+    print(json.dumps({
+        "stub": {"ttft_ms": args.ttft_ms, "token_ms": args.token_ms},
+        "blocking_first_byte_ms": round(blocking * 1000, 1),
+        "streaming": levels,
+        "disconnect_abandons_upstream": after["abandoned"] > before["abandoned"] and after["active"] == 0,
+        "api_metrics": httpx.get(f"http://127.0.0.1:{api_port}/api/chat/metrics").json(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
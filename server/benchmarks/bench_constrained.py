@@ -0,0 +1,182 @@
+# server/benchmarks/bench_constrained.py
+"""
+Valid unique candidates per second: today's free sampling + SMILES rescue vs.
+grammar-constrained decoding (`constrained=True`: SmilesLogitsProcessor masks
+tokens that break the grammar and ends a row at a complete molecule).
+Both sides pay decode time plus `process_candidate` post-processing.
+
+    cd server && python -m benchmarks.bench_constrained [--rounds 20] [--n 16] [--model bigram|polytao]
+
+`--model polytao` runs the real model through `generate_batch` (needs torch +
+transformers and the weights). The default, `bigram`, is an offline check of
+the mechanism: a character-level bigram model fit to the synthetic corpus
+(`benchmarks/data`), decoded step by step with the same TokenGrammar, each step
+costing `--step-ms`. Its absolute validity says nothing about PolyTAO's; the
+decode steps saved and the parses avoided are what carry over.
+
+The grammar admits plain SMILES only, so BigSMILES output (`{[$]...[$]}`
+stochastic objects, which PolyTAO-BigSMILES emits) is masked. Each side reports
+`bigsmiles_texts` (generations using that syntax) and `bigsmiles_valid` (how
+many of them post-processing still turned into a valid SMILES): that is what
+the constraint steers the model away from.
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.routers import aidesigner_helpers as helpers
+from app.routers.aidesigner_grammar import _SMILES_CHARS, START, TokenGrammar
+from .corpus import load_generations
+from .report import emit
+
+_BIGSMILES = re.compile(r"[{}]|\[[$<>]")
+PROMPT = "Generate a polymer with Mw=250, logP=2.5. Return a valid SMILES only, no explanation."
+
+
+class BigramModel:
+    """Character bigram LM over the corpus; token 0 is EOS, the last row is the start state."""
+
+    def __init__(self, texts: List[str], smoothing: float = 0.05):
+        self.vocab = ["</s>"] + sorted(set("".join(texts)))
+        index = {ch: i for i, ch in enumerate(self.vocab)}
+        v = len(self.vocab)
+        counts = np.full((v + 1, v), smoothing)
+        for t in texts:
+            prev = v
+            for ch in t:
+                counts[prev, index[ch]] += 1
+                prev = index[ch]
+            counts[prev, 0] += 1
+        self.logp = np.log(counts / counts.sum(axis=1, keepdims=True))
+        self.start = v
+        self.grammar = TokenGrammar([(ch, False) if ch in _SMILES_CHARS else None for ch in self.vocab],
+                                    eos_token_id=0)
+
+    def generate(self, rows: int, max_new_tokens: int, temperature: float, rng: np.random.Generator,
+                 step_s: float, constrained: bool, top_p: float = 0.95, candidates: int = 64) -> Tuple[List[str], int]:
+        prev = np.full(rows, self.start)
+        out: List[List[str]] = [[] for _ in range(rows)]
+        states: List[Optional[object]] = [START] * rows
+        alive = np.ones(rows, dtype=bool)
+        steps = 0
+        for _ in range(max_new_tokens):
+            if not alive.any():
+                break
+            steps += 1
+            logits = self.logp[prev] / temperature
+            if constrained:  # generate() runs custom processors before the top-p warper
+                order = np.argsort(-logits, axis=1)[:, :candidates]
+                p = np.exp(logits - logits.max(axis=1, keepdims=True))
+                p /= p.sum(axis=1, keepdims=True)
+                for r in np.flatnonzero(alive):
+                    allowed = self.grammar.allowed(states[r], order[r].tolist(), p[r, order[r]].tolist())
+                    masked = np.full(logits.shape[1], -np.inf)
+                    masked[allowed] = logits[r, allowed]
+                    logits[r] = masked
+            order = np.argsort(-logits, axis=1)
+            probs = np.take_along_axis(np.exp(logits - logits.max(axis=1, keepdims=True)), order, axis=1)
+            probs /= probs.sum(axis=1, keepdims=True)
+            outside = np.cumsum(probs, axis=1) - probs >= top_p
+            np.put_along_axis(logits, order, np.where(outside, -np.inf, np.take_along_axis(logits, order, axis=1)),
+                              axis=1)
+            picks = np.argmax(logits + rng.gumbel(size=logits.shape), axis=1)
+            for r in np.flatnonzero(alive):
+                t = int(picks[r])
+                if t == 0:
+                    alive[r] = False
+                    continue
+                out[r].append(self.vocab[t])
+                if constrained:
+                    states[r] = self.grammar.step(states[r], t)
+            prev = picks
+            time.sleep(step_s)  # one forward pass of the padded batch
+        return ["".join(o) for o in out], steps
+
+
+def _postprocess(texts: List[str]) -> Tuple[List[Optional[str]], int]:
+    parse = helpers.SmilesParser()
+    smiles = [helpers.process_candidate(t, parse=parse)[0] for t in texts]
+    return smiles, parse.parses
+
+
+def _side(generate, rounds: int, n: int) -> Dict[str, object]:
+    decode_s = post_s = 0.0
+    texts_total = chars = parses = steps = bigsmiles = bigsmiles_valid = 0
+    valid: List[str] = []
+    for i in range(rounds):
+        t0 = time.perf_counter()
+        texts, batch_steps = generate(i)
+        t1 = time.perf_counter()
+        smiles, batch_parses = _postprocess(texts)
+        t2 = time.perf_counter()
+        decode_s += t1 - t0
+        post_s += t2 - t1
+        texts_total += len(texts)
+        chars += sum(len(t) for t in texts)
+        parses += batch_parses
+        steps += batch_steps
+        flagged = [bool(_BIGSMILES.search(t)) for t in texts]
+        bigsmiles += sum(flagged)
+        bigsmiles_valid += sum(1 for f, s in zip(flagged, smiles) if f and s)
+        valid.extend(s for s in smiles if s)
+    unique = len(set(valid))
+    total = decode_s + post_s
+    return {
+        "generated": texts_total, "valid": len(valid), "valid_unique": unique,
+        "valid_fraction": round(len(valid) / max(texts_total, 1), 3),
+        "mean_chars": round(chars / max(texts_total, 1), 1),
+        "bigsmiles_texts": bigsmiles, "bigsmiles_valid": bigsmiles_valid,
+        "decode_steps": steps or None, "rdkit_parses_per_text": round(parses / max(texts_total, 1), 2),
+        "decode_s": round(decode_s, 3), "postprocess_s": round(post_s, 3),
+        "valid_unique_per_s": round(unique / total, 2) if total else None,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=20, help="generate calls per side")
+    ap.add_argument("--n", type=int, default=16, help="rows per generate call")
+    ap.add_argument("--max-new-tokens", type=int, default=128)
+    ap.add_argument("--temperature", type=float, default=0.9)
+    ap.add_argument("--model", choices=["bigram", "polytao"], default="bigram")
+    ap.add_argument("--step-ms", type=float, default=2.0, help="bigram: simulated cost per decode step")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    ap.add_argument("--baseline", help="earlier report to compare against")
+    args = ap.parse_args()
+
+    results: Dict[str, object] = {}
+    if args.model == "polytao":
+        from transformers import set_seed
+
+        helpers.warm_up()
+        for name, constrained in (("free", False), ("constrained", True)):
+            set_seed(args.seed)
+            results[name] = _side(lambda i: (helpers.sample_texts(
+                PROMPT, n=args.n, max_new_tokens=args.max_new_tokens, temperature=args.temperature,
+                constrained=constrained), 0), args.rounds, args.n)
+        from app.routers.aidesigner_grammar import grammar_stats
+        results["grammar"] = grammar_stats()
+    else:
+        model = BigramModel(load_generations())
+        for name, constrained in (("free", False), ("constrained", True)):
+            rng = np.random.default_rng(args.seed)
+            results[name] = _side(lambda i: model.generate(
+                args.n, args.max_new_tokens, args.temperature, rng, args.step_ms / 1000, constrained),
+                args.rounds, args.n)
+
+    free, constrained = results["free"], results["constrained"]
+    emit({
+        "model": args.model, "rounds": args.rounds, "n": args.n, **results,
+        "speedup_valid_unique_per_s": (round(constrained["valid_unique_per_s"] / free["valid_unique_per_s"], 2)
+                                       if free["valid_unique_per_s"] else None),
+    }, out=args.out, baseline=args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# server/benchmarks/bench_micro.py
+"""
+Micro-benchmarks of the designer's per-candidate functions over the synthetic
+corpus (hand-written PolyTAO-like texts, `data/synthetic_generations.txt`): SMILES extraction (`extract_mol`, `clean_text_to_smiles`),
+`canonize_smiles`, `compute_properties` with a cold and a warm property cache,
+and the full `process_candidate`. Each case runs the whole corpus `--repeat`
+times and reports µs per call (best pass and median pass).
+
+    cd server && python -m benchmarks.bench_micro [--repeat 20] [--out micro.json] [--baseline old.json]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from app import cache
+from app.routers import aidesigner_helpers as helpers
+from .corpus import load_generations
+from .report import emit
+
+
+def _cold_cache() -> None:
+    cache._property_cache = None
+
+
+def _case(run: Callable[[], int], repeat: int, setup: Callable[[], None] = lambda: None) -> Dict[str, float]:
+    """`run()` makes one pass and returns its call count; setup() runs untimed before each pass."""
+    passes: List[float] = []
+    calls = 0
+    for _ in range(repeat):
+        setup()
+        t0 = time.perf_counter()
+        calls = run()
+        passes.append(time.perf_counter() - t0)
+    per_call = lambda s: round(s / max(calls, 1) * 1e6, 2)
+    return {"calls_per_pass": calls, "us_per_call_best": per_call(min(passes)),
+            "us_per_call_median": per_call(statistics.median(passes))}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", help="also write the JSON report here")
+    ap.add_argument("--baseline", help="earlier report to compare against")
+    args = ap.parse_args()
+
+    texts = load_generations()
+    helpers.clean_text_to_smiles(texts[0])  # import RDKit outside the timings
+    smiles = [s for s in (helpers.clean_text_to_smiles(t) for t in texts) if s]
+
+    def extract() -> int:
+        parse = helpers.SmilesParser()  # one memo per "request", as in the router
+        for t in texts:
+            helpers.extract_mol(t, parse=parse)
+        return len(texts)
+
+    def clean() -> int:
+        for t in texts:
+            helpers.clean_text_to_smiles(t)
+        return len(texts)
+
+    def canonize() -> int:
+        for s in smiles:
+            helpers.canonize_smiles(s)
+        return len(smiles)
+
+    def properties() -> int:
+        for s in smiles:
+            helpers.compute_properties(s)
+        return len(smiles)
+
+    def pipeline() -> int:
+        parse = helpers.SmilesParser()
+        for t in texts:
+            helpers.process_candidate(t, parse=parse)
+        return len(texts)
+
+    r = args.repeat
+    emit({
+        "corpus": {"texts": len(texts), "valid_smiles": len(smiles)},
+        "cases": {
+            "extract_mol": _case(extract, r),
+            "clean_text_to_smiles": _case(clean, r),
+            "canonize_smiles": _case(canonize, r),
+            "compute_properties_cold": _case(properties, r, setup=_cold_cache),
+            "compute_properties_warm": _case(properties, r),
+            "process_candidate_cold": _case(pipeline, r, setup=_cold_cache),
+        },
+    }, out=args.out, baseline=args.baseline)
+
+
+if __name__ == "__main__":
+    main()
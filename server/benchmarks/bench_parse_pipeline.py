@@ -0,0 +1,94 @@
+# server/benchmarks/bench_parse_pipeline.py
+"""
+RDKit parses per candidate: original extract -> canonize -> properties chain
+vs. the single-parse `process_candidate` pipeline (which also includes the
+grammar-pruned rescue).
+
+Runs on the synthetic corpus (`data/synthetic_generations.txt`, hand-written
+PolyTAO-like texts, not model output): the counts show how the two code paths
+differ on those cases, not what real PolyTAO decodes cost.
+
+    cd server && python -m benchmarks.bench_parse_pipeline [--repeat 20]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from rdkit import Chem
+
+from app import cache
+from app.routers import aidesigner_helpers as helpers
+from . import legacy
+from .corpus import load_generations
+
+
+class _CountingParse:
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.fn(*args, **kwargs)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20, help="timing repetitions over the corpus")
+    args = ap.parse_args()
+
+    texts = load_generations()
+    original = Chem.MolFromSmiles
+    counter = _CountingParse(original)
+    Chem.MolFromSmiles = counter
+    try:
+        cache._property_cache = None
+        before = [legacy.process_candidate(t) for t in texts]
+        legacy_parses = counter.calls
+
+        counter.calls = 0
+        parse = helpers.SmilesParser()
+        after = [helpers.process_candidate(t, parse=parse) for t in texts]
+        pipeline_parses = counter.calls
+    finally:
+        Chem.MolFromSmiles = original
+
+    mismatches = [
+        {"text": t, "before": b[0], "after": a[0]}
+        for t, b, a in zip(texts, before, after) if b[0] != a[0]
+    ]
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for t in texts:
+            legacy.process_candidate(t)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        cache._property_cache = None  # cold property cache: measure parsing, not cache hits
+        parse = helpers.SmilesParser()  # fresh memo per "request"
+        for t in texts:
+            helpers.process_candidate(t, parse=parse)
+    pipeline_s = time.perf_counter() - t0
+
+    n = len(texts)
+    print(json.dumps({
+        "corpus": "synthetic",
+        "candidates": n,
+        "parses_per_candidate": {
+            "before": round(legacy_parses / n, 2),
+            "after": round(pipeline_parses / n, 2),
+        },
+        "ms_per_candidate": {
+            "before": round(1000 * legacy_s / (n * args.repeat), 4),
+            "after": round(1000 * pipeline_s / (n * args.repeat), 4),
+        },
+        "smiles_mismatches": mismatches,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
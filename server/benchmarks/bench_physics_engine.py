@@ -0,0 +1,56 @@
+# server/benchmarks/bench_physics_engine.py
+"""
+Physics run executor: wall time of one deltaE DAG (template x M monomers, stub
+methods) at increasing concurrency limits on the shared process pool.
+
+    cd server && python -m benchmarks.bench_physics_engine [--monomers 12]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+
+from app.routers import physics_engine
+from app.routers.physics_methods import DELTA_E
+
+TEMPLATE = {"name": "Template_Estradiol", "smiles": "C1CC2CCC3C(C1)CCC4=CC(=O)CCC234"}
+MONOMERS = [
+    "C=CC1=CC=NC=C1", "C=CC(=O)O", "C=C(C)C(=O)O", "C=CC(N)=O", "C=Cc1ccccc1",
+    "C=C(C)C(=O)OCCO", "C=CC#N", "C=Cc1ccc(N)cc1", "C=CC(=O)OCC", "C=C(C)C(=O)OC",
+    "C=CN1CCCC1=O", "C=Cc1ccncc1", "C=CC(=O)N(C)C", "C=COC(C)=O", "C=C(C)C(=O)N",
+    "C=CS(=O)(=O)O",
+]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--monomers", type=int, default=12)
+    args = ap.parse_args()
+
+    monomers = [{"name": f"M{i}", "smiles": s} for i, s in enumerate(MONOMERS[:args.monomers])]
+    structures = [TEMPLATE, *monomers]
+    pairs = [(TEMPLATE, m) for m in monomers]
+
+    # warm the pool (spawn + imports) outside the timings
+    physics_engine.submit_run([TEMPLATE], [], ["chem.mol/etkdg-mmff@v1"], {}).wait()
+
+    cpus = physics_engine.PHYSICS_WORKERS
+    rows = []
+    serial = None
+    for conc in sorted({1, *[c for c in (2, 4, 8, 16) if c <= cpus], cpus}):
+        t0 = time.perf_counter()
+        ex = physics_engine.submit_run(structures, pairs, [DELTA_E], {}, max_concurrency=conc)
+        ex.wait()
+        wall = time.perf_counter() - t0
+        serial = serial or wall
+        rows.append({"max_concurrency": conc, "steps": len(ex.steps), "status": ex.run.status,
+                     "wall_s": round(wall, 3), "speedup": round(serial / wall, 2)})
+
+    print(json.dumps({"pool_workers": cpus, "cpus": os.cpu_count(), "monomers": len(monomers),
+                      "results": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# server/benchmarks/bench_postprocess.py
+"""
+Wall time of candidate post-processing (extract, canonize, properties) for one
+n=50 batch of long generations, inline vs. the process pool at increasing
+worker counts. The property cache is bypassed so every run does the full work.
+
+    cd server && python -m benchmarks.bench_postprocess [--n 50] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import time
+
+from app import cache
+from app.routers import aidesigner_helpers as helpers
+from .corpus import load_generations
+
+
+def _long_generations(n: int, seed: int = 0):
+    """~128-token decodes: several corpus texts glued with junk in between."""
+    rng = random.Random(seed)
+    corpus = load_generations()
+    return [
+        " ".join(rng.choice(corpus) + rng.choice(["", ")(", "]]", "%1", "<unk>"]) for _ in range(6))
+        for _ in range(n)
+    ]
+
+
+def _timed(texts, workers: int, repeat: int, chunk: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        cache._property_cache = cache.ResultCache(max_items=1)  # effectively uncached
+        t0 = time.perf_counter()
+        helpers.postprocess_texts(texts, workers=workers, min_n=0, chunk_size=chunk)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--chunk", type=int, default=helpers.POSTPROCESS_CHUNK)
+    args = ap.parse_args()
+
+    texts = _long_generations(args.n)
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, *[w for w in (2, 4, 8, 16, 32) if w <= cpus], cpus})
+
+    rows = []
+    inline = None
+    for workers in counts:
+        if workers > 1:  # spawn + import cost is paid once, outside the timing
+            helpers.postprocess_texts(texts[:2], workers=workers, min_n=0, chunk_size=1)
+        wall = _timed(texts, workers, args.repeat, args.chunk)
+        inline = inline or wall
+        rows.append({"workers": workers, "wall_s": round(wall, 4), "speedup": round(inline / wall, 2)})
+
+    print(json.dumps({"n": args.n, "chunk": args.chunk, "cpus": cpus, "results": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# server/benchmarks/bench_property_summary.py
+"""
+Candidate property summaries at N candidates (e.g. many runs aggregated):
+the original per-candidate dict loop (sums only) vs. `PropertyColumns`
+(column build + count/mean/std/min/max/quantiles/target deviations in one
+vectorized pass), plus ranking against targets vs. a Python sort.
+
+    cd server && python -m benchmarks.bench_property_summary [--n 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from app.routers.aidesigner_helpers import (
+    PROPERTY_KEYS,
+    PropertyColumns,
+    summarize_candidate_properties,
+    target_values,
+)
+
+_TARGETS = [{"kind": "Mw", "value": 150.0}, {"kind": "LogP", "value": 2.0}, {"kind": "TPSA", "value": 40.0}]
+
+
+def _candidates(n: int):
+    rng = np.random.default_rng(0)
+    cols = {"MW": rng.normal(160, 30, n), "LogP": rng.normal(2, 1, n), "TPSA": rng.normal(45, 15, n),
+            "NumRings": rng.integers(0, 4, n), "NumRotatableBonds": rng.integers(0, 8, n)}
+    out = []
+    for i in range(n):
+        if i % 10 == 9:  # invalid generation
+            out.append({"properties": None})
+        else:
+            out.append({"properties": {k: (float(v[i]) if k in ("MW", "LogP", "TPSA") else int(v[i]))
+                                       for k, v in cols.items()}})
+    return out
+
+
+def _legacy_summary(candidates):
+    sums = {k: 0.0 for k in PROPERTY_KEYS}
+    counts = {k: 0 for k in PROPERTY_KEYS}
+    for c in candidates:
+        props = c.get("properties")
+        if not isinstance(props, dict):
+            continue
+        for k in PROPERTY_KEYS:
+            v = props.get(k)
+            if isinstance(v, (int, float)):
+                sums[k] += float(v)
+                counts[k] += 1
+    return [{"kind": k, "sum": sums[k], "doubled": 2 * sums[k]} for k in PROPERTY_KEYS if counts[k]]
+
+
+def _python_ranking(candidates, targets):
+    scored = []
+    for i, c in enumerate(candidates):
+        props = c.get("properties") or {}
+        if any(not isinstance(props.get(k), (int, float)) for k in targets):
+            continue
+        d = math.sqrt(sum(((props[k] - t) / max(abs(t), 1.0)) ** 2 for k, t in targets.items()) / len(targets))
+        scored.append((d, i))
+    scored.sort()
+    return [i for _, i in scored]
+
+
+def _best(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    candidates = _candidates(args.n)
+    targets = target_values(_TARGETS)
+    legacy_s, legacy = _best(lambda: _legacy_summary(candidates), args.repeat)
+    full_s, full = _best(lambda: summarize_candidate_properties(candidates, _TARGETS), args.repeat)
+    build_s, columns = _best(lambda: PropertyColumns(candidates), args.repeat)
+    summary_s, _ = _best(lambda: columns.summary(targets), args.repeat)
+    rank_s, ranking = _best(lambda: columns.ranking(targets), args.repeat)
+    py_rank_s, py_ranking = _best(lambda: _python_ranking(candidates, targets), args.repeat)
+    for a, b in zip(legacy, full):
+        assert a["kind"] == b["kind"] and math.isclose(a["sum"], b["sum"], rel_tol=1e-9)
+    assert [i for i, _ in ranking] == py_ranking
+
+    print(json.dumps({
+        "candidates": args.n,
+        "legacy_sums_only_ms": round(legacy_s * 1000, 3),
+        "columnar_ms": {"build_columns": round(build_s * 1000, 3),
+                        "summary_with_quantiles_and_targets": round(summary_s * 1000, 3),
+                        "end_to_end": round(full_s * 1000, 3)},
+        "ranking_ms": {"columnar": round(rank_s * 1000, 3), "python_sort": round(py_rank_s * 1000, 3),
+                       "speedup": round(py_rank_s / rank_s, 1)},
+        "summary_on_prebuilt_columns_vs_legacy": round(legacy_s / summary_s, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# server/benchmarks/bench_rescue.py
+"""
+SMILES rescue regression + benchmark on the synthetic corpus
+(hand-written PolyTAO-like texts, `data/synthetic_generations.txt`).
+
+Every token of every corpus text (plus seeded random truncations /
+junk-tail mutations of them) is rescued by the original `_greedy_rescue` and
+by the grammar-pruned one; answers must be identical. Reports RDKit parses
+and time per token for both.
+
+    cd server && python -m benchmarks.bench_rescue [--mutations 20] [--seed 0]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from rdkit import Chem
+
+from app.routers import aidesigner_helpers as helpers
+from . import legacy
+from .corpus import load_generations
+
+_JUNK = ["((", ")", "[", "]]", "1", "%1", "=", "#", "<pad>", "c1cc", "N)", "O(", "%12"]
+
+
+def _tokens(texts, mutations: int, seed: int):
+    rng = random.Random(seed)
+    toks = []
+    for t in texts:
+        base = [tok for tok in helpers._split_candidates(helpers._basic_clean(t)) if len(tok) >= 5]
+        toks.extend(base)
+        for tok in base:
+            for _ in range(mutations):
+                cut = rng.randrange(1, len(tok) + 1)
+                junk = "".join(rng.choice(_JUNK) for _ in range(rng.randrange(1, 4)))
+                toks.append(rng.choice([tok[:cut] + junk, junk + tok[cut:], tok[:cut] + junk + tok[cut:]]))
+    return toks
+
+
+class _Counter:
+    def __init__(self, parse=Chem.MolFromSmiles):
+        self.parse = parse
+        self.calls = 0
+
+    def __call__(self, smi):
+        self.calls += 1
+        return self.parse(smi)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mutations", type=int, default=20, help="random mutations per corpus token")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    tokens = _tokens(load_generations(), args.mutations, args.seed)
+
+    mismatches = []
+    before = _Counter()
+    after = _Counter()
+    legacy_s = pruned_s = 0.0
+    for tok in tokens:
+        legacy.Chem.MolFromSmiles, orig = before, legacy.Chem.MolFromSmiles
+        t0 = time.perf_counter()
+        try:
+            want = legacy._greedy_rescue(tok)
+        finally:
+            legacy.Chem.MolFromSmiles = orig
+        legacy_s += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        got = helpers._greedy_rescue(tok, parse=after)
+        pruned_s += time.perf_counter() - t0
+
+        if want != got:
+            mismatches.append({"token": tok, "before": want, "after": got})
+
+    n = len(tokens)
+    print(json.dumps({
+        "tokens": n,
+        "parses_per_token": {"before": round(before.calls / n, 2), "after": round(after.calls / n, 2)},
+        "us_per_token": {"before": round(1e6 * legacy_s / n, 1), "after": round(1e6 * pruned_s / n, 1)},
+        "mismatches": mismatches[:20],
+        "mismatch_count": len(mismatches),
+    }, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
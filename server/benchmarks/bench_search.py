@@ -0,0 +1,103 @@
+# server/benchmarks/bench_search.py
+"""
+Structure search over N synthetic structures (vinylpyridine / styrene /
+acrylate heads on branched chains): fingerprint index build rate, Tanimoto
+top-k on the packed matrix vs. parsing + fingerprinting every structure per
+request, and substructure search with the pattern-fingerprint screen vs.
+HasSubstructMatch on everything.
+
+    cd server && python -m benchmarks.bench_search [--n 20000] [--k 10]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from rdkit import Chem, DataStructs
+from rdkit.Chem import rdFingerprintGenerator
+
+from app.routers.physics_search import FP_BITS, MORGAN_RADIUS, FingerprintIndex
+from app.store import Repository
+from .bench_store import _smiles
+
+_HEADS = ("C=Cc1ccncc1", "C=Cc1ccccc1", "C=CC(=O)O", "C=CC(=O)N", "C=Cc1cccnc1")
+_QUERY_SIMILAR = "C=Cc1ccncc1CC(C)O"
+_QUERY_SUB = "C=Cc1ccncc1"
+
+
+def _library(n: int):
+    for i, tail in enumerate(_smiles(n)):
+        yield {"smiles": _HEADS[i % len(_HEADS)] + tail[3:],  # drop the chain's own "C=C"
+               "tags": ["candidate"]}
+
+
+def _best(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20_000)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    repo = Repository(":memory:")
+    batch = []
+    for item in _library(args.n):
+        batch.append(item)
+        if len(batch) == 2000:
+            repo.upsert_structures(batch)
+            batch = []
+    repo.upsert_structures(batch)
+    smiles = [s["smiles"] for _, s in repo.iter_structures()]
+
+    index = FingerprintIndex(repo)
+    t0 = time.perf_counter()
+    index.refresh()
+    build_s = time.perf_counter() - t0
+
+    gen = rdFingerprintGenerator.GetMorganGenerator(radius=MORGAN_RADIUS, fpSize=FP_BITS)
+    qfp = gen.GetFingerprint(Chem.MolFromSmiles(_QUERY_SIMILAR))
+
+    def naive_similar():
+        fps = [gen.GetFingerprint(Chem.MolFromSmiles(s)) for s in smiles]
+        sims = DataStructs.BulkTanimotoSimilarity(qfp, fps)
+        return sorted(sims, reverse=True)[:args.k]
+
+    qmol = Chem.MolFromSmiles(_QUERY_SUB)
+
+    def naive_substructure():
+        return sum(1 for s in smiles if Chem.MolFromSmiles(s).HasSubstructMatch(qmol))
+
+    sim_s, sim = _best(lambda: index.similar(_QUERY_SIMILAR, k=args.k), args.repeat)
+    naive_sim_s, naive_top = _best(naive_similar, 1)
+    sub_s, sub = _best(lambda: index.substructure(_QUERY_SUB, limit=len(smiles)), args.repeat)
+    naive_sub_s, naive_matches = _best(naive_substructure, 1)
+    assert [round(r["similarity"], 4) for r in sim["results"]] == [round(v, 4) for v in naive_top]
+    assert sub["stats"]["matched"] == naive_matches
+
+    print(json.dumps({
+        "structures": len(smiles),
+        "index_build_s": round(build_s, 2),
+        "index_rows_per_s": round(len(smiles) / build_s),
+        "similar_top_k": {"k": args.k, "index_ms": round(sim_s * 1000, 2),
+                          "parse_per_request_ms": round(naive_sim_s * 1000, 2),
+                          "speedup": round(naive_sim_s / sim_s, 1)},
+        "substructure": {"query": _QUERY_SUB, "matched": naive_matches,
+                         "screen_passed": sub["stats"]["screen_passed"],
+                         "index_ms": round(sub_s * 1000, 2),
+                         "match_everything_ms": round(naive_sub_s * 1000, 2),
+                         "speedup": round(naive_sub_s / sub_s, 1)},
+        "matrix_bytes": index.stats()["matrix_bytes"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
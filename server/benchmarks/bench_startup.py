@@ -0,0 +1,84 @@
+# server/benchmarks/bench_startup.py
+"""
+API boot cost per deployment profile, from `python -X importtime`.
+
+For each scenario a fresh interpreter imports `app.main` with the given
+POLYFOLD_ROUTERS; "designer first call" additionally pulls in the deferred
+torch / transformers / RDKit stack, i.e. what every replica paid at boot when
+those were module-level imports. Reports total import time, peak RSS and the
+heaviest top-level packages.
+
+    cd server && python -m benchmarks.bench_startup [--top 8]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+_SCENARIOS = {
+    "literature only": ("literature", ""),
+    "physics only": ("physics", ""),
+    "all routers (lazy ML imports)": ("literature,ai-designer,physics,chat", ""),
+    "all routers + designer first call": (
+        "literature,ai-designer,physics,chat",
+        "import torch, transformers; from rdkit.Chem import Descriptors, Crippen, rdMolDescriptors",
+    ),
+}
+
+_PROBE = (
+    "import resource, app.main\n"
+    "{extra}\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def _run(routers: str, extra: str) -> dict:
+    env = dict(os.environ, POLYFOLD_ROUTERS=routers)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(extra=extra)],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1:]}
+
+    per_package = defaultdict(int)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m[1]), int(m[2]), m[3], m[4]
+        per_package[name.split(".")[0]] += self_us
+        if len(indent) == 1:  # top-level import: cumulative already includes children
+            total_us += cumulative_us
+    heaviest = sorted(per_package.items(), key=lambda kv: -kv[1])
+    return {
+        "import_ms": round(total_us / 1000, 1),
+        "max_rss_mb": round(int(proc.stdout.strip().splitlines()[-1]) / 1024, 1),
+        "heaviest_packages_ms": {k: round(v / 1000, 1) for k, v in heaviest},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=8)
+    args = ap.parse_args()
+
+    report = {}
+    for label, (routers, extra) in _SCENARIOS.items():
+        r = _run(routers, extra)
+        if "heaviest_packages_ms" in r:
+            r["heaviest_packages_ms"] = dict(list(r["heaviest_packages_ms"].items())[:args.top])
+        report[label] = r
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# server/benchmarks/bench_store.py
+"""
+Repository scaling: bulk-loads N synthetic structures (every 10th tagged
+"monomer", the rest "candidate") into a throwaway SQLite file, then times the
+queries the routers issue: tag-filtered first/deep pages via keyset cursors,
+lookups by id / inchikey / SMILES / synonym, and per-run property listing.
+
+    cd server && python -m benchmarks.bench_store [--n 100000] [--batch 2000]
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from app.store import Repository
+
+_SUBSTITUENTS = ("C", "O", "N", "F")
+
+
+def _smiles(n: int):
+    """Distinct branched chains: one substituent per backbone carbon, base-4 digits of i."""
+    width = 1
+    while len(_SUBSTITUENTS) ** width < n:
+        width += 1
+    for digits in itertools.islice(itertools.product(range(len(_SUBSTITUENTS)), repeat=width), n):
+        yield "C=C" + "".join(f"C({_SUBSTITUENTS[d]})" for d in digits)
+
+
+def _best(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--batch", type=int, default=2000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-store-")
+    try:
+        repo = Repository(os.path.join(tmp, "store.sqlite3"))
+        t0 = time.perf_counter()
+        batch, last = [], None
+        for i, smi in enumerate(_smiles(args.n)):
+            batch.append({"smiles": smi, "synonyms": [f"S{i}"],
+                          "tags": ["monomer" if i % 10 == 0 else "candidate"]})
+            if len(batch) == args.batch:
+                last = repo.upsert_structures(batch)[-1]
+                batch = []
+        if batch:
+            last = repo.upsert_structures(batch)[-1]
+        load_s = time.perf_counter() - t0
+        repo.add_properties(
+            {"property_id": f"P{i}", "name": "MW", "value": float(i),
+             "provenance": {"run_id": f"RUN_{i % 500}"}} for i in range(args.n)
+        )
+
+        total = repo.count_structures()
+        cursor = None
+        for _ in range(20):  # walk 20 pages deep to get a mid-table cursor
+            cursor = repo.list_structures(tag="monomer", limit=500, cursor=cursor)["next_cursor"]
+        queries_ms = {
+            "tag_first_page": _best(lambda: repo.list_structures(tag="monomer", limit=100)),
+            "tag_deep_page": _best(lambda: repo.list_structures(tag="monomer", limit=100, cursor=cursor)),
+            "all_first_page": _best(lambda: repo.list_structures(limit=100)),
+            "by_id": _best(lambda: repo.get_structure(last["chemical_structure_id"])),
+            "by_inchikey": _best(lambda: repo.get_structure(last["inchikey"])),
+            "by_smiles": _best(lambda: repo.get_structure(last["smiles"])),
+            "by_synonym": _best(lambda: repo.get_structure(f"S{args.n - 1}")),
+            "properties_by_run": _best(lambda: repo.list_properties(run_id="RUN_7", limit=100)),
+            "count_tag": _best(lambda: repo.count_structures(tag="monomer")),
+        }
+        print(json.dumps({
+            "structures": total,
+            "load_s": round(load_s, 2),
+            "load_per_s": round(total / load_s),
+            "queries_ms": {k: round(v * 1000, 3) for k, v in queries_ms.items()},
+            "db_bytes": os.path.getsize(repo.path),
+        }, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
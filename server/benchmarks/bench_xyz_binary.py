@@ -0,0 +1,122 @@
+# server/benchmarks/bench_xyz_binary.py
+"""
+XYZ text vs. PFXB binary delivery of trajectory frames: payload bytes per
+frame, one-off server encode time (cold, written to "<file>.pfxb"), per-request
+server time for a frame window, and the client-side decode cost of each
+payload (text parse vs. typed-array view, approximated with numpy).
+
+    cd server && python -m benchmarks.bench_xyz_binary [--frames 5000] [--window 50]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.routers import physics_xyz as xyz
+
+
+def _trajectory(dest: Path, frames: int) -> Path:
+    """sample.xyz's frames cycled (with jitter) up to `frames` frames."""
+    src = (xyz.STATIC / "sample.xyz").read_bytes()
+    index = xyz._scan(xyz.STATIC / "sample.xyz")
+    rng = np.random.default_rng(0)
+    path = dest / "bench.xyz"
+    with open(path, "w") as f:
+        for i in range(frames):
+            k = i % index.frames
+            els, coords = xyz._frame_arrays(src[index.offsets[k]:index.offsets[k + 1]], index.atoms[k])
+            coords = coords + rng.normal(0, 0.05, coords.shape).astype(np.float32)
+            f.write(f"{len(els)}\nframe {i}\n")
+            f.writelines(f"{e:<2s} {x:12.6f} {y:12.6f} {z:12.6f}\n" for e, (x, y, z) in zip(els, coords))
+    return path
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _read_text_window(path: Path, start: int, stop: int) -> bytes:
+    index = xyz.frame_index(path)
+    return b"".join(xyz._iter_file(path, *index.span(start, stop)))
+
+
+def _read_binary_window(path: Path, start: int, stop: int) -> bytes:
+    header, elements, target, begin, end = xyz.binary_frames(path, start, stop)
+    return header + elements + b"".join(xyz._iter_file(target, begin, end))
+
+
+def _decode_text(payload: bytes) -> np.ndarray:
+    rows = []
+    lines = payload.decode().splitlines()
+    i = 0
+    while i < len(lines):
+        n = int(lines[i])
+        rows.extend([float(v) for v in line.split()[1:4]] for line in lines[i + 2:i + 2 + n])
+        i += n + 2
+    return np.asarray(rows, dtype=np.float32)
+
+
+def _decode_binary(payload: bytes) -> np.ndarray:
+    frames, atoms = (int(v) for v in np.frombuffer(payload, "<u4", 2, 8))
+    return np.frombuffer(payload, "<f4", frames * atoms * 3, xyz.BIN_HEADER + xyz._pad4(atoms))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=5000)
+    ap.add_argument("--window", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-xyz-"))
+    try:
+        path = _trajectory(tmp, args.frames)
+        t0 = time.perf_counter()
+        index = xyz.frame_index(path)
+        index_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        target, _, _ = xyz.binary_file(path)
+        encode_s = time.perf_counter() - t0
+
+        start, stop = args.frames // 2, args.frames // 2 + args.window
+        text = _read_text_window(path, start, stop)
+        binary = _read_binary_window(path, start, stop)
+        assert np.allclose(_decode_text(text).ravel(), _decode_binary(binary), atol=1e-5)
+
+        print(json.dumps({
+            "frames": index.frames,
+            "atoms_per_frame": index.atoms[0],
+            "file_bytes": {"xyz": index.size, "pfxb": target.stat().st_size},
+            "bytes_per_frame": {"xyz": round(index.size / index.frames, 1),
+                                "pfxb": index.atoms[0] * 12},
+            "one_off_s": {"frame_index": round(index_s, 4), "binary_encode": round(encode_s, 4)},
+            "window": {
+                "frames": args.window,
+                "payload_bytes": {"xyz": len(text), "pfxb": len(binary)},
+                "server_s": {
+                    "xyz": round(_best(lambda: _read_text_window(path, start, stop), args.repeat), 6),
+                    "pfxb": round(_best(lambda: _read_binary_window(path, start, stop), args.repeat), 6),
+                },
+                "client_decode_s": {
+                    "xyz": round(_best(lambda: _decode_text(text), args.repeat), 6),
+                    "pfxb": round(_best(lambda: _decode_binary(binary), args.repeat), 6),
+                },
+            },
+        }, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
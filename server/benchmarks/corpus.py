@@ -0,0 +1,16 @@
+# server/benchmarks/corpus.py
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+DATA = Path(__file__).resolve().parent / "data"
+
+
+def load_generations(name: str = "synthetic_generations.txt") -> List[str]:
+    """
+    Hand-written PolyTAO-like raw generations, one per line ('#' lines are
+    comments). Synthetic: see the header of the data file.
+    """
+    lines = (DATA / name).read_text(encoding="utf-8").splitlines()
+    return [ln for ln in lines if ln.strip() and not ln.startswith("#")]
@@ -0,0 +1,144 @@
+# server/benchmarks/legacy.py
+"""
+Frozen copy of the original (pre-pipeline) SMILES extraction + property code.
+Benchmarks compare against it and the regression check asserts that the
+current extractor still returns the same SMILES on the synthetic corpus.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Optional
+
+from rdkit import Chem
+from rdkit.Chem import Descriptors, Crippen, rdMolDescriptors, rdBase
+
+rdBase.DisableLog("rdApp.error")
+
+_ELEMENT_TOKENS = {"H", "B", "C", "N", "O", "F", "P", "S", "Cl", "Br", "I"}
+_FEATURE_REGEXES = [
+    re.compile(r"[=#]"),    # multiple bonds
+    re.compile(r"[()]"),    # branches
+    re.compile(r"\d"),      # ring indices
+    re.compile(r"[a-z]"),   # aromatics
+]
+_ALLOWED_CHARS = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789[]()=#%+-@\\/.*:$|")
+
+def _basic_clean(text: str) -> str:
+    t = re.sub(r"<[^>]+>", " ", text.replace("\n", " "))
+    t = re.sub(r"\s+", " ", t).strip(" <>“”\"'")
+    return t
+
+def _split_candidates(text: str) -> list[str]:
+    raw = re.split(r"[,\s;<>]+", text)
+    toks = [tok.strip(" <>“”\"'`()[]{}") for tok in raw if tok.strip()]
+    return [t for t in toks if t not in _ELEMENT_TOKENS]
+
+def _score_smiles(smi: str) -> float:
+    m = Chem.MolFromSmiles(smi)
+    if not m:
+        return -1e9
+    heavy = m.GetNumHeavyAtoms()
+    length_bonus = min(len(smi), 200) * 0.1
+    feature_bonus = sum(1.0 for rgx in _FEATURE_REGEXES if rgx.search(smi))
+    return heavy * 10.0 + length_bonus + feature_bonus
+
+def _greedy_rescue(token: str, min_len: int = 5):
+    tok = token
+    if sum(ch not in _ALLOWED_CHARS for ch in tok) > 2:
+        tok = "".join(ch for ch in tok if ch in _ALLOWED_CHARS)
+    tok = tok.strip()
+    if len(tok) < min_len:
+        return None
+
+    if Chem.MolFromSmiles(tok):
+        return tok
+
+    r = tok
+    while len(r) >= min_len:
+        if Chem.MolFromSmiles(r):
+            return r
+        r = r[:-1]
+
+    l = tok
+    while len(l) >= min_len:
+        if Chem.MolFromSmiles(l):
+            return l
+        l = l[1:]
+
+    return None
+
+def clean_text_to_smiles(text: str,
+                         min_heavy_atoms: int = 4,
+                         min_len: int = 5) -> Optional[str]:
+    """
+    Robust extractor: collect direct parses and rescued substrings, score them,
+    and return the best candidate (canonicalized).
+    """
+    t = _basic_clean(text)
+
+    m_whole = Chem.MolFromSmiles(t)
+    if m_whole and m_whole.GetNumHeavyAtoms() >= min_heavy_atoms and len(t) >= min_len:
+        return Chem.MolToSmiles(m_whole, canonical=True)
+
+    valid: list[str] = []
+    for tok in _split_candidates(t):
+        if len(tok) < min_len:
+            continue
+
+        m = Chem.MolFromSmiles(tok)
+        if m and m.GetNumHeavyAtoms() >= min_heavy_atoms:
+            valid.append(tok)
+            continue
+
+        rescued = _greedy_rescue(tok, min_len=min_len)
+        if rescued:
+            m2 = Chem.MolFromSmiles(rescued)
+            if m2 and m2.GetNumHeavyAtoms() >= min_heavy_atoms:
+                valid.append(rescued)
+
+    if not valid:
+        return None
+
+    best = max(valid, key=_score_smiles)
+    return Chem.MolToSmiles(Chem.MolFromSmiles(best), canonical=True)
+
+
+def canonize_smiles(smiles: str) -> Optional[str]:
+    m = Chem.MolFromSmiles(smiles)
+    if m is None:
+        return None
+    try:
+        Chem.SanitizeMol(m)
+    except Exception:
+        try:
+            Chem.Kekulize(m, clearAromaticFlags=True)
+        except Exception:
+            pass
+    return Chem.MolToSmiles(m, canonical=True)
+
+
+def compute_properties(smiles: str) -> Optional[Dict[str, float | int | str]]:
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return None
+    props: Dict[str, float | int | str] = {
+        "MW": Descriptors.MolWt(mol),
+        "LogP": Crippen.MolLogP(mol),
+        "TPSA": rdMolDescriptors.CalcTPSA(mol),
+        "NumRings": Chem.rdMolDescriptors.CalcNumRings(mol),
+        "NumRotatableBonds": Descriptors.NumRotatableBonds(mol),
+    }
+    try:
+        from rdkit.Chem import inchi as rdInchi  # optional
+        props["InchiKey"] = rdInchi.MolToInchiKey(mol)
+    except Exception:
+        props["InchiKey"] = None
+    return props
+
+
+def process_candidate(text: str):
+    """The original per-candidate chain in `propose`."""
+    smi = clean_text_to_smiles(text)
+    smi = canonize_smiles(smi) if smi else None
+    props = compute_properties(smi) if smi else None
+    return smi, props
@@ -0,0 +1,188 @@
+# server/benchmarks/loadgen.py
+"""
+In-process load generator: drives the FastAPI app through httpx's ASGI
+transport (no sockets, no server process) with a fixed number of requests per
+scenario at each concurrency level, and reports latency p50/p95/p99 and
+throughput as JSON. Offline by default: the designer runs on the stand-in
+model (`benchmarks.standin_model`, replaying the synthetic corpus), the
+repository is in memory.
+
+    cd server && python -m benchmarks.loadgen [--scenarios propose,upload,physics_run]
+        [--concurrency 1,8,32] [--requests 200] [--out run.json] [--baseline previous.json]
+
+Scenarios:
+  health          GET  /api/health
+  propose         POST /api/ai-designer/propose (n=8, Mw/LogP targets)
+  propose_stream  POST /api/ai-designer/propose/stream, read to [DONE]
+  upload          POST /api/literature/upload (a small generated PDF; deduplicated
+                  after the first request, so this is the stream + hash path)
+  physics_run     POST /api/physics/runs (ETKDG -> pose -> single points -> deltaE,
+                  wait=true, cache=false)
+  similarity      GET  /api/physics/structures/search/similar
+  xyz_frames      GET  /api/physics/xyz/sample.xyz/frames (10-frame windows)
+
+`--model polytao` uses the real model instead of the stand-in.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+import zlib
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from .report import emit, percentiles
+
+_TARGETS = [{"kind": "Mw", "value": 250}, {"kind": "LogP", "value": 2.5}]
+_PDF_TEXT = (b"BT (The imprinted polymer was cured at 60 \\260C for 24 h; EGDMA 20 mmol, "
+             b"AIBN 0.5 mmol, surface area 215 \\261 12 m2/g.) Tj ET")
+
+
+def _pdf() -> bytes:
+    body = zlib.compress(_PDF_TEXT)
+    return (b"%PDF-1.4\n1 0 obj<</Length " + str(len(body)).encode() + b"/Filter/FlateDecode>>stream\n"
+            + body + b"\nendstream endobj\ntrailer<<>>\n%%EOF\n")
+
+
+class Scenarios:
+    """One coroutine per scenario: issues request number `i`, returns the response."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.pdf = _pdf()
+        self.structures: List[Dict[str, Any]] = []
+        self.frames = 1
+
+    async def setup(self, names: List[str]) -> None:
+        if {"physics_run", "similarity"} & set(names):
+            r = await self.client.get("/api/physics/structures")
+            r.raise_for_status()
+            self.structures = r.json()
+        if "xyz_frames" in names:
+            r = await self.client.get("/api/physics/xyz/sample.xyz/index")
+            r.raise_for_status()
+            self.frames = r.json()["frames"]
+
+    async def health(self, i: int) -> httpx.Response:
+        return await self.client.get("/api/health")
+
+    async def propose(self, i: int) -> httpx.Response:
+        return await self.client.post("/api/ai-designer/propose",
+                                      json={"targets": _TARGETS, "n": 8, "template": f"T{i % 4}"})
+
+    async def propose_stream(self, i: int) -> httpx.Response:
+        async with self.client.stream("POST", "/api/ai-designer/propose/stream",
+                                      json={"targets": _TARGETS, "n": 8, "template": f"T{i % 4}"}) as r:
+            async for _ in r.aiter_lines():
+                pass
+        return r
+
+    async def upload(self, i: int) -> httpx.Response:
+        return await self.client.post("/api/literature/upload",
+                                      files={"file": ("bench.pdf", self.pdf, "application/pdf")})
+
+    async def physics_run(self, i: int) -> httpx.Response:
+        ids = [s["chemical_structure_id"] for s in self.structures]
+        return await self.client.post("/api/physics/runs", json={
+            "template": ids[0], "monomers": [ids[1 + i % (len(ids) - 1)]], "wait": True, "cache": False,
+            "workers": ["chem.mol/etkdg-mmff@v1", "fast_structure/pack_pose_xyz@v1", "qm/xtb_sp@v1",
+                        "qm/xtb_sp_complex_xyz@v1", "qm/deltaE@v1"],
+        })
+
+    async def similarity(self, i: int) -> httpx.Response:
+        return await self.client.get("/api/physics/structures/search/similar",
+                                     params={"smiles": self.structures[i % len(self.structures)]["smiles"], "k": 10})
+
+    async def xyz_frames(self, i: int) -> httpx.Response:
+        start = (i * 10) % max(1, self.frames - 10)
+        return await self.client.get("/api/physics/xyz/sample.xyz/frames",
+                                     params={"start": start, "stop": start + 10})
+
+
+SCENARIOS = ["health", "propose", "propose_stream", "upload", "physics_run", "similarity", "xyz_frames"]
+
+
+async def _level(call: Callable[[int], Awaitable[httpx.Response]], concurrency: int,
+                 requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                status = (await call(i)).status_code
+            except Exception as e:  # transport / app error: count it, keep the load going
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            statuses[str(status)] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    ok = sum(n for s, n in statuses.items() if s.isdigit() and 200 <= int(s) < 300)
+    return {"concurrency": concurrency, "requests": requests, "errors": requests - ok,
+            "statuses": dict(statuses), "latency_ms": {**percentiles(latencies),
+                                                        "mean": round(1000 * sum(latencies) / len(latencies), 3)},
+            "throughput_rps": round(ok / wall, 2), "wall_s": round(wall, 3)}
+
+
+async def _run(names: List[str], levels: List[int], requests: int, warmup: int) -> Dict[str, Any]:
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=600) as client:
+        scenarios = Scenarios(client)
+        await scenarios.setup(names)
+        results: Dict[str, Any] = {}
+        for name in names:
+            call = getattr(scenarios, name)
+            for i in range(warmup):  # lazy imports, pools, caches, first-touch indexes
+                await call(i)
+            results[name] = [await _level(call, c, requests) for c in levels]
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--concurrency", default="1,8,32")
+    ap.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--model", choices=["standin", "polytao"], default="standin")
+    ap.add_argument("--out", help="also write the JSON report here")
+    ap.add_argument("--baseline", help="earlier report to compare against")
+    args = ap.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = sorted(set(names) - set(SCENARIOS))
+    if unknown:
+        ap.error(f"unknown scenario(s) {unknown}; expected {SCENARIOS}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    os.environ.setdefault("POLYFOLD_DB", ":memory:")
+    if args.model == "standin":
+        os.environ["POLYTAO_GENERATOR"] = "benchmarks.standin_model:generate_batch"
+    uploaded = None
+    if "upload" in names:
+        from app.routers.literature import PDFS
+        uploaded = PDFS / f"sha256_{hashlib.sha256(_pdf()).hexdigest()}.pdf"
+        uploaded = None if uploaded.exists() else uploaded  # only remove what this run created
+    try:
+        results = asyncio.run(_run(names, levels, args.requests, args.warmup))
+    finally:
+        if uploaded is not None:
+            uploaded.unlink(missing_ok=True)
+
+    emit({"model": args.model, "requests_per_level": args.requests, "scenarios": results},
+         out=args.out, baseline=args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# server/benchmarks/openai_stub.py
+"""
+Local OpenAI-compatible chat completions endpoint for offline runs of the
+copilot: a fixed MIP answer streamed token by token after a configurable
+time-to-first-token, with a fixed delay per token. Point the API at it with
+
+    cd server && python -m benchmarks.openai_stub --port 8001 [--ttft-ms 300] [--token-ms 15]
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 uvicorn app.main:app
+
+`GET /stats` reports completed vs. abandoned streams (client went away).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "Molecularly imprinted polymers (MIPs) are cross-linked networks formed around a template.\n"
+    "A typical recipe: template, functional monomer (e.g. 4-vinylpyridine or methacrylic acid), "
+    "cross-linker (EGDMA), initiator (AIBN) and a porogen such as toluene.\n"
+    "For modeling, rank monomers by the template–monomer binding energy ΔE and check that the "
+    "porogen does not compete for the same sites."
+)
+TOKENS = re.findall(r"\s*\S+|\n", REPLY)
+
+
+def create_app(ttft_ms: float = 300.0, token_ms: float = 15.0, tokens: int = 0) -> FastAPI:
+    app = FastAPI()
+    reply = (TOKENS * (1 + tokens // len(TOKENS)))[:tokens] if tokens else TOKENS
+    stats: Dict[str, int] = {"requests": 0, "completed": 0, "abandoned": 0, "active": 0}
+
+    def chunk(cid: str, model: str, delta: Dict[str, Any], finish: Any = None) -> str:
+        return "data: " + json.dumps({
+            "id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }) + "\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        stats["requests"] += 1
+        if not body.get("stream"):
+            await asyncio.sleep((ttft_ms + token_ms * len(reply)) / 1000)
+            stats["completed"] += 1
+            return JSONResponse({
+                "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(reply)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(reply), "total_tokens": len(reply)},
+            })
+
+        async def gen():
+            stats["active"] += 1
+            done = False
+            try:
+                await asyncio.sleep(ttft_ms / 1000)
+                yield chunk(cid, model, {"role": "assistant", "content": ""})
+                for i, tok in enumerate(reply):
+                    if i:
+                        await asyncio.sleep(token_ms / 1000)
+                    yield chunk(cid, model, {"content": tok})
+                yield chunk(cid, model, {}, "stop")
+                yield "data: [DONE]\n\n"
+                done = True
+            finally:
+                stats["active"] -= 1
+                stats["completed" if done else "abandoned"] += 1
+
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--ttft-ms", type=float, default=300.0)
+    ap.add_argument("--token-ms", type=float, default=15.0)
+    ap.add_argument("--tokens", type=int, default=0, help="reply length (0 = the canned answer)")
+    args = ap.parse_args()
+    uvicorn.run(create_app(args.ttft_ms, args.token_ms, args.tokens), host=args.host, port=args.port,
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
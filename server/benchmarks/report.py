@@ -0,0 +1,68 @@
+# server/benchmarks/report.py
+"""
+JSON reports that can be compared between commits: `environment()` stamps the
+commit and machine, `emit()` prints (and optionally saves) a report, and with a
+baseline report adds `compare`: new / old for every number the two share.
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentiles(values: Sequence[float], qs: Sequence[float] = (0.5, 0.95, 0.99),
+                scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    """Nearest-rank quantiles ({"p50": ..., "p95": ...}), seconds -> ms by default."""
+    values = sorted(values)
+    out: Dict[str, Optional[float]] = {}
+    for q in qs:
+        key = f"p{round(q * 100):02d}"
+        out[key] = round(values[min(len(values) - 1, int(q * len(values)))] * scale, 3) if values else None
+    return out
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5, cwd=Path(__file__).parent).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, timeout=30,
+                                    cwd=Path(__file__).parent).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = None, None
+    return {"commit": commit or None, "dirty": dirty, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "argv": sys.argv[1:]}
+
+
+def _ratios(new: Any, old: Any, path: str, out: List[Dict[str, Any]]) -> None:
+    if isinstance(new, dict) and isinstance(old, dict):
+        for k in new:
+            if k in old and k != "environment":
+                _ratios(new[k], old[k], f"{path}.{k}" if path else str(k), out)
+    elif isinstance(new, list) and isinstance(old, list) and len(new) == len(old):
+        for i, (a, b) in enumerate(zip(new, old)):
+            _ratios(a, b, f"{path}[{i}]", out)
+    elif (isinstance(new, (int, float)) and isinstance(old, (int, float))
+          and not isinstance(new, bool) and not isinstance(old, bool) and old and new != old):
+        out.append({"metric": path, "old": old, "new": new, "ratio": round(new / old, 3)})
+
+
+def emit(result: Dict[str, Any], out: Optional[str] = None, baseline: Optional[str] = None) -> None:
+    """Print `result` as JSON; save it to `out`; diff it against the `baseline` report file."""
+    result = {"environment": environment(), **result}
+    if baseline:
+        previous = json.loads(Path(baseline).read_text(encoding="utf-8"))
+        changes: List[Dict[str, Any]] = []
+        _ratios(result, previous, "", changes)
+        result["compare"] = {"baseline": baseline,
+                             "baseline_commit": previous.get("environment", {}).get("commit"),
+                             "changes": changes}
+    text = json.dumps(result, indent=2)
+    if out:
+        Path(out).write_text(text + "\n", encoding="utf-8")
+    print(text)
@@ -0,0 +1,61 @@
+# server/benchmarks/standin_model.py
+"""
+Offline stand-in for PolyTAO: a `generate_batch` backend that answers with
+texts from the synthetic benchmark corpus (`data/synthetic_generations.txt`,
+hand-written, not model output) instead of running the model, so the designer
+routes can be load-tested without torch, transformers or a weight download.
+Latencies measured with it reflect the server, not PolyTAO's decode cost or
+output distribution.
+
+    POLYTAO_GENERATOR=benchmarks.standin_model:generate_batch uvicorn app.main:app
+
+Draws are seeded per prompt, so a given prompt gets the same sequence of texts
+in every run. Decode cost is simulated with a sleep of one step per generated
+token (~3 characters) of the longest row in the padded batch, each step costing
+POLYTAO_STANDIN_STEP_MS (default 2) plus 5% per additional row; texts longer
+than `max_new_tokens` are truncated, as a real decode would be.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Dict, List
+
+from .corpus import load_generations
+
+STEP_MS: float = float(os.getenv("POLYTAO_STANDIN_STEP_MS", "2"))
+SEED: str = os.getenv("POLYTAO_STANDIN_SEED", "0")
+CHARS_PER_TOKEN = 3
+ROW_COST = 0.05
+
+_corpus = load_generations()
+_rngs: Dict[str, random.Random] = {}
+_lock = threading.Lock()
+
+
+def _rng(prompt: str) -> random.Random:
+    rng = _rngs.get(prompt)
+    if rng is None:
+        digest = hashlib.sha256(f"{SEED}:{prompt}".encode("utf-8")).digest()
+        rng = _rngs[prompt] = random.Random(int.from_bytes(digest[:8], "big"))
+    return rng
+
+
+def reset() -> None:
+    """Restart every prompt's draw sequence (between benchmark repetitions)."""
+    with _lock:
+        _rngs.clear()
+
+
+def generate_batch(prompts: List[str], counts: List[int], max_new_tokens: int = 128,
+                   **_knobs: object) -> List[List[str]]:
+    limit = max(1, max_new_tokens) * CHARS_PER_TOKEN
+    with _lock:
+        grouped = [[_rng(p).choice(_corpus)[:limit] for _ in range(c)] for p, c in zip(prompts, counts)]
+    rows = sum(counts)
+    steps = max((len(t) // CHARS_PER_TOKEN + 1 for g in grouped for t in g), default=0)
+    time.sleep(steps * STEP_MS / 1000 * (1 + ROW_COST * max(0, rows - 1)))
+    return grouped
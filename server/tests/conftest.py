@@ -0,0 +1,5 @@
+# server/tests/conftest.py
+"""Keep the suite off the developer's database: the shared repository is in-memory."""
+import os
+
+os.environ.setdefault("POLYFOLD_DB", ":memory:")
@@ -0,0 +1,111 @@
+# server/tests/test_aidesigner_grammar.py
+"""
+SMILES prefix grammar and the constrained-decoding logits processor, driven
+with a toy vocabulary (no tokenizer or model download). The processor tests
+need torch and are skipped without it.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.routers.aidesigner_grammar import (
+    START, SmilesLogitsProcessor, TokenGrammar, _SMILES_CHARS, advance, is_complete,
+)
+
+# id 0 = EOS, id 1 = pad / decoder start; "{" and "[$]" are BigSMILES-only
+VOCAB = ["</s>", "<pad>", "C", "O", "=", "(", ")", "1", "c", "N", "{", "[$]", "}"]
+EOS, PAD = 0, 1
+
+
+def _grammar() -> TokenGrammar:
+    texts = [None, None] + [(t, False) if set(t) <= _SMILES_CHARS else None for t in VOCAB[2:]]
+    return TokenGrammar(texts, eos_token_id=EOS)
+
+
+@pytest.mark.parametrize("smiles", [
+    "CCO", "C=CC(=O)O", "c1ccccc1", "C1CC1", "CC(C)(C)C", "ClCBr", "[NH4+]", "C%10CC%10", "*CC(*)C",
+])
+def test_valid_smiles_are_accepted(smiles):
+    assert advance(START, smiles) is not None
+
+
+@pytest.mark.parametrize("smiles", [
+    ")C", "C((C)", "C==C", "C(=O)(=O)(=O)C", "F(C)C", "C11", "[Xx]", "CC.CC", "{[$]CC[$]}",
+])
+def test_invalid_prefixes_are_rejected(smiles):
+    assert advance(START, smiles) is None
+
+
+def test_completeness_needs_closed_rings_and_the_extract_floor():
+    assert not is_complete(advance(START, "C1CCC"))          # ring 1 still open
+    assert not is_complete(advance(START, "CCO"))            # under 4 heavy atoms
+    assert is_complete(advance(START, "C1CCC1"))
+
+
+def test_allowed_masks_invalid_tokens_and_bigsmiles():
+    g = _grammar()
+    ids = {t: i for i, t in enumerate(VOCAB)}
+    ranked = [ids[t] for t in ("{", ")", "=", "C", "O", "[$]")]
+    assert g.allowed(START, ranked) == [ids["C"], ids["O"]]
+
+
+def test_allowed_forces_eos_once_complete_and_the_model_leaves_smiles():
+    g = _grammar()
+    ids = {t: i for i, t in enumerate(VOCAB)}
+    state = advance(START, "CC(C)C")
+    assert g.allowed(state, [ids["}"], ids["C"]]) == [EOS]
+    assert g.allowed(state, [ids["C"], ids["}"]]) == [ids["C"], EOS]
+
+
+def test_allowed_stops_checking_the_unlikely_tail():
+    g = _grammar()
+    ids = {t: i for i, t in enumerate(VOCAB)}
+    # "C" holds almost all the mass: "O" is masked without being checked
+    assert g.allowed(START, [ids["C"], ids["O"]], [0.999, 0.001]) == [ids["C"]]
+
+
+def _greedy(processor: SmilesLogitsProcessor, preference, rows: int = 2, steps: int = 16):
+    torch = pytest.importorskip("torch")
+    base = torch.tensor([float(preference.get(t, -5.0)) for t in VOCAB])
+    ids = torch.full((rows, 1), PAD, dtype=torch.long)
+    done = torch.zeros(rows, dtype=torch.bool)
+    for _ in range(steps):
+        scores = processor(ids, base.repeat(rows, 1))
+        assert scores.shape == (rows, len(VOCAB))
+        nxt = scores.argmax(dim=-1)
+        nxt = torch.where(done, torch.full_like(nxt, PAD), nxt)  # finished rows emit padding, as generate() does
+        done |= nxt == EOS
+        ids = torch.cat([ids, nxt[:, None]], dim=1)
+        if done.all():
+            break
+    texts = []
+    for row in ids.tolist():
+        tokens = row[1:]
+        tokens = tokens[:tokens.index(EOS)] if EOS in tokens else tokens
+        texts.append("".join(VOCAB[t] for t in tokens))
+    return texts, done
+
+
+def test_processor_masks_bigsmiles_and_stops_at_a_complete_molecule():
+    pytest.importorskip("torch")
+    # the model's favourites are BigSMILES / closing characters; plain atoms come after
+    preference = {"{": 9.0, ")": 8.0, "[$]": 7.0, "=": 6.0, "C": 5.0, "O": 4.0, "</s>": -9.0}
+    texts, done = _greedy(SmilesLogitsProcessor(_grammar()), preference)
+    assert done.all()
+    assert texts[0] == texts[1] == "C=C=C=C"
+    state = advance(START, texts[0])
+    assert state is not None and is_complete(state)
+
+
+def test_processor_keeps_eos_masked_until_the_molecule_is_complete():
+    torch = pytest.importorskip("torch")
+    processor = SmilesLogitsProcessor(_grammar())
+    ids = torch.tensor([[PAD, VOCAB.index("C"), VOCAB.index("(")]])
+    scores = torch.zeros(1, len(VOCAB))
+    scores[0, EOS] = 10.0
+    out = processor(ids, scores)
+    assert out[0, EOS] == float("-inf")        # open branch: EOS is not allowed
+    assert out[0, VOCAB.index(")")] == float("-inf")  # "C()" is not SMILES either
+    assert out[0, VOCAB.index("C")] == 0.0
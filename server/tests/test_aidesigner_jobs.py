@@ -0,0 +1,72 @@
+# server/tests/test_aidesigner_jobs.py
+"""
+Designer job registry: identical in-flight submissions share a job, the
+pending limit answers 429 on POST /propose/jobs, and only finished jobs are
+trimmed past the retain limit.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import aidesigner
+from app.routers.aidesigner_jobs import JobRegistry, QueueFull
+
+
+@pytest.fixture
+def gate():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def _blocked(release):
+    def fn(job):
+        release.wait(5)
+        return {"run": {"counters": {"created": 1}}}
+    return fn
+
+
+def test_twins_share_a_job_and_the_limit_raises(gate):
+    registry = JobRegistry(workers=1, queue_limit=2)
+    first, created = registry.submit("k1", "job", {}, _blocked(gate))
+    twin, twin_created = registry.submit("k1", "job", {}, _blocked(gate))
+    assert created and not twin_created and twin is first
+    registry.submit("k2", "job", {}, _blocked(gate))
+    with pytest.raises(QueueFull):
+        registry.submit("k3", "job", {}, _blocked(gate))
+    gate.set()
+    registry._executor.shutdown(wait=True)
+    assert first.snapshot()["run"]["status"] == "done"
+    assert registry.stats() == {"inflight": 0, "retained": 2}
+
+
+def test_only_finished_jobs_are_trimmed(gate):
+    registry = JobRegistry(workers=2, queue_limit=10, retain=1)
+    done, _ = registry.submit("quick", "job", {}, lambda job: {})
+    deadline = time.monotonic() + 5
+    while registry.stats()["inflight"] and time.monotonic() < deadline:  # let "quick" finish
+        time.sleep(0.01)
+    running, _ = registry.submit("slow", "job", {}, _blocked(gate))
+    pending, _ = registry.submit("slower", "job", {}, _blocked(gate))
+    assert registry.get(done.run.run_id) is None
+    assert registry.get(running.run.run_id) is running and registry.get(pending.run.run_id) is pending
+
+
+def test_propose_jobs_answers_429_when_full(monkeypatch, gate):
+    monkeypatch.setattr(aidesigner, "get_job_registry", lambda r=JobRegistry(workers=1, queue_limit=1): r)
+    monkeypatch.setattr(aidesigner, "_propose", lambda req, started, run_id=None, report=None: gate.wait(5) and {})
+    app = FastAPI()
+    app.include_router(aidesigner.router)
+    client = TestClient(app)
+    first = client.post("/propose/jobs", json={"n": 2})
+    assert first.status_code == 202 and not first.json()["deduplicated"]
+    again = client.post("/propose/jobs", json={"n": 2})
+    assert again.json()["deduplicated"] and again.json()["run"]["run_id"] == first.json()["run"]["run_id"]
+    assert client.post("/propose/jobs", json={"n": 3}).status_code == 429
@@ -0,0 +1,57 @@
+# server/tests/test_cache.py
+"""
+ResultCache: LRU eviction by item count and by serialized bytes in memory,
+and least-recently-used eviction of the SQLite tier past max_disk_bytes.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import time
+
+from app.cache import ResultCache
+
+
+def test_memory_lru_by_items():
+    cache = ResultCache(max_items=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # "a" is now the most recent
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_lru_by_bytes_keeps_the_newest_entry():
+    cache = ResultCache(max_items=100, max_bytes=30)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    assert cache.stats()["memory_bytes"] <= 30
+    cache.put("big", "z" * 100)         # alone over the limit, still kept
+    assert cache.get("big") == "z" * 100 and cache.get("a") is None
+    assert cache.stats()["memory_items"] == 1
+
+
+def test_values_are_copies():
+    cache = ResultCache()
+    cache.put("k", {"xs": [1]})
+    cache.get("k")["xs"].append(2)
+    assert cache.get("k") == {"xs": [1]}
+
+
+def test_disk_tier_survives_restarts_and_evicts_least_recently_used(tmp_path):
+    db = str(tmp_path / "cache.sqlite3")
+    cache = ResultCache(max_items=1, db_path=db, max_disk_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.put(key, key * 80)
+        time.sleep(0.01)
+    assert cache.get("a") == "a" * 80   # disk hit refreshes "a"
+    time.sleep(0.01)
+    cache.put("d", "d" * 80)            # over 250 bytes: "b" is the least recently used
+    stats = cache.stats()
+    assert stats["disk_evictions"] == 1 and stats["disk_bytes"] <= 250
+
+    reopened = ResultCache(db_path=db, max_disk_bytes=250)
+    assert reopened.get("b") is None
+    assert [reopened.get(k) for k in "acd"] == ["a" * 80, "c" * 80, "d" * 80]
+    assert reopened.stats()["disk_hits"] == 3
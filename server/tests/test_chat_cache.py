@@ -0,0 +1,68 @@
+# server/tests/test_chat_cache.py
+"""
+Copilot reply cache with a fake upstream: a repeated (whitespace-reflowed)
+question is replayed as the same SSE events without calling upstream, and
+a stream that failed part-way is not stored.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.cache import ResultCache
+from app.routers import chat, chat_client
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    async def fake_completion(messages, model=None, temperature=chat_client.CHAT_TEMPERATURE):
+        calls.append(messages)
+        for delta in ("MIPs are ", "molecularly\nimprinted", " polymers."):
+            yield delta
+        if "fail" in messages[-1]["content"]:
+            raise RuntimeError("upstream dropped")
+
+    monkeypatch.setattr(chat_client, "stream_completion", fake_completion)
+    monkeypatch.setattr(chat_client, "get_chat_cache", lambda cache=ResultCache(): cache)
+    monkeypatch.setattr(chat_client, "CACHE_ENABLED", True)
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app)
+
+
+def _ask(client, text):
+    r = client.post("/stream", json={"messages": [{"role": "user", "content": text},
+                                                  {"role": "assistant", "content": ""}]})
+    assert r.status_code == 200
+    return r.headers["x-chat-cache"], r.text
+
+
+def test_repeated_question_is_replayed_from_the_cache(client, upstream):
+    first = _ask(client, "What is a MIP?")
+    second = _ask(client, "  What   is a\nMIP? ")
+    assert first[0] == "miss" and second[0] == "hit"
+    assert second[1] == first[1] and first[1].endswith("data: [DONE]\n\n")
+    assert "data: molecularly\ndata: imprinted" in first[1]
+    assert len(upstream) == 1
+
+
+def test_failed_stream_is_not_cached(client, upstream):
+    assert "[error] upstream dropped" in _ask(client, "please fail")[1]
+    assert _ask(client, "please fail")[0] == "miss"
+    assert len(upstream) == 2
+
+
+def test_unknown_model_is_rejected(client, upstream):
+    r = client.post("/stream", json={"messages": [{"role": "user", "content": "hi"}],
+                                     "model": "not-a-model"})
+    assert r.status_code == 400 and upstream == []
@@ -0,0 +1,76 @@
+# server/tests/test_generation_batcher.py
+"""
+Generation micro-batcher with a fake `generate_batch`: concurrent prompts
+share one call, a dead worker fails what it held instead of hanging, and
+callers stop waiting after POLYTAO_GENERATE_TIMEOUT_S.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.routers import aidesigner_helpers as helpers
+
+
+class _WorkerDied(BaseException):
+    """Escapes the per-batch `except Exception`, like a crash in the worker loop."""
+
+
+def _echo(prompts, counts, **knobs):
+    return [[f"{p}#{i}" for i in range(n)] for p, n in zip(prompts, counts)]
+
+
+def test_concurrent_prompts_share_one_generate_call(monkeypatch):
+    calls = []
+    monkeypatch.setattr(helpers, "generate_batch", lambda p, c, **k: calls.append(list(p)) or _echo(p, c))
+    batcher = helpers.GenerationBatcher(window_s=0.2)
+    futures = [batcher.submit(f"p{i}", 2) for i in range(3)]
+    assert [f.result(timeout=5) for f in futures] == [[f"p{i}#0", f"p{i}#1"] for i in range(3)]
+    assert calls == [["p0", "p1", "p2"]]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_worker_fails_its_futures_and_is_restarted(monkeypatch):
+    def die(prompts, counts, **knobs):
+        raise _WorkerDied()
+
+    monkeypatch.setattr(helpers, "generate_batch", die)
+    batcher = helpers.GenerationBatcher(window_s=0.05)
+    futures = [batcher.submit("a", 1), batcher.submit("b", 1)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="worker exited"):
+            f.result(timeout=5)
+
+    monkeypatch.setattr(helpers, "generate_batch", _echo)
+    assert batcher.submit("c", 1).result(timeout=5) == ["c#0"]
+
+
+def test_short_generate_result_fails_the_missing_prompts(monkeypatch):
+    monkeypatch.setattr(helpers, "generate_batch", lambda p, c, **k: _echo(p, c)[:1])
+    batcher = helpers.GenerationBatcher(window_s=0.2)
+    first, second = batcher.submit("a", 1), batcher.submit("b", 1)
+    assert first.result(timeout=5) == ["a#0"]
+    with pytest.raises(RuntimeError, match="fewer groups"):
+        second.result(timeout=5)
+
+
+def test_batched_sampling_times_out(monkeypatch):
+    release = threading.Event()
+
+    def slow(prompts, counts, **knobs):
+        release.wait(5)
+        return _echo(prompts, counts)
+
+    monkeypatch.setattr(helpers, "generate_batch", slow)
+    monkeypatch.setattr(helpers, "_batcher", helpers.GenerationBatcher(window_s=0.01))
+    monkeypatch.setattr(helpers, "BATCH_WINDOW_S", 0.01)
+    monkeypatch.setattr(helpers, "GENERATE_TIMEOUT_S", 0.2)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError, match="POLYTAO_GENERATE_TIMEOUT_S"):
+        helpers.sample_texts_batched("slow", n=1)
+    assert time.monotonic() - t0 < 2
+    release.set()
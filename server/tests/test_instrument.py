@@ -0,0 +1,61 @@
+# server/tests/test_instrument.py
+"""
+Instrumentation middleware: per-request stage spans in Server-Timing, and
+slow-request profiles written by the writer thread, not by the request.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import instrument
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(instrument.InstrumentationMiddleware)
+
+    @app.get("/slow")
+    def slow():
+        with instrument.span("work"):
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:  # busy, so the sampler sees a stack
+                pass
+        return {"ok": True}
+
+    return app
+
+
+def test_server_timing_lists_the_request_spans():
+    r = TestClient(_app()).get("/slow")
+    assert r.status_code == 200 and r.headers["server-timing"].startswith("work;dur=")
+
+
+def test_slow_request_profile_is_written_off_the_request_path(tmp_path, monkeypatch):
+    writer = ThreadPoolExecutor(max_workers=1)
+    release, written = threading.Event(), []
+    dump = instrument._dump_profile
+
+    def blocking_dump(*args):
+        release.wait(5)
+        written.append(dump(*args))
+
+    monkeypatch.setattr(instrument, "_sampler", instrument.Sampler(0.002))
+    monkeypatch.setattr(instrument, "_profile_writer", writer)
+    monkeypatch.setattr(instrument, "_dump_profile", blocking_dump)
+    monkeypatch.setattr(instrument, "PROFILE_SLOW_MS", 10.0)
+    monkeypatch.setattr(instrument, "PROFILE_DIR", tmp_path / "profiles")
+
+    assert TestClient(_app()).get("/slow").status_code == 200  # returned while the writer is blocked
+    assert written == []
+    release.set()
+    writer.shutdown(wait=True)
+    (path,) = written
+    assert path.parent == tmp_path / "profiles" and "_GET_slow_" in path.name
+    assert "slow (test_instrument.py" in path.read_text()
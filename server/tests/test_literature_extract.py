@@ -0,0 +1,64 @@
+# server/tests/test_literature_extract.py
+"""
+Quantity extraction from page text (units must be whole tokens; figure and
+table labels are not values) and the extraction pool being replaced only
+when the pool that ran a job broke.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.models import Run
+from app.routers import literature_extract as extract
+from app.store import Repository
+
+
+def _quantities(text: str):
+    return [(p["value"], p["units"]) for p in extract.extract_quantities(text, "src", 1)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("stirred for 24 h at 60 °C, then 3 s.", [(24.0, "h"), (60.0, "°C"), (3.0, "s")]),
+    ("1 g of MAA in 2 M HCl at 298 K; 10 rpm", [(1.0, "g"), (2.0, "M"), (298.0, "K"), (10.0, "rpm")]),
+    ("470 ± 1.45 µL EGDMA; 5 g/mol; 120 m² g⁻¹", [(470.0, "µL"), (5.0, "g/mol"), (120.0, "m²/g")]),
+    ("shear rate 100 s⁻¹ with 4 L-proline and 3 K+ ions", []),
+    ("see Scheme 1 g, Fig. 2 h and Table 3 K", []),
+])
+def test_quantities(text, expected):
+    assert _quantities(text) == expected
+
+
+def test_role_and_error_are_attached():
+    (prop,) = extract.extract_quantities("Then 470 ± 1.45 µL of EGDMA was added.", "src", 2, "stream")
+    assert prop["error"] == 1.45 and prop["qualifiers"] == {"stream": 2}
+    (prop,) = extract.extract_quantities("The cross-linker EGDMA (470 µL) was added.", "src", 1)
+    assert prop["qualifiers"] == {"role": "cross-linker", "page": 1}
+
+
+class _Pool:
+    def __init__(self):
+        self.shut_down = False
+
+    def shutdown(self, wait=True, cancel_futures=False) -> None:
+        self.shut_down = True
+
+
+def test_broken_job_only_drops_the_pool_that_ran_it(monkeypatch):
+    monkeypatch.setattr(extract, "get_repository", lambda repo=Repository(":memory:"): repo)
+    old, current = _Pool(), _Pool()
+    monkeypatch.setattr(extract, "_pool", current)  # already respawned by another job
+    future: Future = Future()
+    future.set_exception(BrokenProcessPool("worker died"))
+    run = Run(run_id="RUN_extract_test", name="literature/extract", status="running")
+    extract._finish(run, future, old)
+    assert run.status == "failed" and "BrokenProcessPool" in run.provenance["error"]
+    assert old.shut_down and not current.shut_down and extract._pool is current
+
+    extract._finish(Run(run_id="RUN_extract_test2", name="literature/extract", status="running"),
+                    future, current)
+    assert current.shut_down and extract._pool is None
@@ -0,0 +1,85 @@
+# server/tests/test_literature_upload.py
+"""
+POST /upload streaming: content-hash ids and dedup, the size limit, and
+bodies that are malformed, missing the file part or cut off mid-stream. PDFs
+go to a temp directory and extraction is not started. Also: mock catalogue
+properties are served without touching the repository.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import hashlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import literature
+from app.store import Repository
+
+BOUNDARY = "polyfoldtestboundary"
+PDF = b"%PDF-1.4\n" + b"0123456789" * 500 + b"\n%%EOF\n"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(literature, "PDFS", tmp_path)
+    monkeypatch.setattr(literature, "submit_extraction",
+                        lambda source_id, path: {"run_id": "RUN_test", "status": "pending"})
+    app = FastAPI()
+    app.include_router(literature.router)
+    return TestClient(app)
+
+
+def _body(content: bytes, field: str = "file", closed: bool = True) -> bytes:
+    body = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"a.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + content
+    return body + f"\r\n--{BOUNDARY}--\r\n".encode() if closed else body
+
+
+def _post(client: TestClient, body: bytes):
+    return client.post("/upload", content=body,
+                       headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+
+
+def test_upload_is_stored_under_its_hash_and_deduplicated(client, tmp_path):
+    first = _post(client, _body(PDF))
+    assert first.status_code == 200
+    assert first.json()["source_id"] == "sha256_" + hashlib.sha256(PDF).hexdigest()
+    assert first.json()["bytes"] == len(PDF) and not first.json()["deduplicated"]
+    second = _post(client, _body(PDF))
+    assert second.json()["deduplicated"]
+    assert [p.read_bytes() for p in tmp_path.iterdir()] == [PDF]
+
+
+def test_truncated_body_is_rejected_and_nothing_is_kept(client, tmp_path):
+    r = _post(client, _body(PDF[:2000], closed=False))
+    assert r.status_code == 400 and "Truncated" in r.json()["detail"]
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("body, status", [
+    (_body(PDF, field="other"), 400),       # no `file` part
+    (_body(b""), 400),                      # empty file
+    (b"not multipart at all", 400),         # malformed
+])
+def test_bad_bodies_are_rejected(client, tmp_path, body, status):
+    assert _post(client, body).status_code == status
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_oversized_upload_is_rejected(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(literature, "UPLOAD_MAX_BYTES", 1000)
+    assert _post(client, _body(PDF)).status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("source_id", ["doi_sample_1", "doi_anything", "uploaded_missing"])
+def test_mock_properties_are_not_stored(client, monkeypatch, source_id):
+    repo = Repository(":memory:")
+    monkeypatch.setattr(literature, "get_repository", lambda: repo)
+    r = client.get(f"/pdfs/{source_id}/canonical-properties")
+    assert r.status_code == 200 and r.json()
+    assert all(p["source_id"] == source_id for p in r.json())
+    assert repo.stats()["properties"] == 0
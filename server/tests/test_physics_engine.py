@@ -0,0 +1,94 @@
+# server/tests/test_physics_engine.py
+"""
+Physics run DAG on a stand-in pool: step-cache short-circuit, failures
+blocking downstream steps, respawning a broken process pool, and the run
+registry only evicting finished runs. A thread pool stands in for the spawn
+pool so the methods run in-process.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.cache import ResultCache
+from app.routers import physics_engine as engine
+from app.routers.physics_methods import CONFORMER, DELTA_E
+
+A = {"name": "MAA", "smiles": "CC(=C)C(=O)O"}
+B = {"name": "EGDMA", "smiles": "CC(=C)C(=O)OCCOC(=O)C(C)=C"}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(engine, "_pool", executor)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def _run(cache=None, a=A, b=B) -> engine.RunExecution:
+    builder = engine.GraphBuilder("RUN_test", [DELTA_E])
+    builder.add_pair(a, b)
+    run = engine.new_run("physics-engine", [DELTA_E], {})
+    execution = engine.RunExecution(run, builder.build(), max_concurrency=2, cache=cache)
+    assert execution.start().wait(60)
+    return execution
+
+
+def test_second_run_is_served_from_the_step_cache(pool):
+    cache = ResultCache()
+    first = _run(cache)
+    assert first.run.status == "done" and first.run.counters["skipped"] == 0
+    second = _run(cache)
+    assert second.run.status == "done"
+    assert second.run.counters == {"created": 0, "skipped": len(second.steps), "errors": 0, "blocked": 0}
+    assert [p["value"] for p in second.properties()] == [p["value"] for p in first.properties()]
+
+
+def test_failed_step_blocks_its_dependents(pool):
+    execution = _run(b={"name": "bad", "smiles": "C(("})
+    statuses = {s.label.get("structure"): s.status for s in execution.steps if s.method_id == CONFORMER}
+    assert statuses == {"MAA": "done", "bad": "failed"}
+    assert execution.run.status == "partial" and execution.run.counters["blocked"] > 0
+    assert all(s.status == "blocked" for s in execution.steps if s.method_id == DELTA_E)
+
+
+class _BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        fut.set_exception(BrokenProcessPool("worker died"))
+        return fut
+
+    def shutdown(self, wait=True, cancel_futures=False) -> None:
+        self.shut_down = True
+
+
+def test_broken_pool_fails_the_run_and_is_replaced(monkeypatch):
+    broken = _BrokenPool()
+    monkeypatch.setattr(engine, "_pool", broken)
+    execution = _run()
+    assert execution.run.status == "failed"
+    assert all(s.status == "failed" and "BrokenProcessPool" in s.error for s in execution.steps)
+    assert broken.shut_down and engine._pool is None
+
+
+def test_registry_evicts_only_finished_runs(monkeypatch):
+    monkeypatch.setattr(engine, "_runs", type(engine._runs)())
+    monkeypatch.setattr(engine, "PHYSICS_RETAIN", 2)
+    executions = [engine.RunExecution(engine.new_run("physics-engine", [], {}), []) for _ in range(4)]
+    executions[1]._finished.set()
+    for e in executions:
+        engine.register_run(e)
+    # two over the limit, but only run 1 has finished: runs 0, 2 and 3 stay pollable
+    kept = [e for e in executions if engine.get_run(e.run.run_id) is not None]
+    assert kept == [executions[0], executions[2], executions[3]]
+    executions[0]._finished.set()
+    engine.register_run(engine.RunExecution(engine.new_run("physics-engine", [], {}), []))
+    assert engine.get_run(executions[0].run.run_id) is None
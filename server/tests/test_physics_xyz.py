@@ -0,0 +1,85 @@
+# server/tests/test_physics_xyz.py
+"""
+XYZ trajectories: the frame index (windowed scan, "<file>.idx" sidecar) and
+byte-range streaming (200 / 206 / 416) over whole files and frame spans.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.routers import physics_xyz as xyz
+
+
+def _frame(i: int, atoms: int) -> str:
+    rows = "".join(f"C {i}.0 {a}.0 0.0\n" for a in range(atoms))
+    return f"{atoms}\nframe {i}\n{rows}"
+
+
+@pytest.fixture
+def trajectory(tmp_path, monkeypatch):
+    monkeypatch.setattr(xyz, "XYZ_DIRS", [tmp_path])
+    monkeypatch.setattr(xyz, "STREAM_CHUNK_BYTES", 7)  # several chunks per response
+    path = tmp_path / "traj.xyz"
+    path.write_text("".join(_frame(i, 1 + i % 3) for i in range(5)))
+    return path
+
+
+@pytest.fixture
+def client(trajectory):
+    app = FastAPI()
+
+    @app.get("/xyz/{name}")
+    def whole(name: str, request: Request):
+        path = xyz.resolve_xyz(name)
+        return xyz.stream_span(request, path, 0, path.stat().st_size)
+
+    @app.get("/xyz/{name}/frames")
+    def frames(name: str, request: Request, start: int = 0, stop: int | None = None):
+        path = xyz.resolve_xyz(name)
+        index = xyz.frame_index(path)
+        return xyz.stream_span(request, path, *index.span(*xyz.frame_range(index, start, stop)))
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("window", [1, 5, 64, xyz.SCAN_WINDOW_BYTES])
+def test_index_is_the_same_for_any_scan_window(trajectory, monkeypatch, window):
+    monkeypatch.setattr(xyz, "SCAN_WINDOW_BYTES", window)
+    index = xyz._scan(trajectory)
+    data = trajectory.read_bytes()
+    assert index.atoms == [1, 2, 3, 1, 2]
+    assert [data[a:b].decode() for a, b in zip(index.offsets, index.offsets[1:])] == \
+        [_frame(i, 1 + i % 3) for i in range(5)]
+
+
+def test_index_sidecar_is_reused_until_the_file_changes(trajectory):
+    first = xyz.frame_index(trajectory)
+    assert trajectory.with_name("traj.xyz.idx").exists()
+    assert xyz._read_idx(trajectory, first.size, first.mtime_ns) == first
+    trajectory.write_text(_frame(0, 2))
+    assert xyz.frame_index(trajectory).atoms == [2]
+
+
+def test_whole_file_and_ranges(client, trajectory):
+    data = trajectory.read_bytes()
+    r = client.get("/xyz/traj.xyz")
+    assert r.status_code == 200 and r.content == data
+    r = client.get("/xyz/traj.xyz", headers={"Range": "bytes=3-20"})
+    assert r.status_code == 206 and r.content == data[3:21]
+    assert r.headers["content-range"] == f"bytes 3-20/{len(data)}"
+    assert client.get("/xyz/traj.xyz", headers={"Range": "bytes=-4"}).content == data[-4:]
+    r = client.get("/xyz/traj.xyz", headers={"Range": f"bytes={len(data)}-"})
+    assert r.status_code == 416 and r.headers["content-range"] == f"bytes */{len(data)}"
+
+
+def test_frame_spans_and_ranges_within_them(client):
+    r = client.get("/xyz/traj.xyz/frames", params={"start": 1, "stop": 3})
+    assert r.text == _frame(1, 2) + _frame(2, 3)
+    r = client.get("/xyz/traj.xyz/frames", params={"start": 2, "stop": 3}, headers={"Range": "bytes=0-1"})
+    assert r.status_code == 206 and r.text == "3\n"
+    assert client.get("/xyz/traj.xyz/frames", params={"start": 5}).status_code == 416
+    assert client.get("/xyz/../etc.xyz").status_code in (400, 404)
@@ -0,0 +1,78 @@
+# server/tests/test_store.py
+"""
+SQLite repository: property upserts keep their index columns current, cursor
+pagination, and designer runs that propose the same molecule.
+
+    cd server && python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.store import Repository
+
+
+@pytest.fixture
+def repo() -> Repository:
+    return Repository(":memory:")
+
+
+def _prop(property_id: str, run_id: str, value: float = 1.0, sid: str = "CS_1"):
+    return {"property_id": property_id, "name": "MW", "value": value,
+            "qualifiers": {"chemical_structure_id": sid},
+            "provenance": {"run_id": run_id}}
+
+
+def test_upsert_moves_index_columns_with_the_record(repo):
+    repo.add_properties([_prop("PR_a", "run1", 1.0, "CS_1")], source="ai-designer")
+    repo.add_properties([_prop("PR_a", "run2", 2.0, "CS_2")], source="literature")
+    assert repo.list_properties(run_id="run1")["items"] == []
+    assert repo.list_properties(source="ai-designer")["items"] == []
+    (item,) = repo.list_properties(run_id="run2", source="literature", chemical_structure_id="CS_2")["items"]
+    assert item["value"] == 2.0
+
+
+def test_property_pages_cover_every_row_once(repo):
+    repo.add_properties([_prop(f"PR_{i}", "run1", i) for i in range(7)])
+    seen, cursor = [], None
+    while True:
+        page = repo.list_properties(run_id="run1", limit=3, cursor=cursor)
+        seen += [p["property_id"] for p in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"PR_{i}" for i in range(7)]
+
+
+def test_run_pages_are_newest_first(repo):
+    for i in range(5):
+        repo.save_run({"run_id": f"r{i}", "name": "propose", "status": "completed"})
+    first = repo.list_runs(limit=2)
+    rest = repo.list_runs(limit=10, cursor=first["next_cursor"])
+    assert [r["run_id"] for r in first["items"] + rest["items"]] == ["r4", "r3", "r2", "r1", "r0"]
+    assert rest["next_cursor"] is None
+
+
+def test_structure_upsert_merges_tags_and_synonyms(repo):
+    a = repo.upsert_structure("OCC", synonyms=["ethanol"], tags=["solvent"])
+    b = repo.upsert_structure("CCO", synonyms=["EtOH"], tags=["candidate"])
+    assert a["chemical_structure_id"] == b["chemical_structure_id"]
+    assert b["synonyms"] == ["ethanol", "EtOH"] and b["tags"] == ["candidate", "solvent"]
+    assert repo.get_structure("EtOH")["smiles"] == "CCO"
+    assert repo.count_structures(tag="candidate") == 1
+
+
+def test_designer_runs_each_keep_a_reproposed_molecule(repo, monkeypatch):
+    from app.routers import aidesigner
+
+    monkeypatch.setattr(aidesigner, "get_repository", lambda: repo)
+
+    def candidate():
+        return {"smiles": "CCO", "properties": {"MW": 46.07, "TPSA": 20.23},
+                "cache_key": "k-ethanol", "monomer": {}}
+
+    assert aidesigner._record_candidates("run1", [candidate()]) is None
+    assert aidesigner._record_candidates("run2", [candidate()]) is None
+    for run_id in ("run1", "run2"):
+        names = {p["name"] for p in repo.list_properties(run_id=run_id)["items"]}
+        assert names == {"MW", "TPSA"}